@@ -17,7 +17,22 @@ QUIZ_CONFIG = {
             'Intermediate': 10,
             'Advanced': 5
         },
-        'passing_score': 60
+        'passing_score': 60,
+        'adaptive': {
+            'theta_grid': {'min': -4.0, 'max': 4.0, 'points': 161},
+            'se_threshold': 0.5,
+            'min_questions': 5,
+            'max_questions': 20,
+            'default_discrimination': 1.0,
+            # Randomesque exposure control: the next question is drawn at random from the
+            # top_k most informative unused ones, so students do not all see the same sequence
+            'exposure_top_k': 5,
+            'difficulty_parameters': {
+                'Beginner': -1.0,
+                'Intermediate': 0.0,
+                'Advanced': 1.0
+            }
+        }
     },
     'career_quiz': {
         'scoring_scale': {
@@ -35,7 +50,9 @@ IQ_CALCULATION = {
     'base_score': 85,
     'multiplier': 0.6,
     'min_iq': 70,
-    'max_iq': 150
+    'max_iq': 150,
+    'population_mean': 100,
+    'population_sd': 15
 }
 
 # Certificate Configuration
@@ -64,7 +81,116 @@ PROGRESS_CONFIG = {
         'course_completion',
         'skill_assessment'
     ],
-    'milestone_activities': [5, 10, 25, 50, 100]
+    'milestone_activities': [5, 10, 25, 50, 100],
+    'figure_cache_size': 256,
+    'chart_max_points': 500,
+    # Rows per chunk when streaming the progress log (iter_data)
+    'chunk_rows': 100000
+}
+
+# Background writer for the progress and quiz result stores
+PERSISTENCE_CONFIG = {
+    'queue_size': 2048,
+    'max_batch': 512,
+    'batch_window_ms': 0,
+    'enqueue_timeout': 2.0,
+    'read_barrier_timeout': 5.0,
+    'fsync': True
+}
+
+# Snowflake IDs for progress records and quiz attempts
+ID_CONFIG = {
+    'epoch': '2025-01-01',
+    # None leases a free worker id per process from lease_dir; processes on other machines
+    # do not see those leases, so give each server there its own PLP_WORKER_ID
+    'worker_id': None,
+    'lease_dir': 'data/worker_ids'
+}
+
+# Recommendations list
+RECOMMENDATION_CONFIG = {
+    'page_size': 10,
+    'page_size_options': [10, 25, 50],
+    # Stable display order; the catalog row number breaks any remaining ties
+    'sort_columns': ['stream', 'difficulty_level', 'title'],
+    'difficulty_order': {'Beginner': 1, 'Intermediate': 2, 'Advanced': 3}
+}
+
+# Per-question response log (utils.response_log)
+RESPONSE_LOG_CONFIG = {
+    # Segments of one roll level are merged into one of the next level once this many have piled up
+    'roll_segments': 32,
+    # Merged segments of this size or more are sealed and never merged again
+    'segment_bytes': 16 * 1024 * 1024
+}
+
+# Span timings for the data, quiz and certificate hot paths
+METRICS_CONFIG = {
+    'enabled': True,
+    # Time one call in every N per thread (every call is still counted)
+    'sample_every': 1,
+    'buckets_ms': [0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000],
+    # Prometheus text file, rewritten periodically (e.g. for node_exporter's textfile collector);
+    # use 'data/metrics-{pid}.prom' when several server processes share the data directory
+    'export_path': 'data/metrics.prom',
+    'export_interval': 15.0,
+    # Per-session span panel in the sidebar; can also be turned on with ?debug=1
+    'debug_panel': False
+}
+
+# Background warm-up of catalogs, indexes, certificate styles and charts when a server process starts
+WARMUP_CONFIG = {
+    'enabled': True,
+    # Figure caches are primed for this many of the most recently active students
+    'prime_users': 10,
+    # Written when warm-up finishes, for readiness probes; '{pid}' gives each process its own file
+    'status_file': 'data/warmup_status.json'
+}
+
+# Canonical names and integer ids for streams, career fields, users and platforms
+ENTITY_CONFIG = {
+    'dictionary_file': 'data/entity_dictionary.json',
+    'report_file': 'data/entity_report.json',
+    # Minimum difflib similarity for a name to be merged into an existing one (not used for users)
+    'fuzzy_cutoff': 0.9,
+    # Manual corrections the fuzzy match cannot make: {entity: {variant: canonical name}} (users are never aliased)
+    'aliases': {}
+}
+
+# Per-user day/week/month/day-of-week activity totals kept up to date with the progress log
+ROLLUP_CONFIG = {
+    'cube_file': 'data/rollups/progress_cube.arrow',
+    # Appended rows are kept as small parts and merged (and saved) once this many have piled up
+    'max_deltas': 16
+}
+
+# Progress events older than raw_days are archived as daily per-user totals (python -m utils.retention)
+RETENTION_CONFIG = {
+    'raw_days': 365,
+    'archive_dir': 'data/progress_archive',
+    # Most active archived users whose Dashboard metrics are compared before and after a compaction
+    'verify_users': 5
+}
+
+# Instructor Analytics page: cohort totals over every student (utils.cohort_analytics)
+INSTRUCTOR_CONFIG = {
+    # Usernames allowed to open the page
+    'usernames': [],
+    # Students listed on the page: the students CSV logins are checked against (DATA_FILES['students'])
+    'roster_file': 'attached_assets/students.csv',
+    'state_file': 'data/rollups/cohort_state.npz',
+    # The state is saved after a rebuild and once this many appended rows have been folded in
+    'save_rows': 50000,
+    # At-risk students: no activity for inactive_days, or an assessment average below
+    # low_score over at least min_assessments scored assessments
+    'inactive_days': 14,
+    'low_score': 60,
+    'min_assessments': 3,
+    'heatmap_weeks': 12,
+    'heatmap_students': 50,
+    # Stream score distributions count students with at least min_answers answers in the stream
+    'min_answers': 5,
+    'score_bands': 10
 }
 
 # Data File Mapping (adjust paths as needed for your laptop)
@@ -1,19 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 import io
 import base64
 import os
-import subprocess
 
-# ReportLab imports for certificate generation
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER
+# pandas, the data helpers, Plotly, ReportLab and subprocess are imported where
+# they are used, so the login screen starts without loading them
+
+from utils.warmup import start_warmup
 
 # Configuration
 DATA_FILES = {
@@ -39,6 +33,10 @@ if 'current_page' not in st.session_state:
 @st.cache_data
 def load_data(data_type):
     """Load data from CSV files"""
+    import pandas as pd
+    from utils.schemas import apply_schema, read_options
+    from utils.entity_ids import attach_entity_codes
+
     try:
         if data_type not in DATA_FILES:
             st.error(f"Unknown data type: {data_type}")
@@ -48,15 +46,15 @@ def load_data(data_type):
         if os.path.exists(file_path):
             # Special handling for students file which has empty row at top
             if data_type == 'students':
-                df = pd.read_csv(file_path, skiprows=1)  # Skip the empty first row
+                df = pd.read_csv(file_path, skiprows=1, **read_options(data_type))  # Skip the empty first row
             else:
-                df = pd.read_csv(file_path)
+                df = pd.read_csv(file_path, **read_options(data_type))
             
             # Remove empty columns if they exist
             df = df.dropna(axis=1, how='all')
             # Remove any completely empty rows
             df = df.dropna(how='all')
-            return df
+            return attach_entity_codes(data_type, apply_schema(data_type, df))
         else:
             st.warning(f"Data file not found: {file_path}")
             return pd.DataFrame()
@@ -66,9 +64,12 @@ def load_data(data_type):
 
 def save_user_progress(user_id, activity_type, score, details):
     """Save user progress"""
+    from utils.progress_writer import append_rows
+    from utils.id_generator import next_id
+
     try:
         progress_data = {
-            'progress_id': f"{user_id}_{activity_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'progress_id': next_id(),
             'user_id': user_id,
             'activity_type': activity_type,
             'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -76,13 +77,8 @@ def save_user_progress(user_id, activity_type, score, details):
             'details': details
         }
         
-        progress_df = load_data('user_progress')
-        if progress_df.empty:
-            progress_df = pd.DataFrame([progress_data])
-        else:
-            progress_df = pd.concat([progress_df, pd.DataFrame([progress_data])], ignore_index=True)
-        
-        progress_df.to_csv(DATA_FILES['user_progress'], index=False)
+        # Locked append, so concurrent sessions cannot overwrite each other's rows
+        append_rows(DATA_FILES['user_progress'], [progress_data])
         return True
     except Exception as e:
         st.error(f"Error saving progress: {str(e)}")
@@ -120,10 +116,12 @@ class QuizEngine:
     
     def get_random_questions(self, stream=None, difficulty=None, count=10):
         """Get random questions based on filters"""
+        from utils.entity_ids import select_entity
+
         filtered_df = self.questions_df.copy()
         
         if stream:
-            filtered_df = filtered_df[filtered_df['stream'] == stream]
+            filtered_df = select_entity(filtered_df, 'stream', stream)
         if difficulty:
             filtered_df = filtered_df[filtered_df['difficulty'] == difficulty]
         
@@ -181,11 +179,17 @@ class CareerQuizEngine:
 # Certificate Generator Class
 class CertificateGenerator:
     def __init__(self):
+        from reportlab.lib.styles import getSampleStyleSheet
+        
         self.styles = getSampleStyleSheet()
         self.setup_custom_styles()
     
     def setup_custom_styles(self):
         """Setup custom styles for certificate"""
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER
+        
         self.title_style = ParagraphStyle(
             'CustomTitle',
             parent=self.styles['Heading1'],
@@ -205,6 +209,13 @@ class CertificateGenerator:
     
     def generate_certificate(self, user_name, course_name, completion_date, score=None):
         """Generate certificate PDF"""
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.lib.enums import TA_CENTER
+        
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
         
@@ -284,10 +295,14 @@ def show_login_page():
 
 def show_dashboard():
     """Display dashboard"""
+    import pandas as pd
+    from utils.entity_ids import select_entity
+    from utils.schemas import observed_value_counts
+
     st.title("📊 Your Learning Dashboard")
     
     user_progress = get_user_progress()
-    user_activities = user_progress[user_progress['user_id'] == st.session_state.username] if not user_progress.empty else pd.DataFrame()
+    user_activities = select_entity(user_progress, 'user', st.session_state.username) if not user_progress.empty else pd.DataFrame()
     
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -312,17 +327,18 @@ def show_dashboard():
     
     # Charts
     if not user_activities.empty:
+        import plotly.express as px
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📈 Activity Distribution")
-            activity_counts = user_activities['activity_type'].value_counts()
+            activity_counts = observed_value_counts(user_activities['activity_type'])
             fig = px.pie(values=activity_counts.values, names=activity_counts.index, title="Activity Types")
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             st.subheader("📊 Score Trends")
-            user_activities['date'] = pd.to_datetime(user_activities['date'])
             score_trend = user_activities.groupby(user_activities['date'].dt.date)['score'].mean().reset_index()
             fig = px.line(score_trend, x='date', y='score', title="Score Over Time")
             st.plotly_chart(fig, use_container_width=True)
@@ -485,6 +501,9 @@ def show_career_quiz():
 
 def show_study_planner():
     """Display study planner"""
+    import pandas as pd
+    from utils.entity_ids import select_entity
+
     st.title("📅 Study Planner")
     
     st.markdown("### Create Your Learning Goals")
@@ -518,10 +537,8 @@ def show_study_planner():
     
     # Show existing plans
     user_progress = get_user_progress()
-    study_plans = user_progress[
-        (user_progress['user_id'] == st.session_state.username) & 
-        (user_progress['activity_type'] == 'study_plan')
-    ] if not user_progress.empty else pd.DataFrame()
+    user_activities = select_entity(user_progress, 'user', st.session_state.username) if not user_progress.empty else pd.DataFrame()
+    study_plans = user_activities[user_activities['activity_type'] == 'study_plan'] if not user_activities.empty else pd.DataFrame()
     
     if not study_plans.empty:
         st.subheader("📋 Your Study Plans")
@@ -532,6 +549,8 @@ def show_study_planner():
 
 def show_recommendations():
     """Display learning recommendations"""
+    from utils.entity_ids import select_entity
+
     st.title("📚 Learning Recommendations")
     
     recommendations_df = load_data('recommendations')
@@ -555,7 +574,7 @@ def show_recommendations():
     filtered_recs = recommendations_df.copy()
     
     if stream_filter != 'All' and 'stream' in filtered_recs.columns:
-        filtered_recs = filtered_recs[filtered_recs['stream'] == stream_filter]
+        filtered_recs = select_entity(filtered_recs, 'stream', stream_filter)
     
     if difficulty_filter != 'All' and 'difficulty_level' in filtered_recs.columns:
         filtered_recs = filtered_recs[filtered_recs['difficulty_level'] == difficulty_filter]
@@ -594,11 +613,13 @@ def show_recommendations():
 
 def show_certificates():
     """Display certificates and achievements"""
+    import pandas as pd
+    from utils.entity_ids import select_entity
+
     st.title("🏆 Your Certificates & Achievements")
     
-    cert_generator = CertificateGenerator()
     user_progress = get_user_progress()
-    user_activities = user_progress[user_progress['user_id'] == st.session_state.username] if not user_progress.empty else pd.DataFrame()
+    user_activities = select_entity(user_progress, 'user', st.session_state.username) if not user_progress.empty else pd.DataFrame()
     
     tab1, tab2, tab3 = st.tabs(["🏆 Available Certificates", "📊 Achievement Progress", "📄 Project Documentation"])
     
@@ -656,7 +677,7 @@ def show_certificates():
             with col2:
                 if cert['earned']:
                     if st.button(f"Generate Certificate", key=f"cert_{cert['type']}", type="primary"):
-                        pdf_data = cert_generator.generate_certificate(
+                        pdf_data = CertificateGenerator().generate_certificate(
                             user_name=st.session_state.user_data['Name'],
                             course_name=cert['type'],
                             completion_date=datetime.now().strftime('%B %d, %Y'),
@@ -738,6 +759,7 @@ def show_certificates():
             if st.button("🔄 Generate Project Documentation", type="primary"):
                 with st.spinner("Generating comprehensive project documentation..."):
                     try:
+                        import subprocess
                         result = subprocess.run(["python", "generate_project_pdf.py"], capture_output=True, text=True)
                         if result.returncode == 0:
                             st.success("✅ Documentation generated successfully!")
@@ -757,6 +779,9 @@ def main():
         layout="wide"
     )
     
+    # First visit to this server process: preload caches in the background
+    start_warmup()
+    
     # Check authentication
     if not st.session_state.authenticated:
         show_login_page()
@@ -1,7 +1,7 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
 from utils.progress_tracker import ProgressTracker
-from utils.data_handler import load_data
+from utils.catalog_store import load_catalog
 
 # Require authentication
 require_auth()
@@ -48,7 +48,8 @@ with col3:
     )
 
 with col4:
-    total_streams = len(load_data('streams')) if load_data('streams') is not None else 0
+    streams_df = load_catalog('streams')
+    total_streams = len(streams_df) if streams_df is not None else 0
     st.metric(
         label="Available Streams",
         value=total_streams,
@@ -1,9 +1,11 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
-from utils.data_handler import load_data
-from utils.quiz_engine import QuizEngine 
+from utils.catalog_store import load_catalog
+from utils.quiz_engine import QuizEngine, ADAPTIVE_CONFIG
 from utils.data_handler import save_quiz_results
+from utils.response_log import new_attempt_id, log_responses
 import random
+import time
 
 # Require authentication
 require_auth()
@@ -29,9 +31,13 @@ if 'iq_answers' not in st.session_state:
     st.session_state.iq_answers = {}
 if 'iq_start_time' not in st.session_state:
     st.session_state.iq_start_time = None
+if 'iq_quiz_mode' not in st.session_state:
+    st.session_state.iq_quiz_mode = 'standard'
+if 'iq_response_times' not in st.session_state:
+    st.session_state.iq_response_times = {}
 
 # Load questions data
-questions_df = load_data('questions')
+questions_df = load_catalog('questions')
 if questions_df is None:
     st.error("Unable to load questions data")
     st.stop()
@@ -39,8 +45,25 @@ if questions_df is None:
 # Initialize quiz engine
 quiz_engine = QuizEngine(questions_df)
 
-def start_quiz():
-    """Initialize the IQ quiz"""
+def start_quiz(mode='standard'):
+    """Initialize the IQ quiz, returning False when the question bank has nothing to ask"""
+    st.session_state.iq_quiz_mode = mode
+    st.session_state.iq_attempt_id = new_attempt_id()
+    st.session_state.iq_response_times = {}
+    st.session_state.iq_question_shown = None
+    
+    if mode == 'adaptive':
+        # Adaptive mode starts at average ability and selects one question at a time
+        first_question = quiz_engine.select_next_question([], 0.0)
+        if first_question is None:
+            st.error("No questions are available for the adaptive test")
+            return False
+        st.session_state.iq_questions = [first_question]
+        st.session_state.iq_current_question = 0
+        st.session_state.iq_answers = {}
+        st.session_state.iq_quiz_state = 'in_progress'
+        return True
+    
     # Get mixed questions from different streams and difficulties
     all_questions = []
     
@@ -53,6 +76,10 @@ def start_quiz():
     all_questions.extend(intermediate_questions)
     all_questions.extend(advanced_questions)
     
+    if not all_questions:
+        st.error("No questions are available for the IQ test")
+        return False
+    
     # Shuffle questions
     random.shuffle(all_questions)
     
@@ -60,7 +87,7 @@ def start_quiz():
     st.session_state.iq_current_question = 0
     st.session_state.iq_answers = {}
     st.session_state.iq_quiz_state = 'in_progress'
-    st.session_state.iq_start_time = st.session_state.get('iq_start_time', None)
+    return True
 
 def calculate_iq_score(correct_answers, total_questions, time_taken):
     """Calculate IQ score based on correct answers and time"""
@@ -96,7 +123,7 @@ if st.session_state.iq_quiz_state == 'start':
     
     #### Test Details:
     - **Duration**: Approximately 20-30 minutes
-    - **Questions**: 20 carefully selected questions
+    - **Questions**: 20 carefully selected questions (fewer in adaptive mode)
     - **Difficulty**: Mixed levels (Beginner to Advanced)
     - **Scoring**: Based on accuracy and time efficiency
     
@@ -112,22 +139,40 @@ if st.session_state.iq_quiz_state == 'start':
     
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
+        test_mode = st.radio(
+            "Test Mode",
+            ["Adaptive", "Standard"],
+            horizontal=True,
+            help="Adaptive mode picks each question to match your ability and stops once your score is precise"
+        )
         if st.button("Start IQ Test", type="primary", use_container_width=True):
-            start_quiz()
-            st.rerun()
+            if start_quiz(test_mode.lower()):
+                st.rerun()
 
 # Quiz in progress
 elif st.session_state.iq_quiz_state == 'in_progress':
     questions = st.session_state.iq_questions
     current_q = st.session_state.iq_current_question
     
+    is_adaptive = st.session_state.iq_quiz_mode == 'adaptive'
+    
     if current_q < len(questions):
         question = questions[current_q]
         
+        # Remember when this question was first shown to time the response
+        question_shown = st.session_state.get('iq_question_shown')
+        if question_shown is None or question_shown[0] != current_q:
+            st.session_state.iq_question_shown = (current_q, time.time())
+        
         # Progress bar
-        progress = (current_q + 1) / len(questions)
-        st.progress(progress)
-        st.write(f"Question {current_q + 1} of {len(questions)}")
+        if is_adaptive:
+            max_questions = ADAPTIVE_CONFIG['max_questions']
+            st.progress(min(1.0, (current_q + 1) / max_questions))
+            st.write(f"Question {current_q + 1} (adaptive, at most {max_questions})")
+        else:
+            progress = (current_q + 1) / len(questions)
+            st.progress(progress)
+            st.write(f"Question {current_q + 1} of {len(questions)}")
         
         # Display question
         st.markdown(f"### {question['question']}")
@@ -167,11 +212,31 @@ elif st.session_state.iq_quiz_state == 'in_progress':
                     # Extract the letter from selected answer
                     answer_letter = selected_answer[0].lower()
                     st.session_state.iq_answers[current_q] = answer_letter
+                    st.session_state.iq_response_times[current_q] = int((time.time() - st.session_state.iq_question_shown[1]) * 1000)
                     st.session_state.iq_current_question += 1
                     
-                    if st.session_state.iq_current_question >= len(questions):
+                    if is_adaptive:
+                        theta, standard_error = quiz_engine.estimate_ability(questions, st.session_state.iq_answers)
+                        next_question = None
+                        if not quiz_engine.should_stop_adaptive(questions, standard_error):
+                            next_question = quiz_engine.select_next_question(questions, theta)
+                        if next_question is None:
+                            st.session_state.iq_quiz_state = 'completed'
+                        else:
+                            questions.append(next_question)
+                    elif st.session_state.iq_current_question >= len(questions):
                         st.session_state.iq_quiz_state = 'completed'
                     
+                    if st.session_state.iq_quiz_state == 'completed':
+                        log_responses(
+                            attempt_id=st.session_state.iq_attempt_id,
+                            user_id=st.session_state.username,
+                            quiz_type='iq_test',
+                            questions=questions,
+                            answers=st.session_state.iq_answers,
+                            response_times=st.session_state.iq_response_times
+                        )
+                    
                     st.rerun()
         
         # Show explanation for previous question if available
@@ -192,10 +257,15 @@ elif st.session_state.iq_quiz_state == 'completed':
     
     score_percentage, correct_answers, total_questions = quiz_engine.calculate_score(answers, questions)
     
-    # Calculate IQ score (mock calculation for demo)
-    # In a real IQ test, this would be much more sophisticated
-    time_taken = 1200  # Assume 20 minutes for demo
-    iq_score = calculate_iq_score(correct_answers, total_questions, time_taken)
+    if st.session_state.iq_quiz_mode == 'adaptive':
+        # Adaptive mode scores the ability estimate rather than the raw accuracy
+        theta, standard_error = quiz_engine.estimate_ability(questions, answers)
+        iq_score = quiz_engine.calculate_adaptive_iq_score(theta)
+    else:
+        # Calculate IQ score (mock calculation for demo)
+        # In a real IQ test, this would be much more sophisticated
+        time_taken = 1200  # Assume 20 minutes for demo
+        iq_score = calculate_iq_score(correct_answers, total_questions, time_taken)
     
     st.markdown("### 🎉 IQ Test Completed!")
     
@@ -211,6 +281,9 @@ elif st.session_state.iq_quiz_state == 'completed':
     with col3:
         st.metric("Estimated IQ Score", iq_score)
     
+    if st.session_state.iq_quiz_mode == 'adaptive':
+        st.caption(f"Adaptive test finished after {total_questions} questions (ability standard error: {standard_error:.2f})")
+    
     # IQ Score interpretation
     st.markdown("---")
     st.markdown("### 📊 IQ Score Interpretation")
@@ -260,13 +333,14 @@ elif st.session_state.iq_quiz_state == 'completed':
             delta=f"{accuracy:.1f}%"
         )
     
-    # Save results
+    # Save results. Reruns of this screen resubmit the same attempt, which the writer ignores
     details = f"IQ Score: {iq_score}, Accuracy: {score_percentage:.1f}%, Questions: {total_questions}"
     save_success = save_quiz_results(
         user_id=st.session_state.username,
         quiz_type='iq_test',
         score=score_percentage,
-        details=details
+        details=details,
+        attempt_id=st.session_state.iq_attempt_id
     )
     
     if save_success:
@@ -278,7 +352,8 @@ elif st.session_state.iq_quiz_state == 'completed':
     with col1:
         if st.button("Take Another Test"):
             # Reset quiz state
-            for key in ['iq_quiz_state', 'iq_questions', 'iq_current_question', 'iq_answers']:
+            for key in ['iq_quiz_state', 'iq_questions', 'iq_current_question', 'iq_answers', 'iq_quiz_mode',
+                        'iq_attempt_id', 'iq_response_times', 'iq_question_shown']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
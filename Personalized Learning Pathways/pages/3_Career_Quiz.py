@@ -1,9 +1,10 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
-from utils.data_handler import load_data
+from utils.catalog_store import load_catalog
 from utils.quiz_engine import CareerQuizEngine, save_quiz_results
-import plotly.express as px
+from utils.response_log import new_attempt_id, log_responses
 import pandas as pd
+import time
 
 # Require authentication
 require_auth()
@@ -27,10 +28,12 @@ if 'career_current_question' not in st.session_state:
     st.session_state.career_current_question = 0
 if 'career_answers' not in st.session_state:
     st.session_state.career_answers = {}
+if 'career_response_times' not in st.session_state:
+    st.session_state.career_response_times = {}
 
 # Load data
-career_quiz_df = load_data('career_quiz')
-streams_df = load_data('streams')
+career_quiz_df = load_catalog('career_quiz')
+streams_df = load_catalog('streams')
 
 if career_quiz_df is None:
     st.error("Unable to load career quiz data")
@@ -49,6 +52,9 @@ def start_career_quiz():
     st.session_state.career_questions = questions
     st.session_state.career_current_question = 0
     st.session_state.career_answers = {}
+    st.session_state.career_attempt_id = new_attempt_id()
+    st.session_state.career_response_times = {}
+    st.session_state.career_question_shown = None
     st.session_state.career_quiz_state = 'in_progress'
 
 # Quiz start screen
@@ -98,6 +104,11 @@ elif st.session_state.career_quiz_state == 'in_progress':
     if current_q < len(questions):
         question = questions[current_q]
         
+        # Remember when this question was first shown to time the response
+        question_shown = st.session_state.get('career_question_shown')
+        if question_shown is None or question_shown[0] != current_q:
+            st.session_state.career_question_shown = (current_q, time.time())
+        
         # Progress bar
         progress = (current_q + 1) / len(questions)
         st.progress(progress)
@@ -156,9 +167,18 @@ elif st.session_state.career_quiz_state == 'in_progress':
                                 break
                         
                         st.session_state.career_answers[current_q] = answer_letter
+                        st.session_state.career_response_times[current_q] = int((time.time() - st.session_state.career_question_shown[1]) * 1000)
                         
                         if current_q == len(questions) - 1:
                             st.session_state.career_quiz_state = 'completed'
+                            log_responses(
+                                attempt_id=st.session_state.career_attempt_id,
+                                user_id=st.session_state.username,
+                                quiz_type='career_quiz',
+                                questions=questions,
+                                answers=st.session_state.career_answers,
+                                response_times=st.session_state.career_response_times
+                            )
                         else:
                             st.session_state.career_current_question += 1
                         
@@ -194,6 +214,7 @@ elif st.session_state.career_quiz_state == 'completed':
     career_df = career_df.sort_values('Score', ascending=True)
     
     # Create horizontal bar chart
+    import plotly.express as px
     fig = px.bar(
         career_df,
         x='Score',
@@ -287,13 +308,14 @@ elif st.session_state.career_quiz_state == 'completed':
     
     st.info(advice)
     
-    # Save results
+    # Save results. Reruns of this screen resubmit the same attempt, which the writer ignores
     details = f"Top career: {top_field}, Score: {top_score:.1f}, Total fields assessed: {len(career_scores)}"
     save_success = save_quiz_results(
         user_id=st.session_state.username,
         quiz_type='career_quiz',
         score=top_score * 25,  # Convert to percentage
-        details=details
+        details=details,
+        attempt_id=st.session_state.career_attempt_id
     )
     
     if save_success:
@@ -305,7 +327,8 @@ elif st.session_state.career_quiz_state == 'completed':
     with col1:
         if st.button("Retake Assessment"):
             # Reset quiz state
-            for key in ['career_quiz_state', 'career_questions', 'career_current_question', 'career_answers']:
+            for key in ['career_quiz_state', 'career_questions', 'career_current_question', 'career_answers',
+                        'career_attempt_id', 'career_response_times', 'career_question_shown']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
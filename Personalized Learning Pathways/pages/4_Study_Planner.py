@@ -1,9 +1,10 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
 from utils.data_handler import save_study_plan, get_user_study_plans, load_data
+from utils.progress_tracker import ProgressTracker
+from utils.rollup_cube import DAY_NAMES, user_rollup
 import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
 
 # Require authentication
 require_auth()
@@ -18,14 +19,12 @@ if not user_data:
     st.error("User data not found")
     st.stop()
 
-# Load available streams for goal setting
-streams_df = load_data('streams')
-recommendations_df = load_data('recommendations')
-
-# Tabs for different planner features
-tab1, tab2, tab3, tab4 = st.tabs(["📝 Create Goals", "📊 My Plans", "📈 Progress Tracking", "📚 Study Resources"])
-
-with tab1:
+# Tab bodies with widgets are fragments: interacting with them reruns only that tab
+@st.fragment(key="planner_create_goals")
+def render_create_goals():
+    # Load available streams for goal setting
+    streams_df = load_data('streams')
+    
     st.subheader("🎯 Set New Learning Goals")
     
     col1, col2 = st.columns(2)
@@ -105,6 +104,10 @@ with tab1:
         budget = st.number_input("Budget for Learning Resources ($)", min_value=0, value=0)
     
     # Create goal button
+    if st.session_state.pop('study_goal_created', False):
+        st.success("Study goal created successfully! 🎉")
+        st.balloons()
+    
     if st.button("Create Study Goal", type="primary"):
         if goal_title and target_date > start_date:
             plan_data = {
@@ -126,14 +129,16 @@ with tab1:
             }
             
             if save_study_plan(st.session_state.username, plan_data):
-                st.success("Study goal created successfully! 🎉")
-                st.balloons()
+                # A fragment rerun would leave the sidebar deadlines stale, so rerun the page
+                st.session_state.study_goal_created = True
+                st.rerun(scope="app")
             else:
                 st.error("Failed to save study goal. Please try again.")
         else:
             st.error("Please fill in all required fields and ensure target date is after start date.")
 
-with tab2:
+@st.fragment(key="planner_my_plans")
+def render_my_plans():
     st.subheader("📊 My Study Plans")
     
     # Load user's study plans
@@ -156,7 +161,7 @@ with tab2:
                 'Goal': plan_info.get('Goal', 'N/A'),
                 'Deadline': plan_info.get('Deadline', 'N/A'),
                 'Status': plan_info.get('Status', 'Active'),
-                'Created': pd.to_datetime(plan['date']).strftime('%Y-%m-%d') if pd.notna(plan['date']) else 'N/A',
+                'Created': plan['date'].strftime('%Y-%m-%d') if pd.notna(plan['date']) else 'N/A',
                 'Details': plan_info
             })
         
@@ -229,116 +234,123 @@ with tab2:
     else:
         st.info("No study plans found. Create your first goal in the 'Create Goals' tab!")
 
-with tab3:
+@st.fragment(key="planner_progress_tracking")
+def render_progress_tracking():
     st.subheader("📈 Progress Tracking")
     
-    # Load all user progress for visualization
-    all_progress = load_data('user_progress')
+    # The progress tracker supplies the user's totals (raw and archived history) and the cached score chart
+    progress_tracker = ProgressTracker(st.session_state.username)
     
-    if all_progress is not None:
-        user_progress = all_progress[all_progress['user_id'] == st.session_state.username]
+    if progress_tracker.has_activity:
+        daily_activity = user_rollup(st.session_state.username, 'day')
         
-        if not user_progress.empty:
-            # Convert date column
-            user_progress['date'] = pd.to_datetime(user_progress['date'])
-            
-            # Activity timeline
-            st.markdown("#### 📅 Activity Timeline")
+        # Activity timeline
+        st.markdown("#### 📅 Activity Timeline")
+        
+        # Create timeline chart from the pre-aggregated monthly rollup
+        monthly_activity = user_rollup(st.session_state.username, 'month')
+        
+        if not monthly_activity.empty:
+            import plotly.express as px
+            fig = px.bar(
+                monthly_activity,
+                x='period',
+                y='count',
+                color='activity_type',
+                title='Monthly Activity Distribution',
+                labels={'count': 'Number of Activities', 'period': 'Month'}
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Score trends (excluding study plans), shared with the Dashboard through the figure cache
+        scored_days = daily_activity.loc[daily_activity['activity_type'] != 'study_plan', 'period']
+        if progress_tracker.aggregate.assessments > 0 and not scored_days.empty:
+            st.markdown("#### 📊 Score Trends")
             
-            # Create timeline chart
-            timeline_data = user_progress.copy()
-            timeline_data['month'] = timeline_data['date'].dt.strftime('%Y-%m')
-            monthly_activity = timeline_data.groupby(['month', 'activity_type']).size().reset_index(name='count')
+            # Zooming re-queries the tracker so the narrower window is shown at full detail
+            first_date = scored_days.min().date()
+            last_date = scored_days.max().date()
+            zoom_range = st.date_input(
+                "Date Range",
+                value=(first_date, last_date),
+                min_value=first_date,
+                max_value=last_date,
+                key="score_trend_range"
+            )
+            if isinstance(zoom_range, tuple) and len(zoom_range) == 2 and zoom_range != (first_date, last_date):
+                fig = progress_tracker.create_progress_chart(*zoom_range)
+            else:
+                fig = progress_tracker.create_progress_chart()
             
-            if not monthly_activity.empty:
-                fig = px.bar(
-                    monthly_activity,
-                    x='month',
-                    y='count',
-                    color='activity_type',
-                    title='Monthly Activity Distribution',
-                    labels={'count': 'Number of Activities', 'month': 'Month'}
-                )
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
-            
-            # Score trends (excluding study plans)
-            score_data = user_progress[user_progress['activity_type'] != 'study_plan']
-            if not score_data.empty:
-                st.markdown("#### 📊 Score Trends")
-                
-                fig = px.line(
-                    score_data,
-                    x='date',
-                    y='score',
-                    color='activity_type',
-                    title='Score Progression Over Time',
-                    labels={'score': 'Score (%)', 'date': 'Date'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Study consistency
-            st.markdown("#### 🔥 Study Consistency")
-            
-            # Calculate study streak
-            study_dates = user_progress['date'].dt.date.unique()
-            study_dates.sort()
-            
-            current_streak = 0
-            max_streak = 0
-            temp_streak = 0
-            
-            if len(study_dates) > 0:
-                for i in range(len(study_dates)):
-                    if i == 0:
-                        temp_streak = 1
+            else:
+                st.info("No scored activities in the selected range")
+        
+        # Study consistency
+        st.markdown("#### 🔥 Study Consistency")
+        
+        # Calculate study streak over the days with activity
+        study_dates = [day.date() for day in daily_activity['period'].unique()]
+        
+        current_streak = 0
+        max_streak = 0
+        temp_streak = 0
+        
+        if len(study_dates) > 0:
+            for i in range(len(study_dates)):
+                if i == 0:
+                    temp_streak = 1
+                else:
+                    days_diff = (study_dates[i] - study_dates[i-1]).days
+                    if days_diff == 1:
+                        temp_streak += 1
                     else:
-                        days_diff = (study_dates[i] - study_dates[i-1]).days
-                        if days_diff == 1:
-                            temp_streak += 1
-                        else:
-                            temp_streak = 1
-                    
-                    max_streak = max(max_streak, temp_streak)
+                        temp_streak = 1
                 
-                # Check current streak
-                if len(study_dates) > 0:
-                    last_study = study_dates[-1]
-                    days_since_last = (datetime.now().date() - last_study).days
-                    if days_since_last <= 1:
-                        current_streak = temp_streak
+                max_streak = max(max_streak, temp_streak)
             
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Current Streak", f"{current_streak} days")
-            with col2:
-                st.metric("Best Streak", f"{max_streak} days")
-            with col3:
-                st.metric("Total Study Days", len(study_dates))
-            
-            # Weekly study pattern
-            st.markdown("#### 📊 Weekly Study Pattern")
-            
-            user_progress['day_of_week'] = user_progress['date'].dt.day_name()
-            weekly_pattern = user_progress['day_of_week'].value_counts().reindex([
-                'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'
-            ], fill_value=0)
-            
-            fig = px.bar(
-                x=weekly_pattern.index,
-                y=weekly_pattern.values,
-                title='Study Activity by Day of Week',
-                labels={'x': 'Day of Week', 'y': 'Number of Activities'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-        else:
-            st.info("Complete some activities to see your progress tracking!")
+            # Check current streak
+            if len(study_dates) > 0:
+                last_study = study_dates[-1]
+                days_since_last = (datetime.now().date() - last_study).days
+                if days_since_last <= 1:
+                    current_streak = temp_streak
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Current Streak", f"{current_streak} days")
+        with col2:
+            st.metric("Best Streak", f"{max_streak} days")
+        with col3:
+            st.metric("Total Study Days", len(study_dates))
+        
+        # Weekly study pattern
+        st.markdown("#### 📊 Weekly Study Pattern")
+        
+        weekly_pattern = (
+            user_rollup(st.session_state.username, 'day_of_week')
+            .groupby('period')['count'].sum()
+            .reindex(DAY_NAMES, fill_value=0)
+        )
+        
+        import plotly.express as px
+        fig = px.bar(
+            x=weekly_pattern.index,
+            y=weekly_pattern.values,
+            title='Study Activity by Day of Week',
+            labels={'x': 'Day of Week', 'y': 'Number of Activities'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
     else:
-        st.error("Unable to load progress data")
+        st.info("Complete some activities to see your progress tracking!")
 
-with tab4:
+def render_study_resources():
     st.subheader("📚 Study Resources & Recommendations")
     
+    recommendations_df = load_data('recommendations')
+    
     # Show personalized recommendations based on study plans
     study_plans = get_user_study_plans(st.session_state.username)
     
@@ -423,6 +435,29 @@ with tab4:
         - Track your progress regularly
         """)
 
+# Tabs for different planner features. Only the open tab's body runs; switching tabs reruns the page
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["📝 Create Goals", "📊 My Plans", "📈 Progress Tracking", "📚 Study Resources"],
+    key="study_planner_tab",
+    on_change="rerun"
+)
+
+if tab1.open:
+    with tab1:
+        render_create_goals()
+
+if tab2.open:
+    with tab2:
+        render_my_plans()
+
+if tab3.open:
+    with tab3:
+        render_progress_tracking()
+
+if tab4.open:
+    with tab4:
+        render_study_resources()
+
 # Sidebar with quick actions
 with st.sidebar:
     st.markdown("### 🚀 Quick Actions")
@@ -1,8 +1,12 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
-from utils.data_handler import load_data
+from utils.data_handler import load_data, filter_recommendations
+from utils.catalog_store import load_catalog, sort_index, keyset_page
+from utils.schemas import observed_value_counts
+from utils.entity_ids import select_entity
+from config import RECOMMENDATION_CONFIG
+import numpy as np
 import pandas as pd
-import plotly.express as px
 
 # Require authentication
 require_auth()
@@ -18,16 +22,16 @@ if not user_data:
     st.stop()
 
 # Load data
-recommendations_df = load_data('recommendations')
-streams_df = load_data('streams')
-progress_df = load_data('user_progress')
+recommendations_df = load_catalog('recommendations')
+streams_df = load_catalog('streams')
+progress_df = load_data('user_progress', columns=['user_id', 'activity_type', 'score', 'details'])
 
 if recommendations_df is None:
     st.error("Unable to load recommendations data")
     st.stop()
 
 # Check if user has taken career quiz
-user_progress = progress_df[progress_df['user_id'] == st.session_state.username] if progress_df is not None else pd.DataFrame()
+user_progress = select_entity(progress_df, 'user', st.session_state.username) if progress_df is not None else pd.DataFrame()
 has_career_quiz = not user_progress[user_progress['activity_type'] == 'career_quiz'].empty
 has_iq_test = not user_progress[user_progress['activity_type'] == 'iq_test'].empty
 
@@ -109,38 +113,14 @@ else:
     st.info("Take our assessments to get personalized recommendations!")
 
 # Apply filters
-filtered_recs = recommendations_df.copy()
-
-if selected_stream != 'All':
-    filtered_recs = filtered_recs[filtered_recs['stream'] == selected_stream]
-
-if selected_difficulty != 'All':
-    filtered_recs = filtered_recs[filtered_recs['difficulty_level'] == selected_difficulty]
-
-if selected_resource_type != 'All':
-    filtered_recs = filtered_recs[filtered_recs['resource_type'] == selected_resource_type]
-
-# Filter by duration
-if not show_self_paced:
-    filtered_recs = filtered_recs[filtered_recs['duration'] != 'Self-paced']
-
-# Convert duration to numeric for filtering (simplified)
-def parse_duration(duration_str):
-    if 'Self-paced' in duration_str:
-        return 0
-    try:
-        if 'week' in duration_str.lower():
-            return int(duration_str.split()[0])
-        elif 'month' in duration_str.lower():
-            return int(duration_str.split()[0]) * 4
-        else:
-            return 0
-    except:
-        return 0
-
-filtered_recs['duration_weeks'] = filtered_recs['duration'].apply(parse_duration)
-if not show_self_paced:
-    filtered_recs = filtered_recs[filtered_recs['duration_weeks'] <= max_weeks]
+filtered_recs = filter_recommendations(
+    recommendations_df,
+    stream=selected_stream,
+    difficulty=selected_difficulty,
+    resource_type=selected_resource_type,
+    show_self_paced=show_self_paced,
+    max_weeks=max_weeks
+)
 
 # Sort recommendations (prioritize based on user data)
 if has_career_quiz and 'top_career' in locals():
@@ -180,11 +160,12 @@ if not filtered_recs.empty:
     st.markdown("---")
     
     # Charts
+    import plotly.express as px
     col1, col2 = st.columns(2)
     
     with col1:
         # Stream distribution
-        stream_counts = filtered_recs['stream'].value_counts()
+        stream_counts = observed_value_counts(filtered_recs['stream'])
         fig1 = px.pie(
             values=stream_counts.values,
             names=stream_counts.index,
@@ -194,7 +175,7 @@ if not filtered_recs.empty:
     
     with col2:
         # Difficulty distribution
-        difficulty_counts = filtered_recs['difficulty_level'].value_counts()
+        difficulty_counts = observed_value_counts(filtered_recs['difficulty_level'])
         fig2 = px.bar(
             x=difficulty_counts.index,
             y=difficulty_counts.values,
@@ -210,47 +191,92 @@ st.markdown("### 📖 Learning Resources")
 if filtered_recs.empty:
     st.warning("No recommendations match your current filters. Try adjusting the filters.")
 else:
-    # Group by stream for better organization
-    streams = filtered_recs['stream'].unique()
+    # Only the current page is rendered; pages are walked with a cursor over the catalog sort index
+    sort_order = sort_index(
+        'recommendations',
+        RECOMMENDATION_CONFIG['sort_columns'],
+        {'difficulty_level': RECOMMENDATION_CONFIG['difficulty_order']}
+    )
+    if sort_order is None:
+        # CSV fallback: keep the file order
+        sort_order = np.arange(len(recommendations_df))
+    selected = np.zeros(len(recommendations_df), dtype=bool)
+    selected[filtered_recs.index.to_numpy()] = True
     
-    for stream in sorted(streams):
-        stream_recs = filtered_recs[filtered_recs['stream'] == stream]
+    # Any filter change starts again from the first page
+    filter_signature = (selected_stream, selected_difficulty, selected_resource_type, show_self_paced, max_weeks)
+    if st.session_state.get('rec_filter_signature') != filter_signature:
+        st.session_state.rec_filter_signature = filter_signature
+        st.session_state.rec_page_cursors = [None]
+    
+    page_size_options = RECOMMENDATION_CONFIG['page_size_options']
+    page_size = st.selectbox(
+        "Resources per page",
+        page_size_options,
+        index=page_size_options.index(RECOMMENDATION_CONFIG['page_size']),
+        key="rec_page_size",
+        on_change=lambda: st.session_state.update(rec_page_cursors=[None])
+    )
+    
+    page_cursors = st.session_state.rec_page_cursors
+    page_rows, next_cursor = keyset_page(sort_order, selected, page_cursors[-1], page_size)
+    page_recs = recommendations_df.loc[page_rows]
+    
+    first_shown = (len(page_cursors) - 1) * page_size + 1
+    st.caption(f"Showing {first_shown}-{first_shown + len(page_recs) - 1} of {len(filtered_recs)} resources")
+    
+    current_stream = None
+    for row, rec in page_recs.iterrows():
+        # Rows arrive sorted by stream, so a header marks each new stream on the page
+        if rec['stream'] != current_stream:
+            current_stream = rec['stream']
+            st.markdown(f"### 📚 {current_stream}")
+        
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.markdown(f"#### {rec['title']}")
+            st.write(f"**Description:** {rec['description']}")
+            
+            # Tags
+            tag_col1, tag_col2, tag_col3 = st.columns(3)
+            with tag_col1:
+                st.badge(f"📊 {rec['difficulty_level']}")
+            with tag_col2:
+                st.badge(f"📝 {rec['resource_type']}")
+            with tag_col3:
+                st.badge(f"⏱️ {rec['duration']}")
         
-        with st.expander(f"📚 {stream} ({len(stream_recs)} resources)", expanded=True):
+        with col2:
+            # Platform info
+            if rec['platform'] != 'N/A':
+                st.write(f"**Platform:** {rec['platform']}")
             
-            for idx, rec in stream_recs.iterrows():
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    st.markdown(f"#### {rec['title']}")
-                    st.write(f"**Description:** {rec['description']}")
-                    
-                    # Tags
-                    tag_col1, tag_col2, tag_col3 = st.columns(3)
-                    with tag_col1:
-                        st.badge(f"📊 {rec['difficulty_level']}")
-                    with tag_col2:
-                        st.badge(f"📝 {rec['resource_type']}")
-                    with tag_col3:
-                        st.badge(f"⏱️ {rec['duration']}")
-                
-                with col2:
-                    # Platform info
-                    if rec['platform'] != 'N/A':
-                        st.write(f"**Platform:** {rec['platform']}")
-                    
-                    # Action buttons
-                    if rec['url'] != 'N/A':
-                        st.link_button("🔗 View Resource", str(rec['url']), use_container_width=True) if pd.notna(rec['url']) else st.warning("No resource link available.")
-                    
-                    if st.button(f"📌 Add to Study Plan", key=f"add_{idx}", use_container_width=True):
-                        # Add to study plan (redirect to study planner with pre-filled data)
-                        st.session_state.prefill_goal = rec['title']
-                        st.session_state.prefill_stream = rec['stream']
-                        st.success(f"Added {rec['title']} to study goals!")
-                        st.switch_page("pages/4_Study_Planner.py")
-                
-                st.markdown("---")
+            # Action buttons
+            if rec['url'] != 'N/A':
+                st.link_button("🔗 View Resource", str(rec['url']), use_container_width=True) if pd.notna(rec['url']) else st.warning("No resource link available.")
+            
+            # Keyed by catalog row so the widget identity survives paging and filtering
+            if st.button(f"📌 Add to Study Plan", key=f"add_{row}", use_container_width=True):
+                # Add to study plan (redirect to study planner with pre-filled data)
+                st.session_state.prefill_goal = rec['title']
+                st.session_state.prefill_stream = rec['stream']
+                st.success(f"Added {rec['title']} to study goals!")
+                st.switch_page("pages/4_Study_Planner.py")
+        
+        st.markdown("---")
+    
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("⬅️ Previous", key="rec_prev_page", disabled=len(page_cursors) == 1):
+            page_cursors.pop()
+            st.rerun()
+    with page_col:
+        st.write(f"Page {len(page_cursors)} of {max(1, -(-len(filtered_recs) // page_size))}")
+    with next_col:
+        if st.button("Next ➡️", key="rec_next_page", disabled=next_cursor is None):
+            page_cursors.append(next_cursor)
+            st.rerun()
 
 # Featured recommendations
 st.markdown("---")
@@ -285,10 +311,10 @@ st.markdown("### 🛣️ Suggested Learning Paths")
 
 if streams_df is not None and not filtered_recs.empty:
     # Create learning paths based on difficulty progression
-    popular_streams = filtered_recs['stream'].value_counts().head(3).index
+    popular_streams = observed_value_counts(filtered_recs['stream']).head(3).index
     
     for stream in popular_streams:
-        stream_recs = filtered_recs[filtered_recs['stream'] == stream]
+        stream_recs = select_entity(filtered_recs, 'stream', stream)
         
         if len(stream_recs) >= 2:
             with st.expander(f"🎯 {stream} Learning Path"):
@@ -1,8 +1,6 @@
 import streamlit as st
 from utils.auth import require_auth, get_current_user
-from utils.data_handler import load_data
-from utils.certificate_generator import CertificateGenerator
-import pandas as pd
+from utils.progress_tracker import user_progress_totals
 from datetime import datetime
 import base64
 
@@ -19,12 +17,13 @@ if not user_data:
     st.error("User data not found")
     st.stop()
 
-# Initialize certificate generator
-cert_generator = CertificateGenerator()
+def get_certificate_generator():
+    """Create the generator on demand, so ReportLab only loads when a certificate is generated"""
+    from utils.certificate_generator import CertificateGenerator
+    return CertificateGenerator()
 
-# Load user progress to determine achievements
-progress_df = load_data('user_progress')
-user_progress = progress_df[progress_df['user_id'] == st.session_state.username] if progress_df is not None else pd.DataFrame()
+# Stream the user's progress (and archived daily totals) into running totals to determine achievements
+progress_totals = user_progress_totals(st.session_state.username)
 
 # Tabs for different certificate types
 tab1, tab2, tab3 = st.tabs(["🏆 Available Certificates", "📜 My Certificates", "🎯 Achievement Tracker"])
@@ -42,16 +41,15 @@ with tab1:
     certificates_available = []
     
     # IQ Test Certificate
-    iq_tests = user_progress[user_progress['activity_type'] == 'iq_test']
-    if not iq_tests.empty:
-        best_iq_score = iq_tests['score'].max()
+    if 'iq_test' in progress_totals.best:
+        best_iq_score, best_iq_date = progress_totals.best['iq_test']
         if best_iq_score >= 75:
             certificates_available.append({
                 'type': 'IQ Assessment Excellence',
                 'description': f'Outstanding performance in cognitive assessment (Score: {best_iq_score:.1f}%)',
                 'earned': True,
                 'score': best_iq_score,
-                'date': iq_tests.loc[iq_tests['score'].idxmax(), 'date']
+                'date': best_iq_date
             })
         else:
             certificates_available.append({
@@ -59,7 +57,7 @@ with tab1:
                 'description': f'Completed cognitive assessment (Score: {best_iq_score:.1f}%)',
                 'earned': True,
                 'score': best_iq_score,
-                'date': iq_tests.loc[iq_tests['score'].idxmax(), 'date']
+                'date': best_iq_date
             })
     else:
         certificates_available.append({
@@ -70,15 +68,14 @@ with tab1:
         })
     
     # Career Quiz Certificate
-    career_quizzes = user_progress[user_progress['activity_type'] == 'career_quiz']
-    if not career_quizzes.empty:
-        latest_career = career_quizzes.iloc[-1]
+    if 'career_quiz' in progress_totals.latest:
+        latest_career_score, latest_career_date = progress_totals.latest['career_quiz']
         certificates_available.append({
             'type': 'Career Path Discovery',
             'description': 'Successfully completed career assessment and discovered your ideal path',
             'earned': True,
-            'score': latest_career['score'],
-            'date': latest_career['date']
+            'score': latest_career_score,
+            'date': latest_career_date
         })
     else:
         certificates_available.append({
@@ -89,7 +86,7 @@ with tab1:
         })
     
     # Activity Milestone Certificates
-    total_activities = len(user_progress)
+    total_activities = progress_totals.total
     
     milestones = [5, 10, 25, 50, 100]
     for milestone in milestones:
@@ -110,15 +107,13 @@ with tab1:
             })
     
     # High Performance Certificate
-    scored_activities = user_progress[user_progress['activity_type'] != 'study_plan']
-    if not scored_activities.empty:
-        avg_score = scored_activities['score'].mean()
-        high_scores = scored_activities[scored_activities['score'] >= 90]
+    if progress_totals.assessments > 0:
+        avg_score = progress_totals.assessment_average
         
-        if len(high_scores) >= 3:
+        if progress_totals.high_scores >= 3:
             certificates_available.append({
                 'type': 'High Performance Excellence',
-                'description': f'Achieved 90%+ scores in {len(high_scores)} assessments',
+                'description': f'Achieved 90%+ scores in {progress_totals.high_scores} assessments',
                 'earned': True,
                 'score': avg_score,
                 'date': datetime.now()
@@ -155,6 +150,7 @@ with tab1:
                         # Generate certificate
                         cert_date = cert['date'].strftime('%B %d, %Y') if hasattr(cert['date'], 'strftime') else datetime.now().strftime('%B %d, %Y')
                         
+                        cert_generator = get_certificate_generator()
                         if 'score' in cert and cert['score']:
                             pdf_data = cert_generator.generate_completion_certificate(
                                 user_name=user_data['Name'],
@@ -203,12 +199,12 @@ with tab2:
     """)
     
     # Sample certificate preview
-    if user_progress is not None and not user_progress.empty:
+    if progress_totals.total > 0:
         st.markdown("#### 🖼️ Certificate Preview")
         
         if st.button("Preview Sample Certificate"):
             # Generate a sample certificate
-            sample_pdf = cert_generator.generate_completion_certificate(
+            sample_pdf = get_certificate_generator().generate_completion_certificate(
                 user_name=user_data['Name'],
                 course_name="Platform Participation",
                 completion_date=datetime.now().strftime('%B %d, %Y'),
@@ -256,11 +252,11 @@ with tab3:
     st.subheader("🎯 Achievement Progress")
     
     # Progress towards various achievements
-    if not user_progress.empty:
+    if progress_totals.total > 0:
         st.markdown("### 📊 Your Learning Journey")
         
         # Activity progress
-        total_activities = len(user_progress)
+        total_activities = progress_totals.total
         st.markdown(f"**Total Activities Completed:** {total_activities}")
         
         # Progress bars for milestones
@@ -279,10 +275,8 @@ with tab3:
             st.markdown("---")
         
         # Score achievements
-        scored_activities = user_progress[user_progress['activity_type'] != 'study_plan']
-        if not scored_activities.empty:
-            avg_score = scored_activities['score'].mean()
-            high_scores = scored_activities[scored_activities['score'] >= 90]
+        if progress_totals.assessments > 0:
+            avg_score = progress_totals.assessment_average
             
             col1, col2, col3 = st.columns(3)
             
@@ -290,22 +284,17 @@ with tab3:
                 st.metric("Average Score", f"{avg_score:.1f}%")
             
             with col2:
-                st.metric("High Scores (90%+)", len(high_scores))
+                st.metric("High Scores (90%+)", progress_totals.high_scores)
             
             with col3:
-                st.metric("Total Assessments", len(scored_activities))
+                st.metric("Total Assessments", progress_totals.assessments)
             
             # Score distribution chart
-            if len(scored_activities) > 1:
+            if progress_totals.assessments > 1:
                 st.markdown("#### 📈 Score Distribution")
-                score_ranges = ['0-50%', '51-70%', '71-85%', '86-95%', '96-100%']
-                score_counts = [
-                    len(scored_activities[scored_activities['score'] <= 50]),
-                    len(scored_activities[(scored_activities['score'] > 50) & (scored_activities['score'] <= 70)]),
-                    len(scored_activities[(scored_activities['score'] > 70) & (scored_activities['score'] <= 85)]),
-                    len(scored_activities[(scored_activities['score'] > 85) & (scored_activities['score'] <= 95)]),
-                    len(scored_activities[scored_activities['score'] > 95])
-                ]
+                distribution = progress_totals.score_distribution()
+                score_ranges = list(distribution)
+                score_counts = list(distribution.values())
                 
                 import plotly.express as px
                 fig = px.bar(
@@ -317,12 +306,10 @@ with tab3:
                 st.plotly_chart(fig, use_container_width=True)
         
         # Learning streak
-        if 'date' in user_progress.columns:
-            user_progress['date'] = pd.to_datetime(user_progress['date'])
-            unique_dates = user_progress['date'].dt.date.unique()
+        if progress_totals.learning_days:
+            unique_dates = sorted(progress_totals.learning_days)
             
             # Calculate current streak
-            unique_dates.sort()
             current_streak = 0
             
             if len(unique_dates) > 0:
@@ -391,10 +378,10 @@ with tab3:
 with st.sidebar:
     st.markdown("### 📊 Quick Stats")
     
-    if not user_progress.empty:
-        total_activities = len(user_progress)
-        iq_tests = len(user_progress[user_progress['activity_type'] == 'iq_test'])
-        career_quizzes = len(user_progress[user_progress['activity_type'] == 'career_quiz'])
+    if progress_totals.total > 0:
+        total_activities = progress_totals.total
+        iq_tests = progress_totals.activity_counts['iq_test']
+        career_quizzes = progress_totals.activity_counts['career_quiz']
         
         st.metric("Total Activities", total_activities)
         st.metric("IQ Tests Taken", iq_tests)
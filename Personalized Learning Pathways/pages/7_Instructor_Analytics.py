@@ -0,0 +1,137 @@
+import streamlit as st
+from utils.auth import require_instructor
+from utils.cohort_analytics import cohort_view
+from config import INSTRUCTOR_CONFIG
+from datetime import date
+
+# Require an instructor account
+require_instructor()
+
+st.set_page_config(page_title="Instructor Analytics", page_icon="🧑‍🏫", layout="wide")
+
+st.title("🧑‍🏫 Instructor Analytics")
+
+as_of = st.date_input("As of", value=date.today(), max_value=date.today(), key="instructor_as_of")
+view = cohort_view(as_of)
+
+if view.roster_missing:
+    st.warning("Student list not found: showing every student with recorded activity")
+
+# Cohort metrics
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    st.metric("Students", f"{view.summary['students']:,}")
+
+with col2:
+    st.metric("Active in the Last 7 Days", f"{view.summary['active_week']:,}")
+
+with col3:
+    st.metric("At Risk", f"{view.summary['at_risk']:,}")
+
+with col4:
+    average = view.summary['average_score']
+    st.metric("Assessment Average", "N/A" if average != average else f"{average:.1f}%")
+
+st.markdown("---")
+
+# Tab bodies with widgets are fragments: interacting with them reruns only that tab
+def render_at_risk():
+    st.subheader("⚠️ At-Risk Students")
+    st.caption(
+        f"No activity for {INSTRUCTOR_CONFIG['inactive_days']} days or more, or an assessment average "
+        f"below {INSTRUCTOR_CONFIG['low_score']}% over at least {INSTRUCTOR_CONFIG['min_assessments']} assessments"
+    )
+    if view.at_risk.empty:
+        st.success("No students are at risk")
+        return
+    st.dataframe(
+        view.at_risk,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Last Active': st.column_config.DateColumn(format="YYYY-MM-DD"),
+            'Assessment Average': st.column_config.NumberColumn(format="%.1f%%")
+        }
+    )
+
+@st.fragment(key="instructor_weekly_activity")
+def render_weekly_activity():
+    import plotly.express as px
+
+    st.subheader("🗓️ Weekly Activity")
+    selection = st.radio(
+        "Students",
+        options=['most_active', 'at_risk'],
+        format_func=lambda option: {'most_active': "Most active", 'at_risk': "At risk"}[option],
+        horizontal=True,
+        key="instructor_heatmap_students"
+    )
+    heatmap = view.activity_heatmap(selection)
+    if heatmap.empty:
+        st.info("No student activity in these weeks")
+        return
+    fig = px.imshow(
+        heatmap,
+        aspect='auto',
+        color_continuous_scale='Blues',
+        labels={'x': 'Week starting', 'y': 'Student', 'color': 'Activities'},
+        title=f"Activities per week, {len(heatmap)} students"
+    )
+    fig.update_layout(height=max(300, 18 * len(heatmap) + 120))
+    st.plotly_chart(fig, use_container_width=True)
+
+    fig = px.bar(view.weekly_totals, x='Week', y='Activities', title="All students")
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_stream_scores():
+    import plotly.express as px
+
+    st.subheader("📈 IQ Test Accuracy by Stream")
+    if view.stream_bands.empty:
+        st.info(f"No stream has a student with {INSTRUCTOR_CONFIG['min_answers']} or more answered IQ test questions yet")
+        return
+    fig = px.imshow(
+        view.stream_bands,
+        aspect='auto',
+        color_continuous_scale='Viridis',
+        labels={'x': 'Accuracy', 'y': 'Stream', 'color': 'Students'},
+        title="Students per accuracy band"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(view.stream_summary, use_container_width=True, hide_index=True)
+
+def render_career_fields():
+    import plotly.express as px
+
+    st.subheader("💼 Career Fields")
+    fig = px.bar(
+        view.careers,
+        x='Career Field',
+        y='Students',
+        title="Top career field of each student's latest career quiz"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+# Only the open tab's body runs; switching tabs reruns the page
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["⚠️ At-Risk Students", "🗓️ Weekly Activity", "📈 Stream Scores", "💼 Career Fields"],
+    key="instructor_tab",
+    on_change="rerun"
+)
+
+if tab1.open:
+    with tab1:
+        render_at_risk()
+
+if tab2.open:
+    with tab2:
+        render_weekly_activity()
+
+if tab3.open:
+    with tab3:
+        render_stream_scores()
+
+if tab4.open:
+    with tab4:
+        render_career_fields()
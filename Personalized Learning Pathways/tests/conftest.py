@@ -0,0 +1,61 @@
+"""
+Shared pytest setup. Tests import the app's modules and run against the app
+directory, like the pages and the `python -m utils.<tool>` commands:
+
+    python -m pytest tests [--startup-budgets --budget-scale 1.5] [--bench-rows 10000 100000]
+"""
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+def pytest_addoption(parser):
+    group = parser.getgroup('plp', "Personalized Learning Platform")
+    group.addoption(
+        '--startup-budgets', action='store_true', default=os.environ.get('PLP_STARTUP_BUDGETS') == '1',
+        help="Run the startup time budget tests, which depend on the machine (or PLP_STARTUP_BUDGETS=1)"
+    )
+    group.addoption(
+        '--budget-scale', type=float, default=float(os.environ.get('PLP_BUDGET_SCALE', 1.0)),
+        help="Multiply every startup time budget, for machines slower than a developer laptop (or PLP_BUDGET_SCALE)"
+    )
+    group.addoption(
+        '--bench-rows', type=int, nargs='+', default=[10000],
+        help="Progress table sizes of the synthetic datasets the benchmarks run against"
+    )
+    group.addoption(
+        '--bench-rounds', type=int, default=5,
+        help="Timed rounds per benchmark case (after one warm-up round)"
+    )
+    group.addoption(
+        '--bench-work-dir', default=os.path.join(APP_DIR, 'bench_data'),
+        help="Where generated datasets are kept between runs"
+    )
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "startup_budget: timed against utils.import_budget, run with --startup-budgets")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--startup-budgets'):
+        return
+    skip = pytest.mark.skip(reason="startup budgets depend on the machine; run with --startup-budgets")
+    for item in items:
+        if 'startup_budget' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture
+def app_dir(monkeypatch):
+    """Run the test from the app directory"""
+    monkeypatch.chdir(APP_DIR)
+    return APP_DIR
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    """Run the test from an empty app directory (an empty data/ folder under tmp_path)"""
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,54 @@
+"""
+compact_store: keyed rows keep the first row of each attempt_id, unkeyed
+rows are dropped only when every field repeats, and the kept rows are
+written back unchanged.
+"""
+import pandas as pd
+
+from utils.compact_stores import compact_store
+
+QUIZ_RESULTS = (
+    "user_id,quiz_type,score,details,attempt_id\n"
+    "a,iq_test,94.11764705882352,first,85716486848512001\n"
+    # A rerun of the same attempt, scored again
+    "a,iq_test,50.0,rerun,85716486848512001\n"
+    # Rows written before submissions were keyed
+    "b,iq_test,80.0,legacy,\n"
+    "b,iq_test,80.0,legacy,\n"
+    "b,iq_test,80.0,retaken,\n"
+    "c,career_quiz,75.0,\"Field: Technology, Science\",85716486848512002\n"
+)
+
+def test_compact_store_drops_keyed_and_unkeyed_duplicates(work_dir):
+    file_path = work_dir / 'data' / 'quiz_results.csv'
+    file_path.write_text(QUIZ_RESULTS)
+
+    assert compact_store(str(file_path)) == (6, 4)
+    kept = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    assert kept['details'].tolist() == ['first', 'legacy', 'retaken', 'Field: Technology, Science']
+    # Ids and scores are written back as they were read
+    assert kept['attempt_id'].tolist() == ['85716486848512001', '', '', '85716486848512002']
+    assert kept['score'].tolist()[0] == '94.11764705882352'
+
+    # Already compact
+    assert compact_store(str(file_path)) == (4, 4)
+
+def test_compact_store_dry_run_leaves_the_file(work_dir):
+    file_path = work_dir / 'data' / 'quiz_results.csv'
+    file_path.write_text(QUIZ_RESULTS)
+
+    assert compact_store(str(file_path), dry_run=True) == (6, 4)
+    assert file_path.read_text() == QUIZ_RESULTS
+
+def test_compact_store_without_attempt_ids(work_dir):
+    file_path = work_dir / 'data' / 'user_progress.csv'
+    file_path.write_text(
+        "user_id,activity_type,score\n"
+        "a,iq_test,80.0\n"
+        "a,iq_test,80.0\n"
+        "a,iq_test,81.0\n"
+    )
+
+    assert compact_store(str(file_path)) == (3, 2)
+    assert pd.read_csv(file_path)['score'].tolist() == [80.0, 81.0]
+    assert compact_store(str(work_dir / 'data' / 'missing.csv')) == (0, 0)
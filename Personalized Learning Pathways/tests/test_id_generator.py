@@ -0,0 +1,95 @@
+"""
+IdGenerator: ids increase strictly, also when the clock steps back or the
+per-millisecond sequence runs out. lease_worker_id: a worker id held by
+one process (or open lease) is never handed to another until released.
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from utils import id_generator
+from utils.id_generator import MAX_SEQUENCE, TIMESTAMP_SHIFT, WORKER_SHIFT, IdGenerator, lease_worker_id
+
+def _fields(id_value):
+    return id_value >> TIMESTAMP_SHIFT, (id_value >> WORKER_SHIFT) & 0x3FF, id_value & MAX_SEQUENCE
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the generator's clock with a list of readings in milliseconds (the last one repeats)"""
+    readings = []
+
+    def time_ns():
+        reading = readings.pop(0) if len(readings) > 1 else readings[0]
+        return (reading + id_generator.EPOCH_MS) * 1_000_000
+
+    monkeypatch.setattr(id_generator.time, 'time_ns', time_ns)
+    return readings
+
+@pytest.fixture
+def leases():
+    """Release the worker ids a test leased"""
+    held = set(id_generator._leases)
+    yield
+    for worker_id in set(id_generator._leases) - held:
+        os.close(id_generator._leases.pop(worker_id))
+
+def test_ids_increase_across_threads():
+    generator = IdGenerator(worker_id=7)
+    ids = [[] for _ in range(4)]
+    threads = [threading.Thread(target=lambda out=out: out.extend(generator.next_id() for _ in range(5000))) for out in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for thread_ids in ids:
+        assert all(a < b for a, b in zip(thread_ids, thread_ids[1:]))
+    every_id = [id_value for thread_ids in ids for id_value in thread_ids]
+    assert len(set(every_id)) == len(every_id)
+    assert {_fields(id_value)[1] for id_value in every_id} == {7}
+
+def test_sequence_rollover_moves_to_the_next_millisecond(clock):
+    generator = IdGenerator(worker_id=1)
+    # One millisecond for the first full sequence and the exhausted call, then the next one
+    clock.extend([1000] * (MAX_SEQUENCE + 2) + [1001])
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 2)]
+
+    assert [_fields(id_value)[2] for id_value in ids[:-1]] == list(range(MAX_SEQUENCE + 1))
+    assert {_fields(id_value)[0] for id_value in ids[:-1]} == {1000}
+    assert _fields(ids[-1]) == (1001, 1, 0)
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+def test_clock_stepping_back_keeps_ids_increasing(clock):
+    generator = IdGenerator(worker_id=2)
+    clock.extend([5000, 4000, 4000, 5001])
+    ids = [generator.next_id() for _ in range(4)]
+
+    assert [_fields(id_value)[0] for id_value in ids] == [5000, 5000, 5000, 5001]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+def test_worker_id_out_of_range():
+    with pytest.raises(ValueError):
+        IdGenerator(worker_id=1024)
+
+def _lease_in_other_process(lease_dir):
+    result = subprocess.run(
+        [sys.executable, '-c', f"from utils.id_generator import lease_worker_id; print(lease_worker_id({str(lease_dir)!r}))"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    )
+    return int(result.stdout)
+
+def test_lease_worker_id_excludes_held_ids(tmp_path, leases):
+    lease_dir = tmp_path / 'worker_ids'
+    assert lease_worker_id(str(lease_dir)) == 0
+    assert lease_worker_id(str(lease_dir)) == 1
+    # Another process skips the ids held here; its own lease ends with it
+    assert _lease_in_other_process(lease_dir) == 2
+    assert _lease_in_other_process(lease_dir) == 2
+
+    # Releasing a lease frees its id
+    os.close(id_generator._leases.pop(0))
+    assert _lease_in_other_process(lease_dir) == 0
@@ -0,0 +1,28 @@
+"""
+Startup budgets of utils.import_budget: the login screen (cold start) and
+the first screen of the IQ test, career quiz and certificate pages, each
+rendered in a fresh `python -X importtime` interpreter. The budgets are for
+a developer laptop and timings depend on the machine and its load, so these
+tests only run when asked for with --startup-budgets (or
+PLP_STARTUP_BUDGETS=1); scale the budgets on slower machines with
+--budget-scale (or PLP_BUDGET_SCALE):
+
+    python -m pytest tests/test_import_budget.py --startup-budgets --budget-scale 1.5
+"""
+import pytest
+
+from utils.import_budget import STARTUP_BUDGETS, check_budgets
+
+@pytest.mark.startup_budget
+@pytest.mark.parametrize('scenario', list(STARTUP_BUDGETS))
+def test_startup_budget(app_dir, scenario, request):
+    results, violations = check_budgets(
+        repeats=3,
+        budget_scale=request.config.getoption('--budget-scale'),
+        scenarios=[scenario]
+    )
+    summary = results[scenario]
+    assert not violations, (
+        "\n".join(violations)
+        + f"\nslowest page imports: {', '.join(f'{module} {ms:.0f}ms' for ms, module in summary['top_imports'][:5])}"
+    )
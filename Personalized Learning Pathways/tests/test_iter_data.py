@@ -0,0 +1,69 @@
+"""
+iter_data: the user, activity type and date filters are applied to every
+chunk as it is read, so only matching rows are kept, each chunk holds at
+most chunk_rows rows, and chunks without matches are skipped.
+"""
+import pandas as pd
+import pytest
+
+from utils import entity_ids
+from utils.data_handler import iter_data
+
+PROGRESS = (
+    "progress_id,user_id,activity_type,date,score,details\n"
+    "1,Alice,iq_test,2025-01-01 09:00:00,80.0,a\n"
+    "2,Bob,iq_test,2025-01-01 10:00:00,70.0,b\n"
+    "3,Alice,study_plan,2025-01-02 09:00:00,0.0,c\n"
+    "4,Bob,career_quiz,2025-01-03 09:00:00,75.0,d\n"
+    "5,Bob,iq_test,2025-01-04 09:00:00,60.0,e\n"
+    "6,Bob,iq_test,2025-01-05 09:00:00,65.0,f\n"
+    "7,Alice,iq_test,2025-01-06 09:00:00,90.0,g\n"
+    "8,Alice,career_quiz,2025-01-07 09:00:00,85.0,h\n"
+)
+
+@pytest.fixture
+def progress(work_dir, monkeypatch):
+    (work_dir / 'data' / 'user_progress.csv').write_text(PROGRESS)
+    # The entity dictionary is built for this directory's files
+    monkeypatch.setattr(entity_ids, '_dictionary', None)
+    return work_dir
+
+def _ids(chunks):
+    return [int(progress_id) for chunk in chunks for progress_id in chunk['progress_id']]
+
+def test_filters_are_applied_per_chunk(progress):
+    chunks = list(iter_data(
+        'user_progress', user_id='Alice', activity_types=['iq_test', 'career_quiz'],
+        start='2025-01-01', end='2025-01-07', chunk_rows=2
+    ))
+
+    assert _ids(chunks) == [1, 7]
+    # Rows 3-6 are read in chunks with no match, which are not yielded
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert all(len(chunk) <= 2 for chunk in chunks)
+
+def test_chunks_are_typed(progress):
+    chunk = next(iter_data('user_progress', user_id='Bob', chunk_rows=3))
+
+    assert pd.api.types.is_datetime64_any_dtype(chunk['date'])
+    assert chunk['score'].dtype == 'float64'
+    assert isinstance(chunk['activity_type'].dtype, pd.CategoricalDtype)
+    assert chunk['user_code'].nunique() == 1
+
+def test_columns_keep_the_filtered_ones(progress):
+    chunks = list(iter_data('user_progress', columns=['score'], user_id='Bob', start='2025-01-04', chunk_rows=4))
+
+    assert [score for chunk in chunks for score in chunk['score']] == [60.0, 65.0]
+    assert {'score', 'user_id', 'date'} <= set(chunks[0].columns)
+    assert 'details' not in chunks[0].columns
+
+def test_no_matches(progress):
+    assert list(iter_data('user_progress', user_id='Nobody', chunk_rows=2)) == []
+    assert list(iter_data('user_progress', activity_types=[], chunk_rows=2)) == []
+    assert list(iter_data('user_progress', start='2026-01-01', chunk_rows=2)) == []
+
+def test_unfiltered_chunks_cover_the_file(progress):
+    chunks = list(iter_data('user_progress', chunk_rows=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+    assert _ids(chunks) == list(range(1, 9))
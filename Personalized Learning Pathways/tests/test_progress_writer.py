@@ -0,0 +1,74 @@
+"""
+GroupCommitWriter and append_rows: records with an attempt_id are written
+at most once per file, and a saturated writer rejects submissions with
+queue.Full after the enqueue timeout.
+"""
+import queue
+import time
+
+import pandas as pd
+import pytest
+
+from utils.file_lock import exclusive_lock
+from utils.progress_writer import GroupCommitWriter, append_rows
+
+def _record(user_id, attempt_id=None):
+    record = {'user_id': user_id, 'activity_type': 'iq_test', 'score': 80.0}
+    if attempt_id is not None:
+        record['attempt_id'] = attempt_id
+    return record
+
+@pytest.fixture
+def writer():
+    writer = GroupCommitWriter(queue_size=1, max_batch=1, enqueue_timeout=0.2, fsync=False)
+    yield writer
+    writer.close(timeout=5)
+
+def test_append_rows_skips_attempts_already_written(work_dir):
+    file_path = str(work_dir / 'data' / 'quiz_results.csv')
+    assert append_rows(file_path, [_record('a', 1), _record('b')], fsync=False) == [0, 1]
+    # Repeated within the batch, already in the file, and records without an attempt
+    assert append_rows(file_path, [_record('c', 2), _record('c', 2), _record('a', 1), _record('b')], fsync=False) == [0, 3]
+
+    saved = pd.read_csv(file_path, dtype={'attempt_id': 'Int64'})
+    assert saved['user_id'].tolist() == ['a', 'b', 'c', 'b']
+    assert saved['attempt_id'].dropna().tolist() == [1, 2]
+
+def test_submit_resolves_false_for_a_resubmitted_attempt(writer, work_dir):
+    file_path = str(work_dir / 'data' / 'user_progress.csv')
+    # A 64-bit id survives the round trip through the CSV
+    attempt_id = 85716486848512001
+    first = writer.submit(file_path, _record('a', attempt_id))
+    # Known while still queued, so a rerun never reaches the queue
+    assert writer.submit(file_path, _record('a', attempt_id)).result(timeout=5) is False
+    assert first.result(timeout=5) is True
+    assert writer.submit(file_path, _record('a', attempt_id)).result(timeout=5) is False
+
+    # A new writer (another process) sees the id through the file
+    other = GroupCommitWriter(queue_size=1, max_batch=1, fsync=False)
+    try:
+        assert other.submit(file_path, _record('a', attempt_id)).result(timeout=5) is False
+    finally:
+        other.close(timeout=5)
+    assert pd.read_csv(file_path, dtype={'attempt_id': 'Int64'})['attempt_id'].tolist() == [attempt_id]
+
+def test_submit_raises_queue_full_when_the_writer_is_saturated(writer, work_dir):
+    file_path = str(work_dir / 'data' / 'user_progress.csv')
+    with exclusive_lock(file_path):
+        # The writer thread takes the first record and blocks on the file lock; the second fills the queue
+        first = writer.submit(file_path, _record('a', 1))
+        deadline = time.monotonic() + 5
+        while not writer._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        second = writer.submit(file_path, _record('b', 2))
+
+        started = time.monotonic()
+        with pytest.raises(queue.Full):
+            writer.submit(file_path, _record('c', 3))
+        assert time.monotonic() - started >= 0.2
+        assert not first.done() and not second.done()
+
+    assert first.result(timeout=5) is True and second.result(timeout=5) is True
+    # The rejected attempt was not left pending, so it can be saved again
+    assert writer.submit(file_path, _record('c', 3)).result(timeout=5) is True
+    assert pd.read_csv(file_path)['user_id'].tolist() == ['a', 'b', 'c']
@@ -0,0 +1,102 @@
+"""
+compact_history: old events move to the archive with every per-user total
+and Dashboard metric unchanged, and a compaction whose verification fails
+leaves the CSV and the archive as they were.
+"""
+import os
+
+import pytest
+
+from utils import entity_ids, retention
+from utils.retention import compact_history, dashboard_metrics, read_archive
+
+AS_OF = '2025-06-30'
+
+PROGRESS = (
+    "progress_id,user_id,activity_type,date,score,details\n"
+    "1,Alice,iq_test,2025-01-06 09:00:00,80.0,a\n"
+    "2,Alice,iq_test,2025-01-06 18:00:00,60.0,b\n"
+    "3,Bob,career_quiz,2025-02-03 09:00:00,75.0,c\n"
+    "4,Alice,study_plan,2025-03-10 09:00:00,0.0,d\n"
+    "5,Bob,iq_test,2025-03-11 09:00:00,95.0,e\n"
+    "6,Alice,iq_test,2025-06-20 09:00:00,90.0,f\n"
+    "7,Bob,iq_test,2025-06-25 09:00:00,55.0,g\n"
+)
+
+@pytest.fixture
+def progress(work_dir, monkeypatch):
+    source = work_dir / 'data' / 'user_progress.csv'
+    source.write_bytes(PROGRESS.encode())
+    monkeypatch.setattr(entity_ids, '_dictionary', None)
+    return source
+
+def _archive_files(work_dir):
+    return [name for _, _, names in os.walk(work_dir / 'data' / 'progress_archive') for name in names if name.endswith('.parquet')]
+
+def _assert_unchanged(progress, work_dir):
+    assert progress.read_bytes() == PROGRESS.encode()
+    assert read_archive().empty
+    assert _archive_files(work_dir) == []
+    assert not os.path.exists(f"{progress}.retention-backup")
+
+def test_compaction_keeps_totals_and_dashboard_metrics(progress, work_dir):
+    metrics_before = {user_id: dashboard_metrics(user_id) for user_id in ('Alice', 'Bob')}
+
+    report = compact_history(raw_days=30, as_of=AS_OF)
+
+    assert report['problems'] == []
+    assert (report['archived_rows'], report['kept_rows']) == (5, 2)
+    # Alice's two rows on 2025-01-06 become one daily total
+    assert report['daily_rows'] == 4
+    assert sorted(report['verified_users']) == ['Alice', 'Bob']
+    assert progress.read_text().splitlines()[1:] == PROGRESS.splitlines()[6:]
+
+    archived = read_archive()
+    assert int(archived['count'].sum()) == 5
+    assert archived['score_sum'].sum() == pytest.approx(80 + 60 + 75 + 0 + 95)
+    assert {user_id: dashboard_metrics(user_id) for user_id in ('Alice', 'Bob')} == metrics_before
+
+def test_dry_run_changes_nothing(progress, work_dir):
+    report = compact_history(raw_days=30, as_of=AS_OF, dry_run=True)
+
+    assert (report['archived_rows'], report['kept_rows'], report['daily_rows']) == (5, 2, 4)
+    _assert_unchanged(progress, work_dir)
+
+def test_totals_mismatch_rolls_back(progress, work_dir, monkeypatch):
+    totals_after = retention._totals_after
+
+    class MissingRow:
+        def __init__(self, totals):
+            self.totals = totals
+
+        def result(self):
+            result = self.totals.result()
+            result.loc['Alice', 'count'] -= 1
+            return result
+
+    monkeypatch.setattr(retention, '_totals_after', lambda *args: MissingRow(totals_after(*args)))
+    report = compact_history(raw_days=30, as_of=AS_OF)
+
+    assert report['problems'] == ["count differs for 1 users, e.g. Alice"]
+    _assert_unchanged(progress, work_dir)
+    assert retention._read_manifest(retention._archive_dir()) == {'parts': [], 'pending': None}
+
+def test_dashboard_mismatch_restores_the_csv(progress, work_dir, monkeypatch):
+    calls = []
+
+    def drifting_metrics(user_id):
+        # The second call is made after the CSV swap
+        calls.append(user_id)
+        metrics = dashboard_metrics(user_id)
+        return dict(metrics, learning_streak=metrics['learning_streak'] + 1) if len(calls) > 1 else metrics
+
+    monkeypatch.setattr(retention, 'dashboard_metrics', drifting_metrics)
+    report = compact_history(raw_days=30, as_of=AS_OF, verify_users=1)
+
+    assert len(report['problems']) == 1 and 'learning_streak' in report['problems'][0]
+    _assert_unchanged(progress, work_dir)
+    assert retention._read_manifest(retention._archive_dir()) == {'parts': [], 'pending': None}
+
+def test_raw_days_below_the_minimum(progress):
+    with pytest.raises(ValueError):
+        compact_history(raw_days=7, as_of=AS_OF)
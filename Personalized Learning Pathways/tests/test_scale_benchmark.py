@@ -0,0 +1,49 @@
+"""
+pytest-benchmark suite for the data-heavy code paths: the cases of
+utils.scale_benchmark (load_data, ProgressTracker, get_random_questions,
+the Recommendations filter and paging, CertificateGenerator), each timed on
+seeded synthetic datasets at every --bench-rows size. Needs pytest-benchmark.
+Write the results as JSON, save a baseline, or fail on a regression against
+the last saved run, from the app directory:
+
+    python -m pytest tests/test_scale_benchmark.py --bench-rows 10000 100000 1000000 --benchmark-json=bench.json
+    python -m pytest tests/test_scale_benchmark.py --benchmark-save=baseline
+    python -m pytest tests/test_scale_benchmark.py --benchmark-compare --benchmark-compare-fail=median:25%
+"""
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from utils.scale_benchmark import _reset_caches, benchmark_cases, prepare_dataset
+
+# The heaviest synthetic student, so per-user work scales with the table
+USER_ID = 'Student 0000000'
+
+CASES = {name: (setup, run) for name, setup, run in benchmark_cases(USER_ID)}
+
+def pytest_generate_tests(metafunc):
+    if 'progress_rows' in metafunc.fixturenames:
+        metafunc.parametrize('progress_rows', metafunc.config.getoption('--bench-rows'))
+
+@pytest.fixture
+def dataset(progress_rows, request, monkeypatch):
+    """Work in the synthetic dataset with progress_rows rows (generated on first use), with cold caches"""
+    dataset_dir = os.path.abspath(prepare_dataset(request.config.getoption('--bench-work-dir'), progress_rows))
+    monkeypatch.chdir(dataset_dir)
+    _reset_caches()
+    yield dataset_dir
+    _reset_caches()
+
+@pytest.mark.parametrize('case', list(CASES))
+def test_hot_path(benchmark, dataset, progress_rows, case, request):
+    setup, run = CASES[case]
+    state = setup()
+    benchmark.group = f"{progress_rows} progress rows"
+    benchmark.extra_info['progress_rows'] = progress_rows
+    result = benchmark.pedantic(
+        run, args=(state,),
+        rounds=request.config.getoption('--bench-rounds'), warmup_rounds=1, iterations=1
+    )
+    assert result is not None
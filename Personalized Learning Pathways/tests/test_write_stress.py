@@ -0,0 +1,16 @@
+"""
+Concurrent saves through utils.write_stress at a small scale: processes
+and threads saving to one CSV at once lose and duplicate no record, both
+through the group-commit writer and through the locked append.
+"""
+import pytest
+
+from utils.write_stress import run_stress_test
+
+@pytest.mark.parametrize('mode', ['writer', 'append'])
+def test_concurrent_saves_lose_nothing(tmp_path, mode):
+    result = run_stress_test(processes=2, threads=4, records=50, mode=mode, fsync=False, work_dir=str(tmp_path))
+
+    assert result['failed_processes'] == 0
+    assert result['written_rows'] == result['expected_records'] == 400
+    assert result['lost_records'] == 0 and result['duplicate_rows'] == 0
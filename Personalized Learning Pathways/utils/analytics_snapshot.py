@@ -0,0 +1,201 @@
+"""
+Parquet analytics snapshots of the progress and quiz result stores.
+
+Snapshots are hive-partitioned by date (date=YYYY-MM-DD) with typed
+columns: dictionary-encoded user/activity columns, int64 millisecond
+timestamps and float32 scores. Exports are incremental: a watermark
+records the byte offset of the source CSV already exported, and only the
+rows appended after it are read in chunks of PROGRESS_CONFIG['chunk_rows']
+and written as new partition files. Run from the app directory:
+
+    python -m utils.analytics_snapshot [--full] [user_progress quiz_results]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import PROGRESS_CONFIG
+from utils.file_lock import exclusive_lock
+from utils.rollup_cube import ByteRange
+
+SNAPSHOT_ROOT = 'data/snapshots'
+WATERMARK_FILE = '_watermark.json'
+
+SNAPSHOT_SOURCES = {
+    'user_progress': 'data/user_progress.csv',
+    'quiz_results': 'data/quiz_results.csv'
+}
+
+SNAPSHOT_SCHEMAS = {
+    'user_progress': pa.schema([
+        ('progress_id', pa.int64()),
+        ('user_id', pa.dictionary(pa.int32(), pa.string())),
+        ('activity_type', pa.dictionary(pa.int8(), pa.string())),
+        ('timestamp', pa.int64()),
+        ('score', pa.float32()),
+        ('details', pa.string())
+    ]),
+    'quiz_results': pa.schema([
+        ('user_id', pa.dictionary(pa.int32(), pa.string())),
+        ('quiz_type', pa.dictionary(pa.int8(), pa.string())),
+        ('score', pa.float32()),
+        ('details', pa.string())
+    ])
+}
+
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+def _snapshot_dir(data_type, root=SNAPSHOT_ROOT):
+    return os.path.join(root, data_type)
+
+def _read_watermark(snapshot_dir):
+    path = os.path.join(snapshot_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {'offset': 0}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_watermark(snapshot_dir, watermark):
+    path = os.path.join(snapshot_dir, WATERMARK_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(watermark, f)
+    os.replace(path + '.tmp', path)
+
+def _complete_end(f, start, end):
+    """Offset just past the last newline in [start, end) of an open file, or start if there is none"""
+    position = end
+    while position > start:
+        block_start = max(start, position - (1 << 16))
+        f.seek(block_start)
+        newline = f.read(position - block_start).rfind(b'\n')
+        if newline >= 0:
+            return block_start + newline + 1
+        position = block_start
+    return start
+
+def _to_typed_frame(data_type, df):
+    """Cast a raw CSV frame to the snapshot column types and add the partition key"""
+    if data_type == 'user_progress':
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        df = df.assign(
+            # Snowflake ids; rows still carrying a legacy string id export as null
+            progress_id=pd.to_numeric(df['progress_id'], errors='coerce').astype('Int64'),
+            timestamp=dates.to_numpy().astype('datetime64[ms]').astype(np.int64),
+            partition=dates.dt.strftime('%Y-%m-%d')
+        )
+        df = df[dates.notna()]
+    else:
+        # Quiz results carry no event time, so they are partitioned by export date
+        df = df.assign(partition=datetime.now().strftime('%Y-%m-%d'))
+
+    schema = SNAPSHOT_SCHEMAS[data_type]
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    return table, df['partition'].to_numpy()
+
+def export_snapshot(data_type, full=False, root=SNAPSHOT_ROOT):
+    """
+    Export new rows of a CSV store into date-partitioned Parquet files.
+    Returns the number of rows written.
+    """
+    source = SNAPSHOT_SOURCES[data_type]
+    snapshot_dir = _snapshot_dir(data_type, root)
+    if not os.path.exists(source):
+        return 0
+
+    watermark = _read_watermark(snapshot_dir)
+    # Appends hold the file lock, so every byte before the size read under it is a complete row
+    with exclusive_lock(source):
+        source_stat = os.stat(source)
+    source_size = source_stat.st_size
+
+    # A source that shrank or was replaced was rewritten (e.g. compacted), so start over
+    replaced = watermark.get('inode') not in (None, source_stat.st_ino)
+    if full or replaced or source_size < watermark['offset']:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        watermark = {'offset': 0}
+
+    if source_size <= watermark['offset']:
+        return 0
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    rows = 0
+    part_name = f"part-{time.time_ns()}"
+    with open(source, 'rb') as f:
+        header = f.readline()
+        start = max(watermark['offset'], len(header))
+        # A row still being written by something that skipped the lock waits for the next export
+        source_size = _complete_end(f, start, source_size)
+        if start < source_size:
+            names = next(csv.reader([header.decode('utf-8-sig')]))
+            f.seek(start)
+            chunks = pd.read_csv(
+                io.BufferedReader(ByteRange(f, source_size)),
+                header=None,
+                names=names,
+                chunksize=PROGRESS_CONFIG['chunk_rows']
+            )
+            for position, chunk in enumerate(chunks):
+                chunk = chunk.dropna(how='all')
+                if chunk.empty:
+                    continue
+                table, partitions = _to_typed_frame(data_type, chunk)
+                for partition in np.unique(partitions):
+                    partition_dir = os.path.join(snapshot_dir, f"date={partition}")
+                    os.makedirs(partition_dir, exist_ok=True)
+                    mask = pa.array(partitions == partition)
+                    pq.write_table(table.filter(mask), os.path.join(partition_dir, f"{part_name}-{position}.parquet"))
+                rows += table.num_rows
+
+    _write_watermark(snapshot_dir, {'offset': source_size, 'inode': source_stat.st_ino, 'exported_at': datetime.now().isoformat()})
+    return rows
+
+def read_snapshot(data_type, columns=None, start_date=None, end_date=None, filter_expression=None, root=SNAPSHOT_ROOT):
+    """
+    Read a snapshot with column projection and date partition pruning.
+    Dates are inclusive 'YYYY-MM-DD' strings (or date/datetime objects).
+    """
+    snapshot_dir = _snapshot_dir(data_type, root)
+    if not os.path.isdir(snapshot_dir):
+        return pd.DataFrame(columns=columns or SNAPSHOT_SCHEMAS[data_type].names)
+
+    dataset = ds.dataset(
+        snapshot_dir,
+        format='parquet',
+        partitioning=PARTITIONING,
+        exclude_invalid_files=True,
+        ignore_prefixes=['_', '.']
+    )
+
+    expression = filter_expression
+    if start_date is not None:
+        condition = ds.field('date') >= pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        expression = condition if expression is None else expression & condition
+    if end_date is not None:
+        condition = ds.field('date') <= pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        expression = condition if expression is None else expression & condition
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Parquet analytics snapshots")
+    parser.add_argument('datasets', nargs='*', default=list(SNAPSHOT_SOURCES), help="Datasets to export")
+    parser.add_argument('--full', action='store_true', help="Rebuild the snapshot from scratch")
+    args = parser.parse_args()
+
+    for data_type in args.datasets:
+        rows = export_snapshot(data_type, full=args.full)
+        print(f"{data_type}: exported {rows} new rows")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import streamlit as st
+from config import INSTRUCTOR_CONFIG
 
 def authenticate_user(username, password, students_df):
     """
@@ -49,6 +50,31 @@ def require_auth():
     """
     Decorator to require authentication for pages
     """
+    # Imported here, so pages that only check the session do not load the writer or warm-up modules
+    from utils.metrics import render_debug_panel
+    from utils.progress_writer import pop_failed_saves
+    from utils.warmup import start_warmup
+
     if not is_authenticated():
         st.error("Please login to access this page")
         st.stop()
+    start_warmup()
+    render_debug_panel()
+    # Saves are written in the background, so a failed write is reported on the next page load
+    for message in pop_failed_saves(st.session_state.get('username')):
+        st.error(message)
+
+def is_instructor():
+    """
+    Check if the current user may see cohort-wide analytics
+    """
+    return is_authenticated() and st.session_state.get('username') in INSTRUCTOR_CONFIG['usernames']
+
+def require_instructor():
+    """
+    Require an instructor account for cohort-wide pages
+    """
+    require_auth()
+    if not is_instructor():
+        st.error("This page is only available to instructors")
+        st.stop()
@@ -0,0 +1,422 @@
+"""
+Read-only binary catalog shared by every server process.
+
+The static catalogs (questions, career quiz, streams, recommendations) are
+compiled into versioned, uncompressed Arrow IPC snapshots typed by the
+dataset schema (utils.schemas). Categorical columns are interned
+(dictionary-encoded, each distinct string stored once) and load as pandas
+categoricals. The entity codes and canonical names (utils.entity_ids) and the
+sort indexes declared in CATALOG_SORT_INDEXES are stored next to the columns,
+so a cold start is a single memory map with no parsing, type inference or
+name resolution. Each worker maps the same file, so the buffers live in the OS
+page cache and are shared between processes.
+
+A snapshot records the format version, the hash of the CSV it was built
+from and the entity dictionary generation; when any of them no longer
+matches, it is rebuilt, and the CSV is served directly if that fails. Build
+(or rebuild) the snapshots, or compare their load time with pandas.read_csv,
+from the app directory with:
+
+    python -m utils.catalog_store [--force]
+    python -m utils.catalog_store --benchmark [--repeats 20] [--min-speedup 10] [--min-rows 10000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config import RECOMMENDATION_CONFIG
+from utils.data_handler import FILE_MAPPING, load_data
+from utils.entity_ids import attach_entity_codes, get_dictionary
+from utils.schemas import apply_schema, read_options
+
+CATALOG_DIR = 'data/catalog'
+CATALOG_TYPES = ['questions', 'career_quiz', 'streams', 'recommendations']
+
+# Bump when the snapshot layout changes; older snapshots are rebuilt on first use
+SNAPSHOT_VERSION = 4
+
+# Sort orders built into the snapshot: {data_type: [(sort_columns, value_ranks)]}
+CATALOG_SORT_INDEXES = {
+    'recommendations': [
+        (RECOMMENDATION_CONFIG['sort_columns'], {'difficulty_level': RECOMMENDATION_CONFIG['difficulty_order']})
+    ]
+}
+
+# Prebuilt indexes are stored as extra columns with this prefix
+INDEX_COLUMN_PREFIX = '__index__'
+
+# Arrow-backed strings with NaN missing values behave like the CSV-loaded frames
+STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+
+_open_catalogs = {}
+_catalog_frames = {}
+_sort_indexes = {}
+_verified_sources = {}
+_catalog_lock = threading.Lock()
+
+def catalog_path(data_type, catalog_dir=CATALOG_DIR):
+    return os.path.join(catalog_dir, f"{data_type}.arrow")
+
+def source_hash(file_path):
+    """Content hash of a catalog CSV"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _sort_key(sort_columns, value_ranks=None):
+    """JSON key identifying a sort order, stable across processes"""
+    value_ranks = value_ranks or {}
+    return json.dumps([list(sort_columns), {column: value_ranks[column] for column in sorted(value_ranks)}], sort_keys=True)
+
+def compute_sort_order(frame, sort_columns, value_ranks=None):
+    """Row numbers of a frame in a stable sort order (row number breaks ties)"""
+    value_ranks = value_ranks or {}
+    sort_keys = [np.arange(len(frame))]
+    for column in reversed(sort_columns):
+        values = frame[column]
+        if column in value_ranks:
+            # astype(float) drops the categorical, whose category order would otherwise decide the sort
+            values = values.map(value_ranks[column]).astype(float).fillna(len(value_ranks[column]) + 1)
+        # Missing values sort last, like pandas
+        codes, _ = pd.factorize(values, sort=True, use_na_sentinel=True)
+        sort_keys.insert(0, np.where(codes < 0, codes.max() + 1, codes))
+    return np.lexsort(sort_keys[::-1])
+
+def _snapshot_column(values):
+    """Arrow column for one typed column; categoricals become dictionary (interned) columns"""
+    column = pa.array(values, from_pandas=True)
+    if pa.types.is_string(column.type):
+        # large_string matches the pandas Arrow string layout, so views need no cast
+        column = column.cast(pa.large_string())
+    return column
+
+def build_catalog(data_types=CATALOG_TYPES, catalog_dir=CATALOG_DIR):
+    """Compile the CSV catalogs into versioned, memory-mappable Arrow snapshots"""
+    os.makedirs(catalog_dir, exist_ok=True)
+    built = []
+    for data_type in data_types:
+        source = FILE_MAPPING[data_type]
+        if not os.path.exists(source):
+            continue
+        source_stat = os.stat(source)
+        digest = source_hash(source)
+        frame = apply_schema(data_type, pd.read_csv(source, **read_options(data_type)))
+        # Codes are only renumbered when the dictionary is rebuilt, so they are stored with its generation
+        frame = attach_entity_codes(data_type, frame)
+        generation = get_dictionary().generation
+
+        arrays = [_snapshot_column(frame[column]) for column in frame.columns]
+        names = list(frame.columns)
+        indexes = {}
+        for position, (sort_columns, value_ranks) in enumerate(CATALOG_SORT_INDEXES.get(data_type, [])):
+            if not set(sort_columns) <= set(frame.columns):
+                continue
+            index_column = f"{INDEX_COLUMN_PREFIX}sort_{position}"
+            arrays.append(pa.array(compute_sort_order(frame, sort_columns, value_ranks), type=pa.int64()))
+            names.append(index_column)
+            indexes[index_column] = _sort_key(sort_columns, value_ranks)
+
+        table = pa.Table.from_arrays(arrays, names=names).replace_schema_metadata({
+            'plp_snapshot': json.dumps({
+                'version': SNAPSHOT_VERSION,
+                'source_hash': digest,
+                'source_size': source_stat.st_size,
+                'source_mtime_ns': source_stat.st_mtime_ns,
+                'entity_generation': generation,
+                'sort_indexes': indexes
+            })
+        })
+
+        # Write to a temporary file and rename so readers never see a partial catalog; session
+        # threads can rebuild the same stale catalog at once, so each writes its own file
+        final_path = catalog_path(data_type, catalog_dir)
+        temp_path = f"{final_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, final_path)
+        with _catalog_lock:
+            _verified_sources[final_path] = (source_stat.st_size, source_stat.st_mtime_ns)
+        built.append(data_type)
+    return built
+
+def snapshot_info(table):
+    """Build metadata stored in a snapshot, or {} for a pre-versioning catalog"""
+    metadata = table.schema.metadata or {}
+    raw = metadata.get(b'plp_snapshot')
+    return json.loads(raw) if raw else {}
+
+def _is_current(data_type, path, info):
+    """
+    Whether a snapshot matches its format version, entity dictionary and
+    source CSV. The CSV is only hashed when its size or mtime differ from the
+    recorded ones.
+    """
+    if info.get('version') != SNAPSHOT_VERSION:
+        return False
+    if info.get('entity_generation') != get_dictionary().generation:
+        return False
+    source = FILE_MAPPING[data_type]
+    if not os.path.exists(source):
+        # Nothing to rebuild from; the snapshot is all there is
+        return True
+    source_stat = os.stat(source)
+    signature = (source_stat.st_size, source_stat.st_mtime_ns)
+    if signature == (info.get('source_size'), info.get('source_mtime_ns')):
+        return True
+    with _catalog_lock:
+        if _verified_sources.get(path) == signature:
+            return True
+    if source_hash(source) != info.get('source_hash'):
+        return False
+    # Touched but unchanged: remember it so the file is not hashed on every open
+    with _catalog_lock:
+        _verified_sources[path] = signature
+    return True
+
+def _map_snapshot(path):
+    """(mtime, data table, {index key: row numbers}, info) for a snapshot file"""
+    mtime = os.stat(path).st_mtime_ns
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    info = snapshot_info(table)
+    index_columns = [name for name in table.column_names if name.startswith(INDEX_COLUMN_PREFIX)]
+    indexes = {}
+    for name in index_columns:
+        key = info.get('sort_indexes', {}).get(name)
+        if key is not None:
+            order = table.column(name).to_numpy()
+            order.flags.writeable = False
+            indexes[key] = order
+    return mtime, table.drop_columns(index_columns), indexes, info
+
+def _try_build(data_type, catalog_dir):
+    """Rebuild one snapshot; False if the CSV is missing or cannot be compiled"""
+    try:
+        return data_type in build_catalog([data_type], catalog_dir)
+    except (OSError, ValueError, pa.ArrowException):
+        # The CSV loader reports the problem to the user
+        return False
+
+def _open_snapshot(data_type, catalog_dir=CATALOG_DIR):
+    """The cached _map_snapshot entry for a catalog, rebuilding a missing or stale snapshot"""
+    path = catalog_path(data_type, catalog_dir)
+    if not os.path.exists(path) and not _try_build(data_type, catalog_dir):
+        return None
+
+    mtime = os.stat(path).st_mtime_ns
+    with _catalog_lock:
+        cached = _open_catalogs.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _map_snapshot(path)
+    if not _is_current(data_type, path, cached[3]):
+        if not _try_build(data_type, catalog_dir):
+            return None
+        cached = _map_snapshot(path)
+    with _catalog_lock:
+        _open_catalogs[path] = cached
+    return cached
+
+def open_catalog(data_type, catalog_dir=CATALOG_DIR):
+    """
+    Return the memory-mapped Arrow table for a catalog, building it on first
+    use and rebuilding it when its CSV changes. Tables are opened once per
+    process and reopened when rebuilt. Returns None if no current snapshot
+    can be built.
+    """
+    snapshot = _open_snapshot(data_type, catalog_dir)
+    return None if snapshot is None else snapshot[1]
+
+def _string_mapper(arrow_type):
+    # Interned (dictionary) columns keep pyarrow's default conversion to a categorical
+    if pa.types.is_large_string(arrow_type) or pa.types.is_string(arrow_type):
+        return STRING_DTYPE
+    return None
+
+def load_catalog(data_type, catalog_dir=CATALOG_DIR):
+    """
+    Load a catalog as a DataFrame whose columns are Arrow-backed views of the
+    shared memory map (no per-process copy), including the stored canonical
+    entity names and codes. The frame is built once per snapshot file and
+    handed out as a shallow copy. Falls back to the CSV loader.
+    """
+    try:
+        snapshot = _open_snapshot(data_type, catalog_dir)
+        if snapshot is not None:
+            path = catalog_path(data_type, catalog_dir)
+            with _catalog_lock:
+                cached = _catalog_frames.get(path)
+            # A new dictionary generation makes the snapshot stale, so its mtime covers the codes too
+            if cached is None or cached[0] != snapshot[0]:
+                frame = snapshot[1].to_pandas(types_mapper=_string_mapper, split_blocks=True)
+                frame.attrs['source_version'] = (path, snapshot[0], len(frame))
+                cached = (snapshot[0], frame)
+                with _catalog_lock:
+                    _catalog_frames[path] = cached
+            # Copy-on-write keeps a caller's edits out of the shared frame
+            return cached[1].copy(deep=False)
+    except (OSError, pa.ArrowException):
+        pass
+    return load_data(data_type)
+
+def sort_index(data_type, sort_columns, value_ranks=None, catalog_dir=CATALOG_DIR):
+    """
+    Catalog row numbers in a stable sort order (row number breaks ties).
+    Orders declared in CATALOG_SORT_INDEXES come prebuilt with the snapshot;
+    others are computed once per catalog version. value_ranks maps a column
+    to an explicit {value: rank} order, e.g. difficulty levels.
+    """
+    snapshot = _open_snapshot(data_type, catalog_dir)
+    if snapshot is None:
+        return None
+    version, table, indexes, _ = snapshot
+
+    key = _sort_key(sort_columns, value_ranks)
+    if key in indexes:
+        return indexes[key]
+
+    path = catalog_path(data_type, catalog_dir)
+    with _catalog_lock:
+        cached = _sort_indexes.get((path, key))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    frame = table.select(list(sort_columns)).to_pandas(types_mapper=_string_mapper)
+    order = compute_sort_order(frame, sort_columns, value_ranks)
+    order.flags.writeable = False
+
+    with _catalog_lock:
+        _sort_indexes[(path, key)] = (version, order)
+    return order
+
+def keyset_page(order, selected, cursor=None, page_size=10):
+    """
+    One page of catalog rows in sort order. `selected` is a boolean mask over
+    catalog rows (the active filters) and `cursor` the last row of the
+    previous page, so pages stay stable when rows before the cursor change.
+    Returns the page's row numbers and the cursor for the next page (None
+    on the last page).
+    """
+    ordered = order[selected[order]]
+    start = 0
+    if cursor is not None:
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        start = int(np.searchsorted(rank[ordered], rank[cursor], side='right'))
+
+    page = ordered[start:start + page_size]
+    next_cursor = int(page[-1]) if start + page_size < len(ordered) else None
+    return page, next_cursor
+
+class CatalogRecord(Mapping):
+    """Zero-copy, read-only view of one catalog row"""
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, column):
+        if column not in self._table.column_names:
+            raise KeyError(column)
+        return self._table.column(column)[self._row].as_py()
+
+    def __iter__(self):
+        return iter(self._table.column_names)
+
+    def __len__(self):
+        return self._table.num_columns
+
+    def __repr__(self):
+        return f"CatalogRecord({dict(self)!r})"
+
+def get_record(data_type, row, catalog_dir=CATALOG_DIR):
+    """Return a record view for a catalog row"""
+    table = open_catalog(data_type, catalog_dir)
+    if table is None or not 0 <= row < table.num_rows:
+        return None
+    return CatalogRecord(table, row)
+
+def _best_ms(function, repeats):
+    # Best of several runs, so scheduler noise does not swamp sub-millisecond loads
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+def benchmark_catalogs(repeats=20, catalog_dir=CATALOG_DIR):
+    """
+    Load times per catalog: pandas.read_csv, a cold snapshot load (map, check
+    and build the frame) and a repeat load from the same process
+    """
+    results = {}
+    for data_type in CATALOG_TYPES:
+        source = FILE_MAPPING[data_type]
+        table = open_catalog(data_type, catalog_dir) if os.path.exists(source) else None
+        if table is None:
+            continue
+        path = catalog_path(data_type, catalog_dir)
+
+        def cold_snapshot_load():
+            # Drop the per-process caches so every run maps and checks the file again
+            with _catalog_lock:
+                _open_catalogs.pop(path, None)
+                _catalog_frames.pop(path, None)
+            return load_catalog(data_type, catalog_dir)
+
+        csv_ms = _best_ms(lambda: pd.read_csv(source), repeats)
+        cold_ms = _best_ms(cold_snapshot_load, repeats)
+        cached_ms = _best_ms(lambda: load_catalog(data_type, catalog_dir), repeats)
+        results[data_type] = {'rows': table.num_rows, 'csv_ms': csv_ms, 'cold_ms': cold_ms, 'cached_ms': cached_ms}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the binary catalog snapshots")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the snapshots are current")
+    parser.add_argument('--benchmark', action='store_true', help="Compare snapshot and CSV load times")
+    parser.add_argument('--repeats', type=int, default=20, help="Loads per catalog when benchmarking (best is used)")
+    parser.add_argument('--min-speedup', type=float, default=10.0, help="Fail the benchmark below this speedup")
+    parser.add_argument('--min-rows', type=int, default=10000, help="Only catalogs this large count towards --min-speedup")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = benchmark_catalogs(args.repeats)
+        for data_type, result in results.items():
+            print(
+                f"{data_type:<16} {result['rows']:>8} rows  csv {result['csv_ms']:>7.2f}ms  "
+                f"cold {result['cold_ms']:>6.2f}ms ({result['csv_ms'] / result['cold_ms']:>5.1f}x)  "
+                f"cached {result['cached_ms']:>6.3f}ms ({result['csv_ms'] / result['cached_ms']:>6.1f}x)"
+            )
+        # The target applies to cold loads (a new worker maps the snapshot and builds the frame);
+        # repeat loads are served from the process cache. Small catalogs are left out: building the
+        # DataFrame costs about 1ms per load whatever the size, which caps the ratio below ~10k rows
+        gated = [result for result in results.values() if result['rows'] >= args.min_rows]
+        if not gated:
+            print(f"\nNo catalog has {args.min_rows}+ rows; nothing to check against --min-speedup")
+            return
+        speedup = sum(result['csv_ms'] for result in gated) / sum(result['cold_ms'] for result in gated)
+        print(f"\nCatalogs with {args.min_rows}+ rows cold-load {speedup:.1f}x faster than read_csv")
+        if speedup < args.min_speedup:
+            raise SystemExit(f"Below the {args.min_speedup:g}x target")
+        return
+
+    if args.force:
+        built = build_catalog()
+    else:
+        built = [data_type for data_type in CATALOG_TYPES if open_catalog(data_type) is not None]
+    for data_type in built:
+        print(f"Built {catalog_path(data_type)}" if args.force else f"Current {catalog_path(data_type)}")
+
+if __name__ == "__main__":
+    main()
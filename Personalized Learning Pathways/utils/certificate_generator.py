@@ -6,10 +6,17 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER
 import io
 import base64
+from functools import lru_cache
+from utils.metrics import timed
+
+@lru_cache(maxsize=1)
+def sample_stylesheet():
+    """ReportLab's base stylesheet, built once per process (styles are only read)"""
+    return getSampleStyleSheet()
 
 class CertificateGenerator:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
+        self.styles = sample_stylesheet()
         self.setup_custom_styles()
     
     def setup_custom_styles(self):
@@ -48,6 +55,7 @@ class CertificateGenerator:
             textColor=colors.grey
         )
     
+    @timed()
     def generate_completion_certificate(self, user_name, course_name, completion_date, score=None):
         """Generate a course completion certificate"""
         buffer = io.BytesIO()
@@ -144,6 +152,7 @@ class CertificateGenerator:
         
         return pdf_data
     
+    @timed()
     def generate_achievement_certificate(self, user_name, achievement_type, achievement_details, date):
         """Generate an achievement certificate"""
         buffer = io.BytesIO()
@@ -0,0 +1,568 @@
+"""
+Cohort analytics over every student for the Instructor Analytics page.
+
+CohortState keeps per-student totals in NumPy arrays indexed by user
+entity id (utils.entity_ids): dated activities per week, the last active
+day, the assessment score sum and count, the latest career quiz field, and
+answered and correct IQ test questions per stream from the response log.
+Like the rollup cube it keeps a watermark into the progress CSV, so
+refresh() folds in only the appended rows and new response log segments
+(the per-stream totals are re-read when the log's segments are rolled). A
+rewritten CSV or a rebuilt entity dictionary starts a full rebuild that
+also reads the archived daily totals (utils.retention); the archive has no
+quiz details, so a rebuild after a compaction keeps the career fields
+already known. The state is saved to INSTRUCTOR_CONFIG['state_file'] so a
+new server process resumes from it.
+
+cohort_view() turns the state into the page's tables for the students in
+INSTRUCTOR_CONFIG['roster_file'] (the students CSV logins are checked
+against), cached per state version, roster and day. Build the state,
+or time the page for a synthetic cohort, from the app directory with:
+
+    python -m utils.cohort_analytics [--rebuild]
+    python -m utils.cohort_analytics --benchmark [--students 50000] [--progress-rows 1000000]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from config import INSTRUCTOR_CONFIG
+from utils.entity_ids import MISSING_CODE, attach_entity_codes, code_column, get_dictionary
+from utils.data_handler import read_roster
+from utils.file_lock import exclusive_lock
+from utils.rollup_cube import open_source, read_rows
+
+SOURCE_COLUMNS = ['user_id', 'activity_type', 'date', 'score', 'details']
+USER_COLUMN = code_column('user')
+CAREER_PATTERN = r'Top career: ([^,]+)'
+
+NO_DAY = np.iinfo(np.int32).min
+NO_TIME = np.iinfo(np.int64).min
+
+# Bump when the saved layout changes; saved states of another version are rebuilt
+STATE_VERSION = 1
+
+def _week(days):
+    """Day number of the Monday starting each day's week (1970-01-01 was a Thursday)"""
+    return days - (days + 3) % 7
+
+def _entity_codes(entity, values):
+    """Entity ids of a column of names, resolved once per distinct name"""
+    positions, uniques = pd.factorize(values, use_na_sentinel=True)
+    resolved = get_dictionary().resolve(entity, list(uniques))
+    unique_codes = np.array([MISSING_CODE if code is None else code for code in resolved], dtype=np.int32)
+    return np.where(positions >= 0, unique_codes[positions] if len(unique_codes) else MISSING_CODE, MISSING_CODE).astype(np.int32)
+
+class CohortState:
+    """Per-student totals of one progress CSV and response log, indexed by user id"""
+
+    def __init__(self, source_path=None, state_path=None, response_dir=None):
+        from utils.data_handler import FILE_MAPPING
+        from utils.response_log import RESPONSE_LOG_DIR
+
+        self.source_path = source_path or FILE_MAPPING['user_progress']
+        self.state_path = state_path or INSTRUCTOR_CONFIG['state_file']
+        self.response_dir = response_dir or RESPONSE_LOG_DIR
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._reset()
+        self._unsaved_rows = 0
+        # Increases whenever rows are folded in, for keying derived views
+        self.version = 0
+
+    def _reset(self, keep_careers=False):
+        careers = (self.career_code, self.career_time) if keep_careers else None
+        self.totals = np.zeros(0, dtype=np.int64)
+        self.last_day = np.full(0, NO_DAY, dtype=np.int32)
+        self.assessment_sum = np.zeros(0, dtype=np.float64)
+        self.assessment_count = np.zeros(0, dtype=np.int64)
+        self.career_code = np.full(0, MISSING_CODE, dtype=np.int32)
+        self.career_time = np.full(0, NO_TIME, dtype=np.int64)
+        # weeks[user, column] counts activities in the week starting first_week + 7 * column
+        self.first_week = 0
+        self.weeks = np.zeros((0, 0), dtype=np.int32)
+        self._reset_streams()
+        if careers is not None:
+            self.ensure_users(len(careers[0]))
+            self.career_code[:len(careers[0])], self.career_time[:len(careers[1])] = careers
+
+    def _reset_streams(self):
+        self.answered = np.zeros((len(self.totals), 0), dtype=np.int32)
+        self.correct = np.zeros((len(self.totals), 0), dtype=np.int32)
+        self.segments = set()
+
+    def ensure_users(self, count):
+        """Grow the per-user arrays to hold user ids below count"""
+        extra = count - len(self.totals)
+        if extra <= 0:
+            return
+        self.totals = np.concatenate([self.totals, np.zeros(extra, dtype=np.int64)])
+        self.last_day = np.concatenate([self.last_day, np.full(extra, NO_DAY, dtype=np.int32)])
+        self.assessment_sum = np.concatenate([self.assessment_sum, np.zeros(extra)])
+        self.assessment_count = np.concatenate([self.assessment_count, np.zeros(extra, dtype=np.int64)])
+        self.career_code = np.concatenate([self.career_code, np.full(extra, MISSING_CODE, dtype=np.int32)])
+        self.career_time = np.concatenate([self.career_time, np.full(extra, NO_TIME, dtype=np.int64)])
+        self.weeks = np.pad(self.weeks, ((0, extra), (0, 0)))
+        self.answered = np.pad(self.answered, ((0, extra), (0, 0)))
+        self.correct = np.pad(self.correct, ((0, extra), (0, 0)))
+
+    def _ensure_weeks(self, weeks):
+        """Widen the week matrix to cover the given week starts"""
+        low, high = int(weeks.min()), int(weeks.max())
+        if self.weeks.shape[1] == 0:
+            self.first_week = low
+        before = max(0, (self.first_week - low) // 7)
+        after = max(0, (high - self.first_week) // 7 + 1 - self.weeks.shape[1])
+        if before or after:
+            self.weeks = np.pad(self.weeks, ((0, 0), (before, after)))
+            self.first_week -= 7 * before
+
+    def _ensure_streams(self, count):
+        extra = count - self.answered.shape[1]
+        if extra > 0:
+            self.answered = np.pad(self.answered, ((0, 0), (0, extra)))
+            self.correct = np.pad(self.correct, ((0, 0), (0, extra)))
+
+    def _add_activity(self, codes, days, counts, assessed_counts, assessed_sums):
+        """Fold in activity counts and assessment scores per (user, day)"""
+        known = codes >= 0
+        codes, days, counts = codes[known], days[known], counts[known]
+        assessed_counts, assessed_sums = assessed_counts[known], assessed_sums[known]
+        if not len(codes):
+            return
+        self.ensure_users(int(codes.max()) + 1)
+        np.add.at(self.totals, codes, counts)
+        np.maximum.at(self.last_day, codes, days)
+        np.add.at(self.assessment_count, codes, assessed_counts)
+        np.add.at(self.assessment_sum, codes, assessed_sums)
+        weeks = _week(days)
+        self._ensure_weeks(weeks)
+        np.add.at(self.weeks, (codes, (weeks - self.first_week) // 7), counts)
+
+    def _add_careers(self, rows):
+        """Keep each user's latest career quiz field"""
+        fields = rows['details'].str.extract(CAREER_PATTERN, expand=False).str.strip()
+        rows = rows.assign(career=fields)[fields.notna().to_numpy() & (rows[USER_COLUMN].to_numpy() >= 0)]
+        if rows.empty:
+            return
+        codes = rows[USER_COLUMN].to_numpy()
+        times = rows['date'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+        careers = _entity_codes('career_field', rows['career'])
+        # Last row per user in time order (file order breaks ties, as later rows were saved later)
+        order = np.lexsort((np.arange(len(codes)), times, codes))
+        codes, times, careers = codes[order], times[order], careers[order]
+        last = np.append(codes[1:] != codes[:-1], True)
+        codes, times, careers = codes[last], times[last], careers[last]
+        self.ensure_users(int(codes.max()) + 1)
+        newer = times >= self.career_time[codes]
+        self.career_code[codes[newer]] = careers[newer]
+        self.career_time[codes[newer]] = times[newer]
+
+    def _add_chunk(self, chunk):
+        dated = chunk[chunk['date'].notna().to_numpy()]
+        if dated.empty:
+            return
+        scores = dated['score'].to_numpy(dtype=np.float64, na_value=np.nan)
+        assessed = (dated['activity_type'] != 'study_plan').to_numpy() & ~np.isnan(scores)
+        self._add_activity(
+            dated[USER_COLUMN].to_numpy(),
+            dated['date'].to_numpy().astype('datetime64[D]').astype(np.int32),
+            np.ones(len(dated), dtype=np.int64),
+            assessed.astype(np.int64),
+            np.where(assessed, scores, 0.0)
+        )
+        self._add_careers(dated[(dated['activity_type'] == 'career_quiz').to_numpy()])
+
+    def _add_archive(self, archived):
+        """Fold in archived daily totals (utils.retention)"""
+        if archived is None or archived.empty:
+            return
+        assessed = (archived['activity_type'] != 'study_plan').to_numpy()
+        self._add_activity(
+            _entity_codes('user', archived['user_id']),
+            archived['day'].to_numpy().astype('datetime64[D]').astype(np.int32),
+            archived['count'].to_numpy(dtype=np.int64),
+            np.where(assessed, archived['score_count'].to_numpy(dtype=np.int64), 0),
+            np.where(assessed, archived['score_sum'].to_numpy(dtype=np.float64), 0.0)
+        )
+
+    def _add_responses(self, responses):
+        """Fold in IQ test responses per (user, stream of the question)"""
+        from utils.catalog_store import load_catalog
+
+        responses = responses[responses['correct'].notna().to_numpy()]
+        questions = load_catalog('questions')
+        if responses.empty or questions is None or questions.empty:
+            return
+        question_ids = questions['question_id'].to_numpy(dtype=np.int64)
+        streams = np.full(max(int(question_ids.max()), int(responses['question_id'].max())) + 1, MISSING_CODE, dtype=np.int32)
+        streams[question_ids] = questions[code_column('stream')].to_numpy()
+        codes = _entity_codes('user', responses['user_id'])
+        stream_codes = streams[responses['question_id'].to_numpy(dtype=np.int64)]
+        known = (codes >= 0) & (stream_codes >= 0)
+        codes, stream_codes = codes[known], stream_codes[known]
+        if not len(codes):
+            return
+        self.ensure_users(int(codes.max()) + 1)
+        self._ensure_streams(int(stream_codes.max()) + 1)
+        np.add.at(self.answered, (codes, stream_codes), 1)
+        np.add.at(self.correct, (codes, stream_codes), responses['correct'].to_numpy(dtype=bool)[known].astype(np.int32))
+
+    def _refresh_segments(self):
+        """Fold in new response log segments; start over if a folded one was merged away (rolled or compacted)"""
+        from utils.response_log import read_new_segments
+
+        names, table, complete = read_new_segments(
+            self.segments, ['user_id', 'question_id', 'correct'], quiz_type='iq_test', log_dir=self.response_dir
+        )
+        changed = set(names) != self.segments
+        if complete:
+            self._reset_streams()
+        self._add_responses(table.to_pandas())
+        self.segments = set(names)
+        return changed
+
+    _ARRAYS = ['totals', 'last_day', 'assessment_sum', 'assessment_count', 'career_code', 'career_time', 'weeks', 'answered', 'correct']
+
+    def _load_saved(self):
+        """Resume from the saved state, if it has this layout"""
+        try:
+            with np.load(self.state_path, allow_pickle=False) as saved:
+                info = json.loads(str(saved['info']))
+                if info.get('version') != STATE_VERSION:
+                    return
+                for name in self._ARRAYS:
+                    setattr(self, name, saved[name])
+        except (OSError, KeyError, ValueError):
+            self._reset()
+            return
+        self.first_week = info['first_week']
+        self.segments = set(info['segments'])
+        self._watermark = info['watermark']
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        info = {
+            'version': STATE_VERSION,
+            'watermark': self._watermark,
+            'first_week': self.first_week,
+            'segments': sorted(self.segments),
+            'saved_at': time.time()
+        }
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with exclusive_lock(self.state_path):
+            with open(temp_path, 'wb') as f:
+                np.savez(f, info=np.array(json.dumps(info)), **{name: getattr(self, name) for name in self._ARRAYS})
+            os.replace(temp_path, self.state_path)
+        self._unsaved_rows = 0
+
+    def refresh(self):
+        """Fold in appended progress rows and new response segments (rebuild if the CSV was rewritten)"""
+        generation = get_dictionary().generation
+        with self._lock:
+            if self._watermark is None:
+                self._load_saved()
+            watermark = self._watermark
+            rebuild = appended = False
+            if os.path.exists(self.source_path):
+                stat = os.stat(self.source_path)
+                rebuild = (
+                    watermark is None
+                    or watermark['inode'] != stat.st_ino
+                    or watermark['generation'] != generation
+                    or stat.st_size < watermark['offset']
+                )
+                appended = not rebuild and stat.st_size != watermark['offset']
+            if rebuild:
+                # Compactions only drop old rows, so the careers already known stay true
+                self._reset(keep_careers=watermark is not None and watermark['generation'] == generation)
+            changed = self._refresh_segments()
+            if rebuild or appended:
+                f, end, inode, archived = open_source(self.source_path, archive=rebuild)
+                self._add_archive(archived)
+                for chunk in read_rows(f, 0 if rebuild else watermark['offset'], end, SOURCE_COLUMNS):
+                    self._add_chunk(chunk)
+                    self._unsaved_rows += len(chunk)
+                self._watermark = {'offset': end, 'inode': inode, 'generation': generation}
+                changed = True
+            if changed:
+                self.version += 1
+            if rebuild or self._unsaved_rows >= INSTRUCTOR_CONFIG['save_rows'] or (changed and not os.path.exists(self.state_path)):
+                try:
+                    self._save()
+                except OSError:
+                    # Still served from memory; the next process rebuilds from the CSV
+                    pass
+        return self
+
+_state = None
+_state_lock = threading.Lock()
+
+def get_state():
+    """The process-wide cohort state, brought up to date with the progress CSV and response log"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = CohortState()
+    return _state.refresh()
+
+class CohortView:
+    """The Instructor Analytics tables for one roster of students as of one day"""
+
+    def __init__(self, state, roster, roster_missing, as_of):
+        config = INSTRUCTOR_CONFIG
+        dictionary = get_dictionary()
+        self.roster_missing = roster_missing
+        self.as_of = as_of
+        codes = roster[USER_COLUMN].to_numpy()
+        today = int(np.datetime64(as_of, 'D').astype(np.int64))
+
+        last_day = state.last_day[codes]
+        active = last_day != NO_DAY
+        days_inactive = np.where(active, today - last_day.astype(np.int64), -1)
+        counts = state.assessment_count[codes]
+        sums = state.assessment_sum[codes]
+        average = np.divide(sums, counts, out=np.full(len(codes), np.nan), where=counts > 0)
+
+        never = ~active
+        inactive = active & (days_inactive >= config['inactive_days'])
+        low = (counts >= config['min_assessments']) & (average < config['low_score'])
+        risk = never | inactive | low
+        self.summary = {
+            'students': len(codes),
+            'active_week': int((active & (days_inactive >= 0) & (days_inactive < 7)).sum()),
+            'at_risk': int(risk.sum()),
+            'average_score': sums.sum() / counts.sum() if counts.sum() else np.nan
+        }
+
+        inactive_text = np.char.add(np.char.add('Inactive ', days_inactive[risk].astype(str)), ' days')
+        low_text = np.char.add(np.char.add('Assessment average ', np.round(average[risk], 1).astype(str)), '%')
+        reasons = np.where(never[risk], 'No activity yet', np.where(inactive[risk], inactive_text, ''))
+        reasons = np.where(low[risk], np.where(reasons == '', low_text, np.char.add(np.char.add(reasons, '; '), low_text)), reasons)
+        self.at_risk = pd.DataFrame({
+            'Student': roster['Name'].to_numpy()[risk],
+            'Username': roster['Username'].to_numpy()[risk],
+            'Last Active': pd.Series(last_day[risk].astype('datetime64[D]')).where(active[risk]),
+            'Days Inactive': pd.Series(days_inactive[risk], dtype='Int64').where(active[risk]),
+            'Assessment Average': average[risk].round(1),
+            'Assessments': counts[risk],
+            'Reasons': reasons,
+            '_severity': inactive[risk].astype(int) + low[risk] + never[risk],
+            '_code': codes[risk]
+        })
+        self.at_risk = (
+            self.at_risk.sort_values(['_severity', 'Days Inactive', 'Assessment Average'], ascending=[False, False, True], na_position='last', kind='stable')
+            .reset_index(drop=True)
+        )
+        self._risk_codes = self.at_risk.pop('_code').to_numpy()
+        self.at_risk = self.at_risk.drop(columns='_severity')
+
+        # Students x weeks for the heatmap window
+        end_week = int(_week(np.int64(today)))
+        week_starts = end_week - 7 * np.arange(config['heatmap_weeks'] - 1, -1, -1)
+        columns = (week_starts - state.first_week) // 7
+        in_range = (columns >= 0) & (columns < state.weeks.shape[1])
+        self._week_labels = pd.to_datetime(week_starts.astype('datetime64[D]')).strftime('%d %b %Y').tolist()
+        self._week_counts = np.zeros((len(codes), len(week_starts)), dtype=np.int32)
+        if in_range.any():
+            self._week_counts[:, in_range] = state.weeks[:, columns[in_range]][codes]
+        self._row_of = pd.Series(np.arange(len(codes)), index=codes)
+        self._names = roster['Name'].to_numpy()
+        self.weekly_totals = pd.DataFrame({'Week': self._week_labels, 'Activities': self._week_counts.sum(axis=0)})
+
+        # Career fields of every student, including those without a career quiz
+        careers = state.career_code[codes]
+        taken = careers >= 0
+        field_names = dictionary.names.get('career_field', [])
+        field_counts = np.bincount(careers[taken], minlength=len(field_names))
+        self.careers = pd.DataFrame({'Career Field': field_names, 'Students': field_counts[:len(field_names)]})
+        self.careers = self.careers[self.careers['Students'] > 0].sort_values('Students', ascending=False, kind='stable')
+        self.careers = pd.concat([self.careers, pd.DataFrame({'Career Field': ['Not taken'], 'Students': [int((~taken).sum())]})], ignore_index=True)
+
+        # Per-stream accuracy bands of students with enough answers in the stream
+        answered = state.answered[codes]
+        correct = state.correct[codes]
+        bands = config['score_bands']
+        counted = answered >= config['min_answers']
+        accuracy = np.divide(correct, answered, out=np.zeros(answered.shape), where=counted) * 100
+        band = np.minimum((accuracy * bands / 100).astype(np.int64), bands - 1)
+        stream_index = np.broadcast_to(np.arange(answered.shape[1]), answered.shape)
+        grid = np.bincount((stream_index * bands + band)[counted], minlength=answered.shape[1] * bands).reshape(-1, bands)
+        stream_names = dictionary.names.get('stream', [])[:answered.shape[1]]
+        width = 100 // bands
+        self.band_labels = [f"{low}-{low + width}%" for low in range(0, 100, width)][:bands]
+        shown = grid.sum(axis=1) > 0
+        self.stream_bands = pd.DataFrame(grid[shown], index=np.array(stream_names, dtype=object)[shown], columns=self.band_labels)
+        self.stream_summary = pd.DataFrame({
+            'Stream': np.array(stream_names, dtype=object)[shown],
+            'Students': counted.sum(axis=0)[shown],
+            'Median Accuracy': [round(float(np.median(accuracy[counted[:, stream], stream])), 1) for stream in np.flatnonzero(shown)],
+            'Mean Accuracy': [round(float(accuracy[counted[:, stream], stream].mean()), 1) for stream in np.flatnonzero(shown)]
+        })
+
+    def activity_heatmap(self, selection='most_active', students=None):
+        """
+        Activities per student and week of the heatmap window: the most active
+        students in the window, or the first at-risk students
+        """
+        students = students or INSTRUCTOR_CONFIG['heatmap_students']
+        if selection == 'at_risk':
+            rows = self._row_of.reindex(self._risk_codes[:students]).dropna().to_numpy(dtype=np.int64)
+        else:
+            window_totals = self._week_counts.sum(axis=1)
+            rows = np.flatnonzero(window_totals)
+            if len(rows) > students:
+                rows = rows[np.argpartition(-window_totals[rows], students - 1)[:students]]
+            rows = rows[np.argsort(-window_totals[rows], kind='stable')]
+        return pd.DataFrame(self._week_counts[rows], index=self._names[rows], columns=self._week_labels)
+
+_roster_cache = {}
+_view_cache = {}
+_view_lock = threading.Lock()
+
+def load_roster(state):
+    """
+    (Username, Name and user id of every student in the roster file, False),
+    or every user with recorded activity and True when there is no roster file
+    """
+    file_path = INSTRUCTOR_CONFIG['roster_file']
+    if not os.path.exists(file_path):
+        dictionary = get_dictionary()
+        codes = np.flatnonzero((state.totals > 0) | (state.answered.sum(axis=1) > 0))
+        names = [dictionary.canonical_name('user', code) for code in codes]
+        return pd.DataFrame({'Username': names, 'Name': names, USER_COLUMN: codes.astype(np.int32)}), True
+
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size, get_dictionary().generation)
+    cached = _roster_cache.get(file_path)
+    if cached is None or cached[0] != key:
+        students = attach_entity_codes('students', read_roster(file_path=file_path))
+        students = students[students[USER_COLUMN].to_numpy() >= 0].drop_duplicates(USER_COLUMN)
+        students = students.assign(Name=students['Name'].fillna(students['Username']))
+        cached = (key, students.reset_index(drop=True))
+        _roster_cache[file_path] = cached
+    return cached[1], False
+
+def cohort_view(as_of=None):
+    """The current CohortView, rebuilt only when the state, the roster or the day changes"""
+    as_of = as_of or date.today()
+    state = get_state()
+    roster, roster_missing = load_roster(state)
+    with state._lock:
+        if len(roster):
+            state.ensure_users(int(roster[USER_COLUMN].max()) + 1)
+        key = (id(state), state.version, id(roster), roster_missing, len(state.totals), str(as_of))
+        with _view_lock:
+            cached = _view_cache.get('view')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        view = CohortView(state, roster, roster_missing, as_of)
+    with _view_lock:
+        _view_cache['view'] = (key, view)
+    return view
+
+def benchmark(students, progress_rows, responses, work_dir, runs=10, budget_ms=1000):
+    """
+    Time the Instructor Analytics page on a synthetic cohort: the first render
+    of a fresh process (state resumed from its saved file) and later reruns.
+    Returns (results, passed).
+    """
+    import logging
+    from streamlit.testing.v1 import AppTest
+    from utils.synthetic_data import generate_dataset
+
+    app_dir = os.getcwd()
+    page = os.path.join(app_dir, 'pages', '7_Instructor_Analytics.py')
+    os.makedirs(work_dir, exist_ok=True)
+    if not os.path.exists(os.path.join(work_dir, 'data', 'students.csv')):
+        generate_dataset(work_dir, students=students, progress_rows=progress_rows, responses=responses)
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    global _state
+    results = {}
+    os.chdir(work_dir)
+    try:
+        instructor = 'Student 0000000'
+        INSTRUCTOR_CONFIG['usernames'] = [instructor]
+        # The generator writes the students next to the other synthetic files; set before the
+        # first build, since the entity dictionary takes its user master list from the roster
+        INSTRUCTOR_CONFIG['roster_file'] = os.path.join('data', 'students.csv')
+        started = time.perf_counter()
+        get_state()
+        results['state_build_ms'] = (time.perf_counter() - started) * 1000
+        # The generated history ends on 2026-01-01
+        as_of = date(2025, 12, 31)
+        _state = None
+        _view_cache.clear()
+
+        def new_app():
+            app = AppTest.from_file(page, default_timeout=120)
+            app.session_state['authenticated'] = True
+            app.session_state['username'] = instructor
+            app.session_state['user_data'] = {'Name': instructor, 'Age': '', 'Email': ''}
+            app.session_state['instructor_as_of'] = as_of
+            return app
+
+        # Imports are paid once per server process, not per render
+        new_app().run()
+        _state = None
+        _view_cache.clear()
+        app = new_app()
+        timings = []
+        for _ in range(runs + 1):
+            started = time.perf_counter()
+            app.run()
+            timings.append((time.perf_counter() - started) * 1000)
+            if app.exception:
+                raise RuntimeError(app.exception[0].value)
+    finally:
+        os.chdir(app_dir)
+    results['first_render_ms'] = timings[0]
+    results['rerun_p50_ms'] = float(np.percentile(timings[1:], 50))
+    results['rerun_max_ms'] = max(timings[1:])
+    passed = results['first_render_ms'] <= budget_ms and results['rerun_max_ms'] <= budget_ms
+    return results, passed
+
+def main():
+    import logging
+
+    parser = argparse.ArgumentParser(description="Build the cohort analytics state, or benchmark the Instructor Analytics page")
+    parser.add_argument('--rebuild', action='store_true', help="Discard the saved state and rebuild it from the CSV")
+    parser.add_argument('--benchmark', action='store_true', help="Time the page on a synthetic cohort; exits non-zero over the budget")
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--progress-rows', type=int, default=1000000)
+    parser.add_argument('--responses', type=int, default=2000000, help="Synthetic IQ test responses")
+    parser.add_argument('--work-dir', default='bench_data/cohort', help="Where the synthetic dataset is kept")
+    parser.add_argument('--runs', type=int, default=10, help="Timed reruns after the first render")
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    args = parser.parse_args()
+
+    # Outside a Streamlit server the loaders' st.* calls only log warnings
+    logging.disable(logging.WARNING)
+    if args.benchmark:
+        results, passed = benchmark(args.students, args.progress_rows, args.responses, args.work_dir, args.runs, args.budget_ms)
+        for name, value in results.items():
+            print(f"{name:<16} {value:>9.1f}ms")
+        print(f"{'PASS' if passed else 'FAIL'}: budget {args.budget_ms:.0f}ms per render for {args.students} students")
+        sys.exit(0 if passed else 1)
+
+    if args.rebuild and os.path.exists(INSTRUCTOR_CONFIG['state_file']):
+        os.remove(INSTRUCTOR_CONFIG['state_file'])
+    started = time.perf_counter()
+    state = get_state()
+    print(
+        f"{int((state.totals > 0).sum())} active students, {state.weeks.shape[1]} weeks, "
+        f"{len(state.segments)} response segments in {time.perf_counter() - started:.2f}s, saved to {state.state_path}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Remove duplicate submissions from the append-only CSV stores.
+
+Rows that carry an attempt_id keep only the first row of each attempt;
+older rows without one (written before submissions were keyed) are
+deduplicated when every field is identical, which is what a rerun of a
+results screen produced. The file is rewritten under the writer's lock.
+Run from the app directory:
+
+    python -m utils.compact_stores [--dry-run] [quiz_results user_progress]
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from utils.data_handler import FILE_MAPPING, WRITER_TYPES
+from utils.file_lock import exclusive_lock
+from utils.progress_writer import DEDUPE_COLUMN
+
+def find_duplicates(df):
+    """Boolean mask of the rows a compaction would drop"""
+    if DEDUPE_COLUMN in df.columns:
+        keyed = df[DEDUPE_COLUMN] != ''
+        duplicate_attempt = keyed & df[DEDUPE_COLUMN].duplicated()
+        duplicate_row = ~keyed & df.duplicated()
+        return duplicate_attempt | duplicate_row
+    return df.duplicated()
+
+def compact_store(file_path, dry_run=False):
+    """
+    Drop duplicate submissions from a CSV store. Returns (rows before, rows after).
+    """
+    if not os.path.exists(file_path):
+        return 0, 0
+
+    with exclusive_lock(file_path):
+        # Read every field as text so the kept rows are written back unchanged
+        df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+        duplicates = find_duplicates(df)
+        if dry_run or not duplicates.any():
+            return len(df), len(df) - int(duplicates.sum())
+
+        compacted = df[~duplicates]
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        compacted.to_csv(temp_path, index=False)
+        os.replace(temp_path, file_path)
+        return len(df), len(compacted)
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate quiz and progress submissions")
+    parser.add_argument('datasets', nargs='*', default=WRITER_TYPES, help="Stores to compact")
+    parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would be removed")
+    args = parser.parse_args()
+
+    for data_type in args.datasets:
+        before, after = compact_store(FILE_MAPPING[data_type], dry_run=args.dry_run)
+        action = "would remove" if args.dry_run else "removed"
+        print(f"{data_type}: {action} {before - after} duplicate rows ({before} -> {after})")
+
+if __name__ == "__main__":
+    main()
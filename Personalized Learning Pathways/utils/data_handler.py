@@ -1,30 +1,60 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import os
+import queue
 from datetime import datetime
+from config import INSTRUCTOR_CONFIG, PERSISTENCE_CONFIG, PROGRESS_CONFIG
+from utils.progress_writer import progress_writer, report_failure
+from utils.id_generator import next_id
+from utils.metrics import timed
+from utils.schemas import DATE_FORMAT, apply_schema, read_options
+from utils.entity_ids import attach_entity_codes, code_column, entity_code, select_entity
 
-def load_data(data_type):
+FILE_MAPPING = {
+    'students': 'data/students.csv',
+    'questions': 'data/questions.csv',
+    'career_quiz': 'data/career_quiz.csv',
+    'recommendations': 'data/recommendations.csv',
+    'streams': 'data/streams.csv',
+    'user_progress': 'data/user_progress.csv',
+    'quiz_results': 'data/quiz_results.csv'
+}
+
+# Stores appended to by the background writer
+WRITER_TYPES = ['user_progress', 'quiz_results']
+
+def _activity_label(activity_type):
+    return 'IQ test' if activity_type == 'iq_test' else str(activity_type).replace('_', ' ')
+
+def wait_for_pending_writes(data_type):
+    """Let reads of an appended store see every save queued before them"""
+    if data_type in WRITER_TYPES:
+        progress_writer.wait_for(FILE_MAPPING[data_type], timeout=PERSISTENCE_CONFIG['read_barrier_timeout'])
+
+@timed()
+def load_data(data_type, columns=None):
     """
-    Load data from CSV files based on data type
+    Load data from CSV files based on data type, typed per the dataset
+    schema, with canonical entity names and their integer codes.
+    columns limits parsing to the listed columns.
     """
     try:
-        file_mapping = {
-            'students': 'data/students.csv',
-            'questions': 'data/questions.csv',
-            'career_quiz': 'data/career_quiz.csv',
-            'recommendations': 'data/recommendations.csv',
-            'streams': 'data/streams.csv',
-            'user_progress': 'data/user_progress.csv'
-        }
-        
-        if data_type not in file_mapping:
+        if data_type not in FILE_MAPPING:
             st.error(f"Unknown data type: {data_type}")
             return None
         
-        file_path = file_mapping[data_type]
+        file_path = FILE_MAPPING[data_type]
+        wait_for_pending_writes(data_type)
         
         if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
+            # Taken before the read, so a write during it gives a newer stamp on the next load
+            source_stat = os.stat(file_path)
+            df = pd.read_csv(file_path, **read_options(data_type, columns))
+            df = attach_entity_codes(data_type, apply_schema(data_type, df))
+            if columns is None:
+                # Lets caches keyed on the data (e.g. the quiz engine's item tables) skip hashing the frame
+                df.attrs['source_version'] = (file_path, source_stat.st_size, source_stat.st_mtime_ns, len(df))
             return df
         else:
             st.warning(f"Data file not found: {file_path}")
@@ -34,34 +64,109 @@ def load_data(data_type):
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def save_user_progress(user_id, activity_type, score, details):
+def read_roster(columns=('Username', 'Name'), file_path=None):
     """
-    Save user progress to CSV file
+    Typed columns of the students CSV that logins are checked against
+    (INSTRUCTOR_CONFIG['roster_file'], not FILE_MAPPING['students']). The
+    shipped file starts with an empty row, as in main.py. Entity codes are
+    not attached, so the dictionary ingest can read it too.
+    """
+    file_path = file_path or INSTRUCTOR_CONFIG['roster_file']
+    with open(file_path, newline='') as f:
+        first_line = f.readline()
+    skiprows = 1 if not first_line.strip().strip(',') else 0
+    students = pd.read_csv(file_path, skiprows=skiprows, **read_options('students', list(columns)))
+    return apply_schema('students', students.dropna(how='all'))
+
+def iter_data(data_type, columns=None, user_id=None, activity_types=None, start=None, end=None, chunk_rows=None):
+    """
+    Stream a dataset as typed chunks of at most chunk_rows rows, keeping only
+    rows for user_id, with an activity type in activity_types and dated in
+    [start, end). The user and activity filters run before dates and numbers
+    are converted, so memory is bounded by one chunk plus the rows kept.
+    Chunks with no matching rows are skipped. columns limits parsing (the
+    filtered columns are always read).
+    """
+    try:
+        if data_type not in FILE_MAPPING:
+            st.error(f"Unknown data type: {data_type}")
+            return
+        
+        file_path = FILE_MAPPING[data_type]
+        wait_for_pending_writes(data_type)
+        
+        if not os.path.exists(file_path):
+            st.warning(f"Data file not found: {file_path}")
+            return
+        
+        if columns is not None:
+            filtered_columns = [column for column, value in (('user_id', user_id), ('activity_type', activity_types)) if value is not None]
+            if start is not None or end is not None:
+                filtered_columns.append('date')
+            columns = list(columns) + filtered_columns
+        
+        chunks = pd.read_csv(file_path, chunksize=chunk_rows or PROGRESS_CONFIG['chunk_rows'], **read_options(data_type, columns))
+        for chunk in chunks:
+            chunk = attach_entity_codes(data_type, chunk)
+            if user_id is not None:
+                chunk = select_entity(chunk, 'user', user_id)
+            if activity_types is not None:
+                chunk = chunk[chunk['activity_type'].isin(list(activity_types))]
+            if chunk.empty:
+                continue
+            
+            chunk = apply_schema(data_type, chunk)
+            if start is not None:
+                chunk = chunk[chunk['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                chunk = chunk[chunk['date'] < pd.Timestamp(end)]
+            if not chunk.empty:
+                yield chunk
+            
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+
+def load_filtered(data_type, **filters):
+    """
+    The rows of a dataset matching iter_data's filters, read chunk by chunk
+    so the whole file is never in memory (an empty frame if nothing matches)
+    """
+    chunks = list(iter_data(data_type, **filters))
+    if not chunks:
+        return pd.DataFrame()
+    # Each chunk has its own categories; restore the schema types after joining them
+    return apply_schema(data_type, pd.concat(chunks))
+
+@timed()
+def save_user_progress(user_id, activity_type, score, details, wait_for_disk=False, attempt_id=None):
+    """
+    Queue a progress record for the background writer. Returns once the
+    record is queued, or once it is on disk when wait_for_disk is set.
+    Records with an attempt_id are saved at most once per attempt.
     """
     try:
         progress_data = {
-            'progress_id': f"{user_id}_{activity_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'progress_id': next_id(),
             'user_id': user_id,
             'activity_type': activity_type,
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'date': datetime.now().strftime(DATE_FORMAT),
             'score': score,
             'details': details
         }
+        if attempt_id is not None:
+            progress_data['attempt_id'] = attempt_id
         
-        # Load existing progress data
-        progress_df = load_data('user_progress')
-        
-        if progress_df is None or progress_df.empty:
-            # Create new dataframe if file doesn't exist
-            progress_df = pd.DataFrame([progress_data])
+        # Appended by the writer thread in a group commit with other sessions' saves
+        future = progress_writer.submit(FILE_MAPPING['user_progress'], progress_data)
+        if wait_for_disk:
+            future.result(timeout=PERSISTENCE_CONFIG['read_barrier_timeout'])
         else:
-            # Append new progress
-            progress_df = pd.concat([progress_df, pd.DataFrame([progress_data])], ignore_index=True)
-        
-        # Save to file
-        progress_df.to_csv('data/user_progress.csv', index=False)
+            future.add_done_callback(report_failure(user_id, _activity_label(activity_type) + " progress"))
         return True
         
+    except queue.Full:
+        st.error("Too many results are being saved right now. Please try again in a moment.")
+        return False
     except Exception as e:
         st.error(f"Error saving progress: {str(e)}")
         return False
@@ -78,7 +183,8 @@ def get_user_recommendations(user_id, streams_of_interest=None):
         
         if streams_of_interest:
             # Filter recommendations by streams of interest
-            filtered_recs = recommendations_df[recommendations_df['stream'].isin(streams_of_interest)]
+            stream_codes = [entity_code('stream', stream) for stream in streams_of_interest]
+            filtered_recs = recommendations_df[recommendations_df[code_column('stream')].isin(stream_codes)]
             return filtered_recs
         
         return recommendations_df
@@ -87,6 +193,42 @@ def get_user_recommendations(user_id, streams_of_interest=None):
         st.error(f"Error getting recommendations: {str(e)}")
         return None
 
+def filter_recommendations(recommendations_df, stream='All', difficulty='All', resource_type='All',
+                           show_self_paced=True, max_weeks=None):
+    """
+    Apply the Recommendations page filters. Adds a numeric duration_weeks
+    column (self-paced or unparseable durations count as 0) and keeps the
+    catalog row index.
+    """
+    filtered_recs = recommendations_df
+    
+    if stream != 'All':
+        filtered_recs = select_entity(filtered_recs, 'stream', stream)
+    
+    if difficulty != 'All':
+        filtered_recs = filtered_recs[filtered_recs['difficulty_level'] == difficulty]
+    
+    if resource_type != 'All':
+        filtered_recs = filtered_recs[filtered_recs['resource_type'] == resource_type]
+    
+    # Filter by duration
+    if not show_self_paced:
+        filtered_recs = filtered_recs[filtered_recs['duration'] != 'Self-paced']
+    
+    durations = filtered_recs['duration'].fillna('')
+    lowered = durations.str.lower()
+    leading_number = pd.to_numeric(durations.str.extract(r'^(\d+)(?:\s|$)', expand=False), errors='coerce').fillna(0)
+    filtered_recs = filtered_recs.assign(duration_weeks=np.select(
+        [durations.str.contains('Self-paced', regex=False), lowered.str.contains('week', regex=False), lowered.str.contains('month', regex=False)],
+        [0, leading_number, leading_number * 4],
+        default=0
+    ).astype(int))
+    
+    if not show_self_paced and max_weeks is not None:
+        filtered_recs = filtered_recs[filtered_recs['duration_weeks'] <= max_weeks]
+    
+    return filtered_recs
+
 def save_study_plan(user_id, plan_data):
     """
     Save study plan for a user
@@ -111,37 +253,28 @@ def get_user_study_plans(user_id):
     Get study plans for a user
     """
     try:
-        progress_df = load_data('user_progress')
-        
-        if progress_df is None:
-            return pd.DataFrame()
-        
-        # Filter for study plans
-        study_plans = progress_df[
-            (progress_df['user_id'] == user_id) & 
-            (progress_df['activity_type'] == 'study_plan')
-        ]
-        
-        return study_plans
+        return load_filtered('user_progress', user_id=user_id, activity_types=['study_plan'])
         
     except Exception as e:
         st.error(f"Error getting study plans: {str(e)}")
         return pd.DataFrame()
     
-def save_quiz_results(user_id, quiz_type, score, details, file_path="data/quiz_results.csv"):
-    """Save quiz results to CSV file"""
+@timed()
+def save_quiz_results(user_id, quiz_type, score, details, file_path=FILE_MAPPING['quiz_results'], attempt_id=None):
+    """Queue a quiz result for the background writer (once per attempt_id)"""
     new_result = {
         "user_id": user_id,
         "quiz_type": quiz_type,
         "score": score,
         "details": details
     }
+    if attempt_id is not None:
+        new_result["attempt_id"] = attempt_id
 
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        df = pd.concat([df, pd.DataFrame([new_result])], ignore_index=True)
-    else:
-        df = pd.DataFrame([new_result])
-
-    df.to_csv(file_path, index=False)
-    return True
+    try:
+        future = progress_writer.submit(file_path, new_result)
+        future.add_done_callback(report_failure(user_id, _activity_label(quiz_type) + " result"))
+        return True
+    except queue.Full:
+        st.error("Too many results are being saved right now. Please try again in a moment.")
+        return False
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of at
+    most `threshold` points that preserve the visual shape of the series.
+    x must be sorted ascending.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        # Keep the point forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+
+    return selected
+
+def downsample_frame(df, x_column, y_column, max_points, group_column=None):
+    """
+    Downsample a DataFrame for plotting, independently per group so every
+    line keeps its own shape. Frames already under the budget are returned as is.
+    """
+    if df.empty:
+        return df
+
+    if group_column is None:
+        df = df.sort_values(x_column)
+        if len(df) <= max_points:
+            return df
+        x = df[x_column]
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x = x.astype('int64')
+        return df.iloc[lttb_indices(x.to_numpy(), df[y_column].to_numpy(), max_points)]
+
+    parts = [
+        downsample_frame(group, x_column, y_column, max_points)
+        for _, group in df.groupby(group_column, sort=False, observed=True)
+    ]
+    return pd.concat(parts) if parts else df
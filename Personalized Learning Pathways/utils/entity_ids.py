@@ -0,0 +1,367 @@
+"""
+Canonical names and dense integer ids for entities shared across datasets.
+
+Streams, career fields, users and platforms are spelled independently in
+each CSV ("Comuter Sciencce" in streams.csv, "Computer Science" in
+questions.csv). The entity dictionary gives every entity one canonical
+name and a dense int32 id, and records the variants (aliases) that map to
+it. Loaders add an '<entity>_code' column next to each name column listed
+in ENTITY_COLUMNS and rewrite the names to their canonical spelling, so
+joins and filters compare integers and agree across files.
+
+The dictionary is built by an ingest pass over every dataset. Spellings
+used by more datasets, then more rows, win; a name within
+ENTITY_CONFIG['fuzzy_cutoff'] of an accepted one becomes its alias.
+Usernames are keyed on the exact string, since login tells "Bob" and "bob"
+apart, and are never rewritten. Ids never change once assigned; names first
+seen at load time are appended. Run the ingest and write the report of
+corrected and unresolved names from the app directory with:
+
+    python -m utils.entity_ids [--rebuild]
+"""
+import argparse
+import json
+import os
+import threading
+import unicodedata
+import uuid
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from config import ENTITY_CONFIG, INSTRUCTOR_CONFIG
+from utils.file_lock import exclusive_lock
+
+# {entity: {'master': (data_type, column) listing every valid entity, or None,
+#           'references': [(data_type, column)], 'fuzzy': merge near-duplicate spellings,
+#           'exact': compare names as stored, without case folding or respacing}}
+ENTITY_SOURCES = {
+    'stream': {
+        'master': ('streams', 'stream_name'),
+        'references': [('questions', 'stream'), ('recommendations', 'stream')],
+        'fuzzy': True,
+        'exact': False
+    },
+    'career_field': {
+        'master': ('career_quiz', 'career_field'),
+        'references': [],
+        'fuzzy': True,
+        'exact': False
+    },
+    'user': {
+        'master': ('students', 'Username'),
+        'references': [('user_progress', 'user_id'), ('quiz_results', 'user_id')],
+        'fuzzy': False,
+        'exact': True
+    },
+    'platform': {
+        'master': None,
+        'references': [('recommendations', 'platform')],
+        'fuzzy': True,
+        'exact': False
+    }
+}
+
+# {data_type: [(name column, entity)]}
+ENTITY_COLUMNS = {}
+for _entity, _spec in ENTITY_SOURCES.items():
+    for _data_type, _column in ([_spec['master']] if _spec['master'] else []) + _spec['references']:
+        ENTITY_COLUMNS.setdefault(_data_type, []).append((_column, _entity))
+
+MISSING_CODE = -1
+
+# Bump when the way names are keyed changes; older dictionary files are rebuilt with new ids
+DICTIONARY_VERSION = 2
+
+def code_column(entity):
+    return f"{entity}_code"
+
+def normalize_name(name):
+    """Comparison key: Unicode-normalized, case-folded, single-spaced"""
+    return ' '.join(unicodedata.normalize('NFKC', str(name)).casefold().split())
+
+def _is_exact(entity):
+    return ENTITY_SOURCES.get(entity, {}).get('exact', False)
+
+def _name_key(entity, name):
+    """Dictionary key of a name: the exact string for exact entities, else normalize_name"""
+    return str(name) if _is_exact(entity) else normalize_name(name)
+
+def _closest(key, candidates):
+    import difflib
+
+    matches = difflib.get_close_matches(key, candidates, n=1, cutoff=ENTITY_CONFIG['fuzzy_cutoff'])
+    return matches[0] if matches else None
+
+class EntityDictionary:
+    """In-memory view of the dictionary file; reloaded when another process changes it"""
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or ENTITY_CONFIG['dictionary_file']
+        self._lock = threading.Lock()
+        self._version = None
+        self._load({'version': DICTIONARY_VERSION, 'generation': None, 'entities': {}})
+
+    def _load(self, data):
+        # Files written before versioning keyed usernames case-insensitively
+        self.version = data.get('version', 1)
+        self.generation = data['generation']
+        self.names = {entity: list(entry['names']) for entity, entry in data['entities'].items()}
+        self.aliases = {entity: dict(entry['aliases']) for entity, entry in data['entities'].items()}
+        self._index = {}
+        for entity, names in self.names.items():
+            index = {_name_key(entity, name): code for code, name in enumerate(names)}
+            index.update(self.aliases[entity])
+            self._index[entity] = index
+
+    def _data(self):
+        return {
+            'version': DICTIONARY_VERSION,
+            'generation': self.generation,
+            'entities': {
+                entity: {'names': self.names[entity], 'aliases': self.aliases[entity]}
+                for entity in self.names
+            }
+        }
+
+    def _file_version(self):
+        if not os.path.exists(self.file_path):
+            return None
+        stat = os.stat(self.file_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """Reload from disk if the file changed; False if there is no dictionary file yet"""
+        version = self._file_version()
+        if version is None:
+            return False
+        with self._lock:
+            if version != self._version:
+                with open(self.file_path) as f:
+                    self._load(json.load(f))
+                self._version = version
+        return True
+
+    def _save(self):
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._data(), f, indent=1, ensure_ascii=False)
+        os.replace(temp_path, self.file_path)
+        self._version = self._file_version()
+
+    def lookup(self, entity, name):
+        """Id of a known name (any spelling), or None"""
+        if name is None or (not isinstance(name, str) and pd.isna(name)):
+            return None
+        return self._index.get(entity, {}).get(_name_key(entity, name))
+
+    def canonical_name(self, entity, code):
+        return self.names[entity][code]
+
+    def _add(self, entity, name):
+        """Id for a new spelling: an alias of a close existing name, or a new entity"""
+        key = _name_key(entity, name)
+        index = self._index.setdefault(entity, {})
+        names = self.names.setdefault(entity, [])
+        aliases = self.aliases.setdefault(entity, {})
+        if key in index:
+            return index[key]
+        if _is_exact(entity):
+            # Exact names are never aliased to another one
+            code = len(names)
+            names.append(str(name))
+            index[key] = code
+            return code
+        manual = ENTITY_CONFIG['aliases'].get(entity, {}).get(name)
+        target = None
+        if manual is not None:
+            target = normalize_name(manual)
+            if target not in index:
+                self._add(entity, manual)
+        elif ENTITY_SOURCES[entity]['fuzzy']:
+            target = _closest(key, [normalize_name(existing) for existing in names])
+        if target is not None:
+            code = index[target]
+            aliases[key] = code
+        else:
+            code = len(names)
+            names.append(' '.join(str(name).split()))
+        index[key] = code
+        return code
+
+    def resolve(self, entity, names):
+        """
+        Ids for a list of names, adding unknown ones. New names are appended
+        to the file under its lock; if the file cannot be written they are
+        kept in this process only.
+        """
+        codes = [self.lookup(entity, name) for name in names]
+        unknown = [name for name, code in zip(names, codes) if code is None and not pd.isna(name)]
+        if not unknown:
+            return codes
+        try:
+            with exclusive_lock(self.file_path):
+                self._version = None
+                self.refresh()
+                with self._lock:
+                    for name in unknown:
+                        self._add(entity, name)
+                    self._save()
+        except OSError:
+            with self._lock:
+                for name in unknown:
+                    self._add(entity, name)
+        return [self.lookup(entity, name) for name in names]
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+def get_dictionary():
+    """The process-wide dictionary, built by a full ingest if there is no file yet"""
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            _dictionary = EntityDictionary()
+    if not _dictionary.refresh() or _dictionary.version != DICTIONARY_VERSION:
+        build_dictionary()
+        _dictionary.refresh()
+    return _dictionary
+
+def entity_code(entity, name):
+    """Integer id of an entity name, or None if the name has never been seen"""
+    return get_dictionary().lookup(entity, name)
+
+def select_entity(df, entity, name):
+    """Rows of df whose <entity>_code matches name (no rows for an unknown name)"""
+    code = entity_code(entity, name)
+    if code is None:
+        return df.iloc[0:0]
+    return df[df[code_column(entity)].to_numpy() == code]
+
+def attach_entity_codes(data_type, df):
+    """
+    Add the <entity>_code columns for a loaded dataset and rewrite its entity
+    names to their canonical spelling. Work is per distinct name, not per row.
+    """
+    columns = [(column, entity) for column, entity in ENTITY_COLUMNS.get(data_type, []) if column in df.columns]
+    if not columns:
+        return df
+    dictionary = get_dictionary()
+    added = {}
+    for column, entity in columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            positions, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            positions, uniques = pd.factorize(values, use_na_sentinel=True)
+        unique_names = list(uniques)
+        unique_codes = np.array([MISSING_CODE if code is None else code for code in dictionary.resolve(entity, unique_names)], dtype=np.int32)
+        codes = np.where(positions >= 0, unique_codes[positions], MISSING_CODE).astype(np.int32)
+        added[code_column(entity)] = codes
+
+        canonical = [name if code == MISSING_CODE else dictionary.canonical_name(entity, code) for name, code in zip(unique_names, unique_codes)]
+        if canonical != unique_names:
+            renamed = values.map(dict(zip(unique_names, canonical)))
+            added[column] = renamed.astype('category' if isinstance(values.dtype, pd.CategoricalDtype) else values.dtype)
+    return df.assign(**added)
+
+def _read_names(data_type, column):
+    """Raw name counts of one column, read directly so the ingest does not depend on the loaders"""
+    from utils.data_handler import FILE_MAPPING, read_roster
+
+    if data_type == 'students':
+        # Usernames are listed in the roster logins are checked against
+        file_path = INSTRUCTOR_CONFIG['roster_file']
+        if not os.path.exists(file_path):
+            return Counter()
+        students = read_roster([column], file_path)
+        if column not in students.columns:
+            return Counter()
+        values = students[column].astype('category')
+        return Counter({name: count for name, count in values.value_counts().items() if count > 0})
+
+    file_path = FILE_MAPPING[data_type]
+    if not os.path.exists(file_path):
+        return Counter()
+    header = pd.read_csv(file_path, nrows=0).columns
+    if column not in header:
+        return Counter()
+    values = pd.read_csv(file_path, usecols=[column], dtype={column: 'category'})[column]
+    return Counter({name: count for name, count in values.value_counts().items() if count > 0})
+
+def build_dictionary(rebuild=False, file_path=None):
+    """
+    Ingest pass over every dataset. Existing ids are kept (unless rebuild);
+    new names are added most widely used first, so the common spelling is
+    the canonical one and rarer near-duplicates become its aliases.
+    Returns the report of corrected and unresolved names.
+    """
+    file_path = file_path or ENTITY_CONFIG['dictionary_file']
+    dictionary = EntityDictionary(file_path)
+    report = {'corrections': [], 'unresolved': []}
+    with exclusive_lock(file_path):
+        if not rebuild:
+            dictionary.refresh()
+        if dictionary.version != DICTIONARY_VERSION:
+            # Ids of an older layout may merge names that are now kept apart, so they are all reassigned
+            dictionary = EntityDictionary(file_path)
+        if dictionary.generation is None:
+            dictionary.generation = uuid.uuid4().hex
+
+        for entity, spec in ENTITY_SOURCES.items():
+            sources = ([spec['master']] if spec['master'] else []) + spec['references']
+            counts = {source: _read_names(*source) for source in sources}
+            seen_in = {}
+            for source, names in counts.items():
+                for name, count in names.items():
+                    entry = seen_in.setdefault(name, [set(), 0])
+                    entry[0].add(source[0])
+                    entry[1] += count
+            for name in sorted(seen_in, key=lambda name: (-len(seen_in[name][0]), -seen_in[name][1], str(name))):
+                dictionary._add(entity, name)
+
+            for name, (data_types, _) in sorted(seen_in.items(), key=lambda item: str(item[0])):
+                code = dictionary.lookup(entity, name)
+                canonical = dictionary.canonical_name(entity, code)
+                if canonical != name:
+                    report['corrections'].append({'entity': entity, 'name': name, 'canonical': canonical, 'found_in': sorted(data_types)})
+            # References to entities the master list does not have
+            if spec['master'] and counts[spec['master']]:
+                master_codes = {dictionary.lookup(entity, name) for name in counts[spec['master']]}
+                for name, (data_types, _) in sorted(seen_in.items(), key=lambda item: str(item[0])):
+                    if dictionary.lookup(entity, name) not in master_codes:
+                        report['unresolved'].append({'entity': entity, 'name': name, 'found_in': sorted(data_types)})
+        dictionary._save()
+    return report
+
+def write_report(report, file_path=None):
+    file_path = file_path or ENTITY_CONFIG['report_file']
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the entity dictionary and report unresolved names")
+    parser.add_argument('--rebuild', action='store_true', help="Reassign every id from scratch (cached catalogs and ids held elsewhere become stale)")
+    args = parser.parse_args()
+
+    report = build_dictionary(rebuild=args.rebuild)
+    write_report(report)
+    dictionary = EntityDictionary()
+    dictionary.refresh()
+    for entity in ENTITY_SOURCES:
+        print(f"{entity:<14} {len(dictionary.names.get(entity, [])):>7} ids  {len(dictionary.aliases.get(entity, {})):>5} aliases")
+    for correction in report['corrections']:
+        print(f"corrected  {correction['entity']}: {correction['name']!r} -> {correction['canonical']!r} ({', '.join(correction['found_in'])})")
+    for unresolved in report['unresolved']:
+        print(f"unresolved {unresolved['entity']}: {unresolved['name']!r} ({', '.join(unresolved['found_in'])}) is not in the master list")
+    print(f"Report written to {ENTITY_CONFIG['report_file']}")
+
+if __name__ == "__main__":
+    main()
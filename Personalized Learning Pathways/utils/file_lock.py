@@ -0,0 +1,86 @@
+"""
+Cross-process locks for the CSV stores (and worker id leases): exclusive
+locks for writers, and shared locks for readers that only need writers kept out.
+
+The lock is taken on a sidecar '<file>.lock' file rather than the data file
+itself, so readers are never blocked (Windows byte-range locks are
+mandatory) and the lock file can be created before the data file exists.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+def lock_path(file_path):
+    return f"{file_path}.lock"
+
+@contextmanager
+def _file_lock(file_path, shared, timeout):
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(lock_path(file_path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    # flock locks belong to the open file, so threads with their own fd also exclude each other
+                    fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for lock on {file_path}")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+def exclusive_lock(file_path, timeout=30.0):
+    """
+    Hold an exclusive lock for file_path across threads and processes.
+    Raises TimeoutError when it is not acquired within timeout seconds.
+    """
+    return _file_lock(file_path, False, timeout)
+
+def shared_lock(file_path, timeout=30.0):
+    """
+    Hold a shared lock for file_path: any number of holders at once, but
+    never together with an exclusive lock. Windows has no shared locks,
+    so there it is exclusive.
+    """
+    return _file_lock(file_path, True, timeout)
+
+def hold_lock(file_path):
+    """
+    Take the exclusive lock for file_path without waiting and keep it until
+    the returned descriptor is closed or the process exits (the OS releases
+    it even if the process crashes). Returns None when the lock is held elsewhere.
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(lock_path(file_path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
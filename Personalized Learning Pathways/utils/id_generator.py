@@ -0,0 +1,180 @@
+"""
+Time-ordered 64-bit IDs for progress records and quiz attempts.
+
+Snowflake layout, most significant bit first:
+
+    1 bit  unused (IDs stay positive in a signed int64)
+    41 bits milliseconds since ID_CONFIG['epoch'] (about 69 years)
+    10 bits worker id (0-1023)
+    12 bits per-millisecond sequence (4096 IDs per worker per ms)
+
+IDs sort by creation time, so a time range is an integer range, and they
+are stored as int64 columns (8 bytes; id_to_bytes gives the big-endian
+form, which also sorts bytewise). Each server process needs its own
+worker id: set PLP_WORKER_ID (or ID_CONFIG['worker_id']), otherwise the
+process leases the lowest free id by holding a lock in ID_CONFIG['lease_dir']
+for as long as it runs. Leases only exclude processes sharing that
+directory, so servers on separate machines need explicit ids.
+
+Legacy string progress ids can be rewritten to this format from the app
+directory with:
+
+    python -m utils.id_generator --migrate
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from config import ID_CONFIG
+
+TIMESTAMP_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS
+
+EPOCH_MS = int(pd.Timestamp(ID_CONFIG['epoch'], tz='UTC').timestamp() * 1000)
+
+# Descriptors of the lease locks held by this process (closing one would release its id)
+_leases = {}
+
+def lease_worker_id(lease_dir=None):
+    """
+    Lowest worker id no other process holds, kept until this process exits.
+    Raises RuntimeError when every id is taken or the lease directory is unusable.
+    """
+    from utils.file_lock import hold_lock
+
+    lease_dir = lease_dir or ID_CONFIG['lease_dir']
+    try:
+        for worker_id in range(MAX_WORKER_ID + 1):
+            fd = hold_lock(os.path.join(lease_dir, f"worker-{worker_id}"))
+            if fd is not None:
+                _leases[worker_id] = fd
+                return worker_id
+    except OSError as e:
+        raise RuntimeError(f"Cannot lease a worker id in {lease_dir} ({e}); set PLP_WORKER_ID") from e
+    raise RuntimeError(f"All {MAX_WORKER_ID + 1} worker ids in {lease_dir} are leased; set PLP_WORKER_ID")
+
+def default_worker_id():
+    """Worker id from PLP_WORKER_ID or the config, else a leased one"""
+    configured = os.environ.get('PLP_WORKER_ID', ID_CONFIG['worker_id'])
+    if configured is None:
+        return lease_worker_id()
+    worker_id = int(configured)
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ValueError(f"Worker id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+    return worker_id
+
+class IdGenerator:
+    """Thread-safe, monotonic Snowflake ID generator for one worker"""
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Worker id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - EPOCH_MS
+            # A clock that stepped backwards keeps issuing from the last timestamp, so IDs never go down
+            now_ms = max(now_ms, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond: move on to the next one
+                    while now_ms <= self._last_ms:
+                        now_ms = max(time.time_ns() // 1_000_000 - EPOCH_MS, self._last_ms + 1)
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << TIMESTAMP_SHIFT) | (self.worker_id << WORKER_SHIFT) | self._sequence
+
+_generator = None
+_generator_lock = threading.Lock()
+
+def next_id():
+    """Next ID from this process's generator"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = IdGenerator(default_worker_id())
+    return _generator.next_id()
+
+def id_to_datetime(id_value):
+    """Creation time encoded in an ID"""
+    return datetime.fromtimestamp(((int(id_value) >> TIMESTAMP_SHIFT) + EPOCH_MS) / 1000)
+
+def id_range(start=None, end=None):
+    """Smallest and largest possible IDs created within [start, end]"""
+    low = 0 if start is None else _ms_since_epoch(start) << TIMESTAMP_SHIFT
+    high = (1 << 63) - 1 if end is None else ((_ms_since_epoch(end) + 1) << TIMESTAMP_SHIFT) - 1
+    return max(low, 0), high
+
+def _ms_since_epoch(moment):
+    # Naive datetimes are local time, like the saved 'date' column
+    return int(pd.Timestamp(moment).to_pydatetime().timestamp() * 1000) - EPOCH_MS
+
+def id_to_bytes(id_value):
+    """Compact 8-byte big-endian form (sorts the same as the integer)"""
+    return int(id_value).to_bytes(8, 'big')
+
+def id_from_bytes(data):
+    return int.from_bytes(data, 'big')
+
+def legacy_ids_to_snowflake(dates, worker_id=0):
+    """
+    IDs for rows saved before this format, taken from their saved dates with
+    a running sequence so rows sharing a second stay distinct and in order
+    """
+    moments = pd.to_datetime(dates, errors='coerce')
+    ms = pd.Series(
+        [_ms_since_epoch(moment) if pd.notna(moment) else 0 for moment in moments],
+        index=moments.index, dtype='int64'
+    ).clip(lower=0)
+    sequence = ms.groupby(ms).cumcount() & MAX_SEQUENCE
+    return (ms.to_numpy() << TIMESTAMP_SHIFT) | (worker_id << WORKER_SHIFT) | sequence.to_numpy()
+
+def migrate_progress_ids(file_path='data/user_progress.csv'):
+    """Replace non-numeric progress ids in a progress CSV. Returns the number of rows rewritten."""
+    from utils.file_lock import exclusive_lock
+
+    with exclusive_lock(file_path):
+        df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+        legacy = ~df['progress_id'].str.fullmatch(r'\d+')
+        if not legacy.any():
+            return 0
+        df.loc[legacy, 'progress_id'] = legacy_ids_to_snowflake(df.loc[legacy, 'date']).astype(str)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        df.to_csv(temp_path, index=False)
+        os.replace(temp_path, file_path)
+        return int(legacy.sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Snowflake ID utilities")
+    parser.add_argument('--migrate', action='store_true', help="Rewrite legacy string progress ids")
+    parser.add_argument('--decode', type=int, help="Show the fields of an ID")
+    args = parser.parse_args()
+
+    if args.migrate:
+        print(f"Rewrote {migrate_progress_ids()} legacy progress ids")
+    if args.decode is not None:
+        print(f"created: {id_to_datetime(args.decode)}  "
+              f"worker: {(args.decode >> WORKER_SHIFT) & MAX_WORKER_ID}  "
+              f"sequence: {args.decode & MAX_SEQUENCE}")
+    if not args.migrate and args.decode is None:
+        print(next_id())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Import-time and first-render budget for app startup.
+
+Each scenario starts a fresh interpreter with `python -X importtime`,
+renders one page once through Streamlit's AppTest, and checks:
+
+- the imports triggered by the page (not by the test harness) against
+  import_ms, and the whole first render against first_run_ms
+- that modules the page must not load on that screen (Plotly, ReportLab)
+  were not imported
+
+Run from the app directory; exits non-zero when a budget is exceeded:
+
+    python -m utils.import_budget [--repeats 3] [--budget-scale 1.0] [--top 10]
+
+tests/test_import_budget.py runs the same checks under pytest when asked for
+with --startup-budgets.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Budgets leave headroom over a warm-disk run on a developer laptop; scale them for slower CI machines
+STARTUP_BUDGETS = {
+    'login': {
+        'page': 'app.py',
+        'authenticated': False,
+        'import_ms': 700,
+        'first_run_ms': 1000,
+        'forbidden': ['plotly', 'reportlab']
+    },
+    'iq_test_start': {
+        'page': 'pages/2_IQ_Test.py',
+        'authenticated': True,
+        'import_ms': 600,
+        'first_run_ms': 1000,
+        'forbidden': ['plotly', 'reportlab']
+    },
+    'career_quiz_start': {
+        'page': 'pages/3_Career_Quiz.py',
+        'authenticated': True,
+        'import_ms': 600,
+        'first_run_ms': 1000,
+        'forbidden': ['plotly', 'reportlab']
+    },
+    'certificates': {
+        'page': 'pages/6_Certificates.py',
+        'authenticated': True,
+        'import_ms': 600,
+        'first_run_ms': 1000,
+        'forbidden': ['reportlab']
+    }
+}
+
+# Written to stderr between the harness imports and the page run
+MARKER = 'import-budget: page run starts'
+
+_CHILD = """
+import json, logging, os, sys, time
+from streamlit.testing.v1 import AppTest
+logging.disable(logging.WARNING)
+app = AppTest.from_file(os.path.abspath({page!r}), default_timeout=120)
+if {authenticated!r}:
+    app.session_state['authenticated'] = True
+    app.session_state['username'] = 'Budget User'
+    app.session_state['user_data'] = {{'Name': 'Budget User', 'Age': '', 'Email': ''}}
+before = set(sys.modules)
+print({marker!r}, file=sys.stderr, flush=True)
+started = time.perf_counter()
+app.run()
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{
+    'first_run_ms': elapsed,
+    'exception': [str(e.value) for e in app.exception],
+    'loaded': sorted({{name.split('.')[0] for name in set(sys.modules) - before}})
+}}))
+"""
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def parse_importtime(stderr):
+    """(total ms, [(cumulative ms, module)]) for top-level imports after the marker"""
+    _, _, after = stderr.partition(MARKER)
+    entries = []
+    for line in after.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative_us, indent, module = match.groups()
+        # One space of indent marks an import made directly by the running code
+        if len(indent) == 1:
+            entries.append((int(cumulative_us) / 1000, module))
+    return sum(ms for ms, _ in entries), sorted(entries, reverse=True)
+
+def measure(scenario):
+    """Run one scenario in a fresh interpreter and return its measurements"""
+    settings = STARTUP_BUDGETS[scenario]
+    code = _CHILD.format(page=settings['page'], authenticated=settings['authenticated'], marker=MARKER)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True,
+        # Background warm-up would load Plotly and ReportLab on purpose
+        env=dict(os.environ, PLP_WARMUP='0')
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        raise RuntimeError(f"{scenario} failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    import_ms, top_imports = parse_importtime(result.stderr)
+    report['import_ms'] = import_ms
+    report['top_imports'] = top_imports
+    return report
+
+def check_budgets(repeats=3, budget_scale=1.0, scenarios=None):
+    """Median measurements per scenario and the list of budget violations"""
+    results = {}
+    violations = []
+    for scenario in scenarios or STARTUP_BUDGETS:
+        settings = STARTUP_BUDGETS[scenario]
+        runs = [measure(scenario) for _ in range(repeats)]
+        summary = {
+            'import_ms': statistics.median(run['import_ms'] for run in runs),
+            'first_run_ms': statistics.median(run['first_run_ms'] for run in runs),
+            'loaded': sorted({module for run in runs for module in run['loaded']}),
+            'top_imports': runs[-1]['top_imports'],
+            'exception': runs[-1]['exception']
+        }
+        results[scenario] = summary
+
+        for metric in ('import_ms', 'first_run_ms'):
+            budget = settings[metric] * budget_scale
+            if summary[metric] > budget:
+                violations.append(f"{scenario}: {metric} {summary[metric]:.0f} > budget {budget:.0f}")
+        for module in settings['forbidden']:
+            if module in summary['loaded']:
+                violations.append(f"{scenario}: imported {module}, which this screen must load lazily")
+        if summary['exception']:
+            violations.append(f"{scenario}: page raised {summary['exception'][0]}")
+    return results, violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time and first-render budgets")
+    parser.add_argument('--repeats', type=int, default=3, help="Fresh interpreters per scenario (median is used)")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="Multiply every time budget")
+    parser.add_argument('--top', type=int, default=5, help="Slowest page imports to list per scenario")
+    parser.add_argument('--scenarios', nargs='*', choices=list(STARTUP_BUDGETS), help="Only run these")
+    args = parser.parse_args()
+
+    results, violations = check_budgets(args.repeats, args.budget_scale, args.scenarios)
+    for scenario, summary in results.items():
+        budget = STARTUP_BUDGETS[scenario]
+        print(
+            f"{scenario:<18} imports {summary['import_ms']:>6.0f}ms (budget {budget['import_ms'] * args.budget_scale:.0f})  "
+            f"first run {summary['first_run_ms']:>6.0f}ms (budget {budget['first_run_ms'] * args.budget_scale:.0f})"
+        )
+        for ms, module in summary['top_imports'][:args.top]:
+            print(f"    {ms:>7.1f}ms  {module}")
+
+    if violations:
+        print(f"\nSTARTUP BUDGET EXCEEDED ({len(violations)}):", file=sys.stderr)
+        for violation in violations:
+            print(f"  {violation}", file=sys.stderr)
+        raise SystemExit(1)
+    print("\nAll startup budgets met")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Offline 2PL IRT calibration for the IQ question bank.
+
+Fits a discrimination (irt_a) and difficulty (irt_b) parameter for every
+question from logged per-question responses using Bock-Aitkin EM with
+vectorized Newton M-steps. Run from the app directory:
+
+    python -m utils.irt_calibration
+
+By default responses are read from the per-question response log
+(utils.response_log); --responses accepts a CSV export instead.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+QUESTIONS_FILE = 'data/questions.csv'
+PARAMETERS_FILE = 'data/question_parameters.csv'
+
+CALIBRATION_DEFAULTS = {
+    'quadrature_points': 31,
+    'max_iterations': 200,
+    'tolerance': 1e-4,
+    'newton_steps': 3,
+    'chunk_size': 250000,
+    'discrimination_bounds': (0.2, 4.0),
+    'difficulty_bounds': (-5.0, 5.0)
+}
+
+def build_response_matrix(responses_df):
+    """
+    Convert a long response table (attempt_id, question_id, correct) into a
+    sparse coordinate matrix sorted by person
+    """
+    responses_df = responses_df.dropna(subset=['attempt_id', 'question_id', 'correct'])
+    person_idx, person_ids = pd.factorize(responses_df['attempt_id'], sort=False)
+    item_idx, item_ids = pd.factorize(responses_df['question_id'], sort=True)
+    correct = responses_df['correct'].astype(float).to_numpy()
+
+    order = np.argsort(person_idx, kind='stable')
+    return {
+        'person_idx': person_idx[order].astype(np.int64),
+        'item_idx': item_idx[order].astype(np.int64),
+        'correct': correct[order],
+        'person_ids': np.asarray(person_ids),
+        'item_ids': np.asarray(item_ids),
+        'n_persons': len(person_ids),
+        'n_items': len(item_ids)
+    }
+
+def _person_chunks(matrix, chunk_size, n_nodes):
+    """
+    Split the person-sorted responses into chunks that never break a person
+    apart, precomputing the per-chunk grouping and scatter indexes
+    """
+    person_idx = matrix['person_idx']
+    if len(person_idx) == 0:
+        return []
+    starts = np.flatnonzero(np.r_[True, person_idx[1:] != person_idx[:-1]])
+    bounds = [0]
+    for start in starts:
+        if start - bounds[-1] >= chunk_size:
+            bounds.append(start)
+    bounds.append(len(person_idx))
+
+    chunks = []
+    node_offsets = np.arange(n_nodes)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        chunk_persons = person_idx[start:stop]
+        item_idx = matrix['item_idx'][start:stop]
+        group_starts = np.flatnonzero(np.r_[True, chunk_persons[1:] != chunk_persons[:-1]])
+        chunks.append({
+            'item_idx': item_idx,
+            'correct': matrix['correct'][start:stop][:, None],
+            'group_starts': group_starts,
+            'group_sizes': np.diff(np.r_[group_starts, stop - start]),
+            'flat_index': (item_idx[:, None] * n_nodes + node_offsets[None, :]).ravel()
+        })
+    return chunks
+
+def _e_step(matrix, chunks, discrimination, intercept, nodes, log_weights):
+    """Accumulate expected item-by-node counts over all persons, chunk by chunk"""
+    n_cells = matrix['n_items'] * len(nodes)
+    expected_n = np.zeros(n_cells)
+    expected_r = np.zeros(n_cells)
+    log_likelihood = 0.0
+
+    # Item-by-node log probabilities are computed once and gathered per response
+    logits = discrimination[:, None] * nodes[None, :] + intercept[:, None]
+    log_q = -np.logaddexp(0.0, logits)
+    log_ratio = -np.logaddexp(0.0, -logits) - log_q
+
+    for chunk in chunks:
+        item_idx = chunk['item_idx']
+        correct = chunk['correct']
+        response_ll = log_q[item_idx] + correct * log_ratio[item_idx]
+
+        # Responses are sorted by person, so per-person sums are a single reduceat
+        person_ll = np.add.reduceat(response_ll, chunk['group_starts'], axis=0) + log_weights[None, :]
+        peak = person_ll.max(axis=1, keepdims=True)
+        posterior = np.exp(person_ll - peak)
+        totals = posterior.sum(axis=1, keepdims=True)
+        posterior /= totals
+        log_likelihood += float((np.log(totals) + peak).sum())
+
+        response_posterior = np.repeat(posterior, chunk['group_sizes'], axis=0)
+        expected_n += np.bincount(chunk['flat_index'], weights=response_posterior.ravel(), minlength=n_cells)
+        expected_r += np.bincount(chunk['flat_index'], weights=(response_posterior * correct).ravel(), minlength=n_cells)
+
+    shape = (matrix['n_items'], len(nodes))
+    return expected_n.reshape(shape), expected_r.reshape(shape), log_likelihood
+
+def _m_step(expected_n, expected_r, discrimination, intercept, nodes, settings):
+    """Newton-Raphson updates of (a, d) for every item at once"""
+    a_min, a_max = settings['discrimination_bounds']
+    for _ in range(settings['newton_steps']):
+        prob = 1.0 / (1.0 + np.exp(-(discrimination[:, None] * nodes[None, :] + intercept[:, None])))
+        residual = expected_r - expected_n * prob
+        weight = expected_n * prob * (1.0 - prob)
+
+        grad_a = (residual * nodes).sum(axis=1)
+        grad_d = residual.sum(axis=1)
+        h_aa = (weight * nodes ** 2).sum(axis=1) + 1e-6
+        h_ad = (weight * nodes).sum(axis=1)
+        h_dd = weight.sum(axis=1) + 1e-6
+
+        determinant = h_aa * h_dd - h_ad ** 2
+        determinant = np.where(np.abs(determinant) < 1e-10, 1e-10, determinant)
+        step_a = (h_dd * grad_a - h_ad * grad_d) / determinant
+        step_d = (h_aa * grad_d - h_ad * grad_a) / determinant
+
+        discrimination = np.clip(discrimination + np.clip(step_a, -1.0, 1.0), a_min, a_max)
+        intercept = intercept + np.clip(step_d, -1.0, 1.0)
+    return discrimination, intercept
+
+def calibrate_2pl(responses_df, **overrides):
+    """
+    Fit 2PL parameters for every question that appears in the response log.
+    Returns the parameter table and a convergence report.
+    """
+    settings = dict(CALIBRATION_DEFAULTS, **overrides)
+    matrix = build_response_matrix(responses_df)
+    if matrix['n_items'] == 0:
+        return pd.DataFrame(), {'converged': False, 'iterations': 0, 'log_likelihood': [], 'max_change': None}
+
+    nodes = np.linspace(-4.0, 4.0, settings['quadrature_points'])
+    log_weights = -0.5 * nodes ** 2
+    log_weights -= np.logaddexp.reduce(log_weights)
+    chunks = _person_chunks(matrix, settings['chunk_size'], len(nodes))
+
+    # Start from unit discrimination and the logit of the observed proportion correct
+    item_total = np.bincount(matrix['item_idx'], minlength=matrix['n_items'])
+    item_correct = np.bincount(matrix['item_idx'], weights=matrix['correct'], minlength=matrix['n_items'])
+    p_correct = (item_correct + 0.5) / (item_total + 1.0)
+    discrimination = np.ones(matrix['n_items'])
+    intercept = np.log(p_correct / (1.0 - p_correct))
+
+    b_min, b_max = settings['difficulty_bounds']
+    log_likelihood_trace = []
+    converged = False
+    max_change = None
+    started = time.perf_counter()
+
+    for iteration in range(1, settings['max_iterations'] + 1):
+        expected_n, expected_r, log_likelihood = _e_step(matrix, chunks, discrimination, intercept, nodes, log_weights)
+        log_likelihood_trace.append(float(log_likelihood))
+
+        new_discrimination, new_intercept = _m_step(expected_n, expected_r, discrimination, intercept, nodes, settings)
+        new_intercept = np.clip(new_intercept, -b_max * new_discrimination, -b_min * new_discrimination)
+        max_change = float(max(np.abs(new_discrimination - discrimination).max(), np.abs(new_intercept - intercept).max()))
+        discrimination, intercept = new_discrimination, new_intercept
+
+        if max_change < settings['tolerance']:
+            converged = True
+            break
+
+    # Per-item fit: posterior-weighted RMSD between observed and model proportions at each node
+    expected_n, expected_r, log_likelihood = _e_step(matrix, chunks, discrimination, intercept, nodes, log_weights)
+    model_prob = 1.0 / (1.0 + np.exp(-(discrimination[:, None] * nodes[None, :] + intercept[:, None])))
+    observed_prob = np.divide(expected_r, expected_n, out=model_prob.copy(), where=expected_n > 1e-9)
+    node_share = expected_n / np.maximum(expected_n.sum(axis=1, keepdims=True), 1e-9)
+    rmsd = np.sqrt((node_share * (observed_prob - model_prob) ** 2).sum(axis=1))
+
+    parameters = pd.DataFrame({
+        'question_id': matrix['item_ids'],
+        'irt_a': discrimination.round(4),
+        'irt_b': (-intercept / discrimination).round(4),
+        'n_responses': item_total.astype(int),
+        'p_correct': (item_correct / np.maximum(item_total, 1)).round(4),
+        'rmsd': rmsd.round(4)
+    })
+
+    report = {
+        'converged': converged,
+        'iterations': iteration,
+        'max_change': max_change,
+        'log_likelihood': log_likelihood_trace + [float(log_likelihood)],
+        'n_persons': matrix['n_persons'],
+        'n_items': matrix['n_items'],
+        'n_responses': len(matrix['item_idx']),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    return parameters, report
+
+def write_item_parameters(parameters, file_path=PARAMETERS_FILE):
+    """Save calibrated parameters next to the question bank"""
+    parameters.to_csv(file_path, index=False)
+    return file_path
+
+def attach_item_parameters(questions_df, file_path=PARAMETERS_FILE):
+    """Merge calibrated irt_a / irt_b columns into a questions frame when available"""
+    if not os.path.exists(file_path) or 'irt_a' in questions_df.columns:
+        return questions_df
+    parameters = pd.read_csv(file_path, usecols=['question_id', 'irt_a', 'irt_b'])
+    return questions_df.merge(parameters, on='question_id', how='left')
+
+def format_report(parameters, report):
+    """Human readable convergence and item fit summary"""
+    lines = [
+        f"Responses: {report['n_responses']}  Attempts: {report['n_persons']}  Items: {report['n_items']}",
+        f"Converged: {report['converged']} after {report['iterations']} iterations "
+        f"(max parameter change {report['max_change']:.2e}, {report['seconds']}s)",
+        f"Marginal log-likelihood: {report['log_likelihood'][0]:.2f} -> {report['log_likelihood'][-1]:.2f}",
+        "",
+        parameters.to_string(index=False)
+    ]
+    misfit = parameters[parameters['rmsd'] > 0.1]
+    if not misfit.empty:
+        lines.append("")
+        lines.append(f"Items with RMSD > 0.1: {', '.join(str(q) for q in misfit['question_id'])}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate 2PL IRT parameters for the question bank")
+    parser.add_argument('--responses', help="CSV with attempt_id, question_id and correct columns (default: the response log)")
+    parser.add_argument('--output', default=PARAMETERS_FILE, help="Where to write the calibrated parameters")
+    parser.add_argument('--max-iterations', type=int, default=CALIBRATION_DEFAULTS['max_iterations'])
+    parser.add_argument('--tolerance', type=float, default=CALIBRATION_DEFAULTS['tolerance'])
+    args = parser.parse_args()
+
+    if args.responses:
+        responses_df = pd.read_csv(args.responses, usecols=['attempt_id', 'question_id', 'correct'])
+    else:
+        from utils.response_log import load_response_log
+        responses_df = load_response_log(columns=['attempt_id', 'question_id', 'correct'], quiz_type='iq_test')
+    parameters, report = calibrate_2pl(responses_df, max_iterations=args.max_iterations, tolerance=args.tolerance)
+    print(format_report(parameters, report))
+
+    if not parameters.empty:
+        write_item_parameters(parameters, args.output)
+        print(f"\nWrote {len(parameters)} item parameters to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Headless load test for concurrent quiz and dashboard sessions.
+
+Simulates many user sessions at once, each driven through Streamlit's
+AppTest (no browser or network). IQ sessions take the standard IQ test
+start to finish, career sessions complete the career quiz, and dashboard
+sessions reload the dashboard. Reports percentiles of the time each rerun
+ran per page, of the time reruns waited for their turn and of the two
+together, memory per session, and saved rows per second. Runs on a scratch copy of
+the data directory, never the real one. Run from the app directory:
+
+    python -m utils.load_test [--sessions 20] [--processes 1] [--mix iq=2,career=1,dashboard=1]
+
+Each worker process stands in for one server process. AppTest installs a
+process-global runtime for every run, so a worker executes one rerun at a
+time while its other sessions wait. The wait is reported apart from the
+run time, since with many sessions per process it dominates the total and
+says more about the harness than about the pages. Use --processes to model
+several server processes writing to the same data files.
+
+--source points at another app-style directory (for example a dataset
+made by utils.synthetic_data) whose data/ is copied instead.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+PAGES = {
+    'iq': 'pages/2_IQ_Test.py',
+    'career': 'pages/3_Career_Quiz.py',
+    'dashboard': 'pages/1_Dashboard.py'
+}
+DEFAULT_MIX = {'iq': 2, 'career': 1, 'dashboard': 1}
+COUNTED_FILES = ['data/user_progress.csv', 'data/quiz_results.csv']
+
+# One AppTest run at a time per process (see the module docstring)
+_run_lock = threading.Lock()
+
+def rss_bytes():
+    """Current resident set size (Linux), else the peak reported by getrusage"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _count_rows(file_path):
+    if not os.path.exists(file_path):
+        return 0
+    with open(file_path, 'rb') as f:
+        return max(sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1, 0)
+
+class SimulatedSession:
+    """One user session: an AppTest instance plus the timing of every rerun it made"""
+
+    def __init__(self, kind, username, app_dir, think_time=0.0):
+        from streamlit.testing.v1 import AppTest
+
+        self.kind = kind
+        self.username = username
+        self.think_time = think_time
+        self.run_times = []
+        self.wait_times = []
+        self.error = None
+        self.app = AppTest.from_file(os.path.join(app_dir, PAGES[kind]), default_timeout=120)
+        self.app.session_state['authenticated'] = True
+        self.app.session_state['username'] = username
+        self.app.session_state['user_data'] = {'Name': username, 'Age': '', 'Email': ''}
+
+    def _run(self, element=None):
+        """One rerun, optionally triggered by a widget; returns the app"""
+        if self.think_time:
+            time.sleep(self.think_time)
+        requested = time.perf_counter()
+        with _run_lock:
+            started = time.perf_counter()
+            if element is None:
+                self.app.run()
+            else:
+                element.run()
+            finished = time.perf_counter()
+        self.run_times.append((finished - started) * 1000)
+        self.wait_times.append((started - requested) * 1000)
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].value)
+        return self.app
+
+    def _button(self, *labels):
+        return next(button for button in self.app.button if button.label in labels)
+
+    def take_iq_test(self, rng):
+        app = self._run()
+        app.radio[0].set_value('Standard')
+        self._run(self._button('Start IQ Test').click())
+        while app.session_state['iq_quiz_state'] == 'in_progress':
+            choice = app.radio[0]
+            self._run(choice.set_value(choice.options[rng.integers(len(choice.options))]))
+            self._run(self._button('Next Question').click())
+        # The results screen saved the attempt; start over for the next iteration
+        self._run(self._button('Take Another Test').click())
+
+    def take_career_quiz(self, rng):
+        app = self._run()
+        self._run(self._button('Start Career Quiz').click())
+        while app.session_state['career_quiz_state'] == 'in_progress':
+            choice = app.radio[0]
+            self._run(choice.set_value(choice.options[rng.integers(len(choice.options))]))
+            self._run(self._button('Next Question →', 'Finish Quiz').click())
+        self._run(self._button('Retake Assessment').click())
+
+    def view_dashboard(self, rng, reloads=5):
+        for _ in range(reloads):
+            self._run()
+
+    def run(self, iterations, seed):
+        rng = np.random.default_rng(seed)
+        scenario = {
+            'iq': self.take_iq_test,
+            'career': self.take_career_quiz,
+            'dashboard': self.view_dashboard
+        }[self.kind]
+        try:
+            for _ in range(iterations):
+                scenario(rng)
+        except Exception as e:
+            self.error = repr(e)
+
+def _run_worker(process_index, sessions, iterations, think_time, seed, app_dir, ready_barrier, start_barrier, results):
+    """One simulated server process: warm up, then run its sessions concurrently"""
+    from utils.progress_writer import progress_writer
+
+    # Bare-mode sessions log warnings on every rerun, and AppTest resets Streamlit's logger levels
+    logging.disable(logging.WARNING)
+
+    # One untimed session per page loads modules and caches, so they are not charged to the sessions
+    for kind in sorted({kind for kind, _ in sessions}):
+        SimulatedSession(kind, 'Warm Up', app_dir).run(1, seed)
+    progress_writer.wait_for()
+    gc.collect()
+    rss_before = rss_bytes()
+    batches_before = progress_writer.batches
+
+    simulated = [SimulatedSession(kind, username, app_dir, think_time) for kind, username in sessions]
+    threads = [
+        threading.Thread(target=session.run, args=(iterations, seed + process_index * 10000 + i))
+        for i, session in enumerate(simulated)
+    ]
+    ready_barrier.wait()
+    start_barrier.wait()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    progress_writer.wait_for()
+
+    # Every session is still alive here, so the growth is what they hold
+    results.put({
+        'timings': [(session.kind, session.run_times, session.wait_times) for session in simulated],
+        'errors': [f"{session.username} ({session.kind}): {session.error}" for session in simulated if session.error],
+        'rss_growth': rss_bytes() - rss_before,
+        'rss': rss_bytes(),
+        'sessions': len(simulated),
+        'writer_batches': progress_writer.batches - batches_before
+    })
+
+@contextmanager
+def scratch_data_dir(source_dir):
+    """Copy source_dir/data into a temporary directory and make it the working directory"""
+    work_dir = tempfile.mkdtemp(prefix='load-test-')
+    shutil.copytree(
+        os.path.join(source_dir, 'data'), os.path.join(work_dir, 'data'),
+        ignore=shutil.ignore_patterns('catalog', 'response_log', '*.lock', '*.tmp')
+    )
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        yield work_dir
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _session_kinds(sessions, mix):
+    """Spread the session count over the page mix, e.g. {'iq': 2, 'dashboard': 1}"""
+    weights = np.array([mix[kind] for kind in mix], dtype=float)
+    counts = np.floor(sessions * weights / weights.sum()).astype(int)
+    counts[np.argsort(-weights)[:sessions - counts.sum()]] += 1
+    return [kind for kind, count in zip(mix, counts) for _ in range(count)]
+
+def _percentiles(values):
+    values = np.asarray(values)
+    if not len(values):
+        return {'reruns': 0}
+    return {
+        'reruns': len(values),
+        'mean_ms': round(float(values.mean()), 2),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p90_ms': round(float(np.percentile(values, 90)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2)
+    }
+
+def run_load_test(sessions=20, processes=1, mix=None, iterations=1, think_time=0.0, source_dir='.', seed=0):
+    """Run the simulated sessions and return a summary dict"""
+    mix = mix or DEFAULT_MIX
+    app_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    source_dir = os.path.abspath(source_dir)
+    context = multiprocessing.get_context('spawn')
+
+    named = [(kind, f"Load User {i:04d}") for i, kind in enumerate(_session_kinds(sessions, mix))]
+    with scratch_data_dir(source_dir):
+        ready_barrier = context.Barrier(processes + 1)
+        start_barrier = context.Barrier(processes + 1)
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=_run_worker,
+                args=(i, named[i::processes], iterations, think_time, seed, app_dir, ready_barrier, start_barrier, results)
+            )
+            for i in range(processes)
+        ]
+        for process in workers:
+            process.start()
+
+        # Workers have warmed up (and saved their warm-up results) before the count
+        ready_barrier.wait()
+        rows_before = {path: _count_rows(path) for path in COUNTED_FILES}
+        start_barrier.wait()
+        started = time.perf_counter()
+        reports = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for process in workers:
+            process.join()
+        rows_written = sum(_count_rows(path) - rows_before[path] for path in COUNTED_FILES)
+
+    timings = [entry for report in reports for entry in report['timings']]
+    all_run = [run for _, run_times, _ in timings for run in run_times]
+    all_wait = [wait for _, _, wait_times in timings for wait in wait_times]
+    all_total = [run + wait for _, run_times, wait_times in timings for run, wait in zip(run_times, wait_times)]
+    errors = [error for report in reports for error in report['errors']]
+    total_sessions = sum(report['sessions'] for report in reports)
+    return {
+        'sessions': total_sessions,
+        'processes': processes,
+        'iterations': iterations,
+        'seconds': round(elapsed, 3),
+        'reruns_per_second': round(len(all_run) / elapsed, 1) if elapsed > 0 else None,
+        # Per page run time; the wait depends on the other sessions, not the page
+        'pages': {
+            kind: _percentiles([run for page, run_times, _ in timings if page == kind for run in run_times])
+            for kind in mix
+        },
+        'run': _percentiles(all_run),
+        'wait': _percentiles(all_wait),
+        'overall': _percentiles(all_total),
+        'memory_per_session_mb': round(sum(report['rss_growth'] for report in reports) / max(total_sessions, 1) / 2**20, 2),
+        'rss_mb': round(sum(report['rss'] for report in reports) / 2**20, 1),
+        'rows_written': rows_written,
+        'writes_per_second': round(rows_written / elapsed, 1) if elapsed > 0 else None,
+        'writer_batches': sum(report['writer_batches'] for report in reports),
+        'failed_sessions': len(errors),
+        'failed_processes': sum(process.exitcode != 0 for process in workers),
+        'errors': errors
+    }
+
+def format_results(result):
+    lines = [
+        f"{result['sessions']} sessions in {result['processes']} process(es), {result['iterations']} iteration(s), "
+        f"{result['seconds']}s ({result['reruns_per_second']} reruns/s)",
+        f"{'run time':<10}  {'reruns':>7}  {'p50':>9}  {'p90':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}"
+    ]
+    rows = list(result['pages'].items()) + [
+        ('all', result['run']), ('(wait)', result['wait']), ('(total)', result['overall'])
+    ]
+    for page, stats in rows:
+        if not stats['reruns']:
+            continue
+        lines.append(
+            f"{page:<10}  {stats['reruns']:>7}  {stats['p50_ms']:>7.1f}ms  {stats['p90_ms']:>7.1f}ms  "
+            f"{stats['p95_ms']:>7.1f}ms  {stats['p99_ms']:>7.1f}ms  {stats['max_ms']:>7.1f}ms"
+        )
+    lines.append(f"memory per session: {result['memory_per_session_mb']} MB (total RSS {result['rss_mb']} MB)")
+    lines.append(
+        f"saved rows: {result['rows_written']} ({result['writes_per_second']}/s "
+        f"in {result['writer_batches']} writer batches)"
+    )
+    for error in result['errors']:
+        lines.append(f"FAILED {error}")
+    return "\n".join(lines)
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in PAGES:
+            raise argparse.ArgumentTypeError(f"Unknown page '{kind}', expected one of {', '.join(PAGES)}")
+        mix[kind] = int(weight or 1)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless concurrent-session load test")
+    parser.add_argument('--sessions', type=int, default=20, help="Simultaneous sessions in total")
+    parser.add_argument('--processes', type=int, default=1, help="Simulated server processes")
+    parser.add_argument('--mix', type=_parse_mix, default=DEFAULT_MIX, help="Page weights, e.g. iq=2,career=1,dashboard=1")
+    parser.add_argument('--iterations', type=int, default=1, help="Quizzes (or dashboard visits) per session")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Seconds each session waits before a rerun")
+    parser.add_argument('--source', default='.', help="Directory whose data/ is copied for the test")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = run_load_test(args.sessions, args.processes, args.mix, args.iterations, args.think_time, args.source, args.seed)
+    print(format_results(result))
+    if result['failed_sessions'] or result['failed_processes']:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Span timings for the hot paths of a page rerun.
+
+Wrap a function with @timed, or a block with `with span('name'):`. Each
+thread records into its own histograms, so the recording path takes no
+lock; exports fold every thread's histograms together. Streamlit runs each
+rerun on a fresh thread, and histograms of finished threads are merged
+into a retired total so the registry stays small.
+
+Metrics are written in the Prometheus text format to
+METRICS_CONFIG['export_path'] every export_interval seconds (and at exit).
+With the debug panel on (METRICS_CONFIG['debug_panel'] or ?debug=1), pages
+that call require_auth show the spans of the session's previous rerun in
+the sidebar.
+"""
+import atexit
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from config import METRICS_CONFIG
+
+BUCKETS_MS = METRICS_CONFIG['buckets_ms']
+SAMPLE_EVERY = max(1, int(METRICS_CONFIG['sample_every']))
+ENABLED = METRICS_CONFIG['enabled']
+
+class Histogram:
+    """Cumulative-on-export timing histogram for one span name in one thread"""
+    __slots__ = ('calls', 'counts', 'sum_ms')
+
+    def __init__(self):
+        self.calls = 0
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.sum_ms = 0.0
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.sum_ms += other.sum_ms
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+
+    @property
+    def sampled(self):
+        return sum(self.counts)
+
+_local = threading.local()
+_thread_histograms = {}
+_retired = {}
+_registry_lock = threading.Lock()
+_exporter = None
+
+def _histograms():
+    """This thread's {span name: Histogram}, registered on first use"""
+    histograms = getattr(_local, 'histograms', None)
+    if histograms is None:
+        histograms = _local.histograms = {}
+        _local.trace = None
+        _local.trace_owner = None
+        _local.depth = 0
+        with _registry_lock:
+            _thread_histograms[threading.current_thread()] = histograms
+            if len(_thread_histograms) > 64:
+                _retire_finished_threads()
+        _ensure_exporter()
+    return histograms
+
+def _retire_finished_threads():
+    """Fold histograms of threads that have exited into the retired totals (lock held)"""
+    for thread in [thread for thread in _thread_histograms if not thread.is_alive()]:
+        for name, histogram in _thread_histograms.pop(thread).items():
+            _retired.setdefault(name, Histogram()).merge(histogram)
+
+def _active_trace():
+    """This thread's trace, ended first if the thread is now running for another session"""
+    trace = _local.trace
+    if trace is not None and _local.trace_owner is not None and _script_run_ctx() is not _local.trace_owner:
+        trace = _local.trace = None
+    return trace
+
+def _script_run_ctx():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    return get_script_run_ctx(suppress_warning=True)
+
+def _enter():
+    """Open a timed span; returns its slot in the active trace, if any"""
+    _local.depth += 1
+    trace = _active_trace()
+    if trace is None:
+        return None
+    # Reserve the slot now so spans are listed in the order they started
+    trace.append(None)
+    return len(trace) - 1
+
+def _exit(name, elapsed_ns, slot):
+    _local.depth -= 1
+    histogram = _local.histograms[name]
+    elapsed_ms = elapsed_ns / 1e6
+    histogram.counts[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+    histogram.sum_ms += elapsed_ms
+    trace = _local.trace
+    if slot is not None and trace is not None and slot < len(trace):
+        trace[slot] = (_local.depth, name, elapsed_ms)
+
+def _should_time(name):
+    """Count the call and decide whether this one is sampled"""
+    histograms = _histograms()
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.calls += 1
+    # Traced reruns time every call so the debug panel is complete
+    return histogram.calls % SAMPLE_EVERY == 0 or _active_trace() is not None
+
+class span:
+    """Context manager timing a block under the given span name"""
+    __slots__ = ('name', 'started', 'slot')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        if ENABLED and _should_time(self.name):
+            self.slot = _enter()
+            self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.started is not None:
+            _exit(self.name, time.perf_counter_ns() - self.started, self.slot)
+        return False
+
+def timed(name=None):
+    """Decorator timing every call of a function; the name defaults to module.qualname"""
+    def decorate(function):
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _should_time(span_name):
+                return function(*args, **kwargs)
+            slot = _enter()
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _exit(span_name, time.perf_counter_ns() - started, slot)
+        return wrapper
+    return decorate
+
+def snapshot():
+    """All threads' histograms merged into {span name: Histogram}"""
+    merged = {}
+    with _registry_lock:
+        _retire_finished_threads()
+        sources = [_retired] + list(_thread_histograms.values())
+        for histograms in sources:
+            for name, histogram in list(histograms.items()):
+                merged.setdefault(name, Histogram()).merge(histogram)
+    return merged
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+def render_prometheus(histograms=None):
+    """Span histograms in the Prometheus text exposition format"""
+    histograms = snapshot() if histograms is None else histograms
+    lines = [
+        "# HELP plp_span_duration_seconds Sampled duration of instrumented code paths.",
+        "# TYPE plp_span_duration_seconds histogram"
+    ]
+    for name in sorted(histograms):
+        histogram = histograms[name]
+        label = _label(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS, histogram.counts):
+            cumulative += count
+            lines.append(f'plp_span_duration_seconds_bucket{{span="{label}",le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'plp_span_duration_seconds_bucket{{span="{label}",le="+Inf"}} {histogram.sampled}')
+        lines.append(f'plp_span_duration_seconds_sum{{span="{label}"}} {histogram.sum_ms / 1000:.6f}')
+        lines.append(f'plp_span_duration_seconds_count{{span="{label}"}} {histogram.sampled}')
+    lines.append("# HELP plp_span_calls_total Calls of instrumented code paths, sampled or not.")
+    lines.append("# TYPE plp_span_calls_total counter")
+    for name in sorted(histograms):
+        lines.append(f'plp_span_calls_total{{span="{_label(name)}"}} {histograms[name].calls}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(file_path=None):
+    """Write the metrics file atomically, so a scraper never reads half of it"""
+    # '{pid}' in the path gives each server process its own file
+    file_path = (file_path or METRICS_CONFIG['export_path']).format(pid=os.getpid())
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, file_path)
+
+def _export_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_metrics_file()
+        except OSError:
+            pass
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is not None or not METRICS_CONFIG['export_path']:
+        return
+    with _registry_lock:
+        if _exporter is not None:
+            return
+        _exporter = threading.Thread(target=_export_loop, args=(METRICS_CONFIG['export_interval'],), name='metrics-exporter', daemon=True)
+        _exporter.start()
+    atexit.register(write_metrics_file)
+
+def start_trace(owner=None):
+    """
+    Collect this thread's spans into a list until stop_trace(), or until the
+    thread runs for a script run context other than owner; returns the list
+    """
+    _histograms()
+    _local.trace = []
+    _local.trace_owner = owner
+    return _local.trace
+
+def stop_trace():
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    _local.trace_owner = None
+    return trace or []
+
+def debug_panel_enabled():
+    import streamlit as st
+
+    return METRICS_CONFIG['debug_panel'] or st.query_params.get('debug') == '1'
+
+def render_debug_panel():
+    """
+    Show the spans of this session's previous rerun in the sidebar and start
+    tracing the current one
+    """
+    import streamlit as st
+
+    # A trace covers one rerun: whatever the previous run on this thread started ends here,
+    # even when the panel has since been turned off
+    stop_trace()
+    if not ENABLED or not debug_panel_enabled():
+        return
+    # Slots of spans still open when the rerun ended stay empty
+    previous = [entry for entry in st.session_state.get('_metrics_trace') or [] if entry is not None]
+    with st.sidebar.expander("⏱️ Span timings (previous rerun)"):
+        if previous:
+            st.text("\n".join(f"{'  ' * depth}{name}  {elapsed:.2f} ms" for depth, name, elapsed in previous))
+            st.caption(f"{len(previous)} spans, {sum(elapsed for depth, _, elapsed in previous if depth == 0):.1f} ms in top-level spans")
+        else:
+            st.caption("No spans recorded yet")
+    st.session_state['_metrics_trace'] = start_trace(owner=_script_run_ctx())
@@ -1,27 +1,278 @@
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
-from utils.data_handler import load_data
+from config import PROGRESS_CONFIG
+from utils.data_handler import iter_data
+from utils.retention import read_archive
+from utils.rollup_cube import user_version
+from utils.downsampling import downsample_frame
+from utils.metrics import timed
+from utils.schemas import observed_value_counts
+
+class FigureCache:
+    """
+    Bounded LRU cache keyed by user_id and the version of that user's
+    progress: Plotly figures (with the chart type), and the loaded progress
+    they are drawn from
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_build(self, key, builder):
+        """Return the cached figure for key, building and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        
+        figure = builder()
+        
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = figure
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return figure
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Shared by every session in the server process
+figure_cache = FigureCache(PROGRESS_CONFIG['figure_cache_size'])
+# (totals, archived daily totals, raw rows) per (user_id, progress version)
+progress_cache = FigureCache(PROGRESS_CONFIG['figure_cache_size'])
+
+class ProgressAggregate:
+    """
+    Running totals over progress chunks: memory for one chunk plus an entry
+    per activity type and learning day, however long the history is.
+    Archived history arrives as daily totals (see daily_totals and utils.retention).
+    """
+    HIGH_SCORE = 90
+    LOW_SCORE = 75
+    # Upper bounds (inclusive) of the certificate score distribution ranges
+    SCORE_RANGES = [('0-50%', 50), ('51-70%', 70), ('71-85%', 85), ('86-95%', 95), ('96-100%', np.inf)]
+    RANGE_COLUMNS = [f"score_range_{position}" for position in range(len(SCORE_RANGES))]
+    # How daily_totals are merged: {column: aggregation}
+    DAILY_MEASURES = {
+        'count': 'sum', 'score_sum': 'sum', 'score_count': 'sum', 'score_min': 'min',
+        'score_max': 'max', 'high_scores': 'sum', 'last_score': 'last',
+        **{column: 'sum' for column in RANGE_COLUMNS}
+    }
+    
+    def __init__(self):
+        self.total = 0
+        self.activity_counts = Counter()
+        self.score_sum = 0.0
+        self.score_count = 0
+        # Assessments are every activity except study plans
+        self.assessments = 0
+        self.assessment_score_sum = 0.0
+        self.assessment_score_count = 0
+        self.high_scores = 0
+        self.score_range_counts = [0] * len(self.SCORE_RANGES)
+        # {activity_type: (score, date)} of the first best and the last record
+        self.best = {}
+        self.latest = {}
+        # {activity_type: lowest score}, in order of first appearance
+        self.lowest = {}
+        self.learning_days = set()
+    
+    @classmethod
+    def from_chunks(cls, chunks, archived=None):
+        """Totals of archived daily totals (oldest history) followed by raw chunks"""
+        aggregate = cls()
+        if archived is not None:
+            aggregate.add_daily(archived)
+        for chunk in chunks:
+            aggregate.add(chunk)
+        return aggregate
+    
+    @classmethod
+    def _score_ranges(cls, scores):
+        bounds = [-np.inf] + [bound for _, bound in cls.SCORE_RANGES]
+        return pd.cut(scores, bounds, right=True, labels=False)
+    
+    @classmethod
+    def daily_totals(cls, rows, keys=('user_id',)):
+        """
+        Per keys, day and activity type totals of typed progress rows: everything
+        add_daily needs to give the same results as adding the rows themselves
+        """
+        scores = rows['score']
+        assessed = rows['activity_type'] != 'study_plan'
+        ranges = cls._score_ranges(scores.where(assessed))
+        frame = rows.assign(
+            day=rows['date'].dt.normalize(),
+            high_scores=(assessed & (scores >= cls.HIGH_SCORE)).astype('int64'),
+            **{column: (ranges == position).astype('int64') for position, column in enumerate(cls.RANGE_COLUMNS)}
+        )
+        totals = frame.groupby(list(keys) + ['day', 'activity_type'], observed=True, sort=False).agg(
+            count=('score', 'size'),
+            score_sum=('score', 'sum'),
+            score_count=('score', 'count'),
+            score_min=('score', 'min'),
+            score_max=('score', 'max'),
+            high_scores=('high_scores', 'sum'),
+            last_score=('score', 'last'),
+            **{column: (column, 'sum') for column in cls.RANGE_COLUMNS}
+        )
+        return totals.reset_index()
+    
+    @classmethod
+    def merge_daily(cls, parts, keys=('user_id',)):
+        """Merge daily_totals of consecutive parts of the log (later parts last)"""
+        combined = pd.concat(parts, ignore_index=True)
+        return combined.groupby(list(keys) + ['day', 'activity_type'], observed=True, sort=False).agg(cls.DAILY_MEASURES).reset_index()
+    
+    def add_daily(self, daily):
+        """Fold in daily_totals of one user's history, older than anything added afterwards"""
+        if daily.empty:
+            return
+        daily = daily.sort_values('day', kind='stable')
+        self.total += int(daily['count'].sum())
+        self.activity_counts.update({
+            activity_type: int(count)
+            for activity_type, count in daily.groupby('activity_type', observed=True, sort=False)['count'].sum().items()
+        })
+        self.score_sum += daily['score_sum'].sum()
+        self.score_count += int(daily['score_count'].sum())
+        
+        assessed = daily[daily['activity_type'] != 'study_plan']
+        self.assessments += int(assessed['count'].sum())
+        self.assessment_score_sum += assessed['score_sum'].sum()
+        self.assessment_score_count += int(assessed['score_count'].sum())
+        self.high_scores += int(assessed['high_scores'].sum())
+        for position, column in enumerate(self.RANGE_COLUMNS):
+            self.score_range_counts[position] += int(assessed[column].sum())
+        
+        for activity_type, group in daily.groupby('activity_type', observed=True, sort=False):
+            last = group.iloc[-1]
+            self.latest[activity_type] = (last['last_score'], last['day'])
+            if group['score_max'].notna().any():
+                best = group.loc[group['score_max'].idxmax()]
+                if activity_type not in self.best or best['score_max'] > self.best[activity_type][0]:
+                    self.best[activity_type] = (best['score_max'], best['day'])
+                self._update_lowest(activity_type, group['score_min'].min())
+        self.learning_days.update(day.date() for day in daily['day'].unique())
+    
+    def _update_lowest(self, activity_type, score):
+        if activity_type not in self.lowest or score < self.lowest[activity_type]:
+            self.lowest[activity_type] = score
+    
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        self.total += len(chunk)
+        self.activity_counts.update(observed_value_counts(chunk['activity_type']).to_dict())
+        self.score_sum += chunk['score'].sum()
+        self.score_count += int(chunk['score'].count())
+        
+        scores = chunk.loc[chunk['activity_type'] != 'study_plan', 'score']
+        self.assessments += len(scores)
+        self.assessment_score_sum += scores.sum()
+        self.assessment_score_count += int(scores.count())
+        self.high_scores += int((scores >= self.HIGH_SCORE).sum())
+        in_range = self._score_ranges(scores).value_counts()
+        for position, count in in_range.items():
+            self.score_range_counts[int(position)] += int(count)
+        
+        for activity_type, group in chunk.groupby('activity_type', observed=True, sort=False):
+            last = group.iloc[-1]
+            self.latest[activity_type] = (last['score'], last['date'])
+            if group['score'].notna().any():
+                best = group.loc[group['score'].idxmax()]
+                if activity_type not in self.best or best['score'] > self.best[activity_type][0]:
+                    self.best[activity_type] = (best['score'], best['date'])
+                self._update_lowest(activity_type, group['score'].min())
+        self.learning_days.update(chunk['date'].dropna().dt.date.unique())
+    
+    @property
+    def average_score(self):
+        """Mean score of every activity (study plans count as 0)"""
+        return self.score_sum / self.score_count if self.score_count else np.nan
+    
+    @property
+    def assessment_average(self):
+        """Mean score excluding study plans"""
+        return self.assessment_score_sum / self.assessment_score_count if self.assessment_score_count else np.nan
+    
+    def score_distribution(self):
+        return {label: count for (label, _), count in zip(self.SCORE_RANGES, self.score_range_counts)}
+    
+    def low_scoring_activities(self):
+        """Activity types (other than study plans) with a score below LOW_SCORE"""
+        return [
+            activity_type for activity_type, score in self.lowest.items()
+            if activity_type != 'study_plan' and score < self.LOW_SCORE
+        ]
+
+def user_progress_totals(user_id):
+    """ProgressAggregate of a user's archived daily totals and raw progress log rows"""
+    return ProgressAggregate.from_chunks(iter_data('user_progress', user_id=user_id), archived=read_archive(user_id))
 
 class ProgressTracker:
-    def __init__(self, user_id):
+    def __init__(self, user_id, use_cache=True):
         self.user_id = user_id
+        if not use_cache:
+            # Always scans the log (e.g. to verify a compaction while it holds the log's lock)
+            self.progress_version = None
+            self._load()
+            return
+        # Stamp the version before loading so a concurrent write can only make the key stale, never wrong.
+        # It only changes when this user's progress does, so other users' saves keep the cache warm
+        self.progress_version = user_version(user_id)
+        self.aggregate, self.archived_df, self.progress_df = progress_cache.get_or_build(
+            (user_id, self.progress_version), self._load
+        )
+    
+    def _load(self):
+        """Scan the user's archived and raw progress (only when the cached copy is out of date)"""
+        self.aggregate = ProgressAggregate()
+        # Daily totals of history older than the raw retention window
+        self.archived_df = read_archive(self.user_id)
+        self.aggregate.add_daily(self.archived_df)
         self.progress_df = self.load_user_progress()
+        return self.aggregate, self.archived_df, self.progress_df
+    
+    @property
+    def has_activity(self):
+        """True if the user has any raw or archived activity"""
+        return self.aggregate.total > 0
     
+    def _cached_figure(self, chart_type, builder):
+        """Serve a chart from the figure cache while the user's progress data is unchanged"""
+        if self.progress_version is None:
+            return builder()
+        return figure_cache.get_or_build((self.user_id, self.progress_version, chart_type), builder)
+    
+    @timed()
     def load_user_progress(self):
-        """Load progress data for the user"""
-        all_progress = load_data('user_progress')
-        if all_progress is not None and not all_progress.empty:
-            user_progress = all_progress[all_progress['user_id'] == self.user_id].copy()
-            if not user_progress.empty:
-                user_progress['date'] = pd.to_datetime(user_progress['date'])
-            return user_progress
-        return pd.DataFrame()
+        """
+        Stream the progress log and keep the user's raw rows (dates arrive
+        parsed), updating the summary totals chunk by chunk
+        """
+        chunks = []
+        for chunk in iter_data('user_progress', user_id=self.user_id):
+            self.aggregate.add(chunk)
+            chunks.append(chunk)
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks)
     
+    @timed()
     def get_activity_summary(self):
         """Get summary of user activities"""
-        if self.progress_df.empty:
+        if not self.has_activity:
             return {
                 'total_activities': 0,
                 'average_score': 0,
@@ -30,15 +281,15 @@ class ProgressTracker:
             }
         
         # Calculate summary statistics
-        total_activities = len(self.progress_df)
-        average_score = self.progress_df['score'].mean() if 'score' in self.progress_df.columns else 0
+        total_activities = self.aggregate.total
+        average_score = self.aggregate.average_score
         
         # Recent activities (last 7 days)
         recent_date = datetime.now() - timedelta(days=7)
-        recent_activities = len(self.progress_df[self.progress_df['date'] >= recent_date])
+        recent_activities = len(self.progress_df[self.progress_df['date'] >= recent_date]) if not self.progress_df.empty else 0
         
         # Activity types breakdown
-        activity_types = self.progress_df['activity_type'].value_counts().to_dict()
+        activity_types = dict(self.aggregate.activity_counts.most_common())
         
         return {
             'total_activities': total_activities,
@@ -47,17 +298,52 @@ class ProgressTracker:
             'activity_types': activity_types
         }
     
-    def create_progress_chart(self):
-        """Create a progress chart showing scores over time"""
-        if self.progress_df.empty:
-            return None
+    @timed()
+    def get_score_series(self, start=None, end=None, max_points=None):
+        """
+        Scored activities within [start, end], downsampled per activity type so
+        the number of plotted points is bounded regardless of history length.
+        Re-query with a narrower window to zoom in at full detail. Archived
+        history is plotted as one daily mean score per activity type.
+        """
+        parts = []
+        if not self.archived_df.empty:
+            scored_days = self.archived_df[self.archived_df['score_count'] > 0]
+            parts.append(pd.DataFrame({
+                'date': scored_days['day'],
+                'activity_type': scored_days['activity_type'],
+                'score': scored_days['score_sum'] / scored_days['score_count']
+            }))
+        if not self.progress_df.empty:
+            parts.append(self.progress_df[['date', 'activity_type', 'score']])
+        if not parts:
+            return pd.DataFrame()
+        score_data = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
         
         # Filter out study plans (they don't have meaningful scores)
-        score_data = self.progress_df[self.progress_df['activity_type'] != 'study_plan'].copy()
+        score_data = score_data[score_data['activity_type'] != 'study_plan']
+        if start is not None:
+            score_data = score_data[score_data['date'] >= pd.Timestamp(start)]
+        if end is not None:
+            score_data = score_data[score_data['date'] < pd.Timestamp(end) + timedelta(days=1)]
+        
+        max_points = max_points or PROGRESS_CONFIG['chart_max_points']
+        return downsample_frame(score_data, 'date', 'score', max_points, group_column='activity_type')
+    
+    @timed()
+    def create_progress_chart(self, start=None, end=None):
+        """Create a progress chart showing scores over time"""
+        return self._cached_figure(('progress', start, end), lambda: self._build_progress_chart(start, end))
+    
+    def _build_progress_chart(self, start=None, end=None):
+        score_data = self.get_score_series(start, end)
         
         if score_data.empty:
             return None
         
+        # Plotly loads on the first chart, not when a page imports the tracker
+        import plotly.express as px
+        
         fig = px.line(
             score_data,
             x='date',
@@ -76,33 +362,43 @@ class ProgressTracker:
         
         return fig
     
+    @timed()
     def create_activity_distribution_chart(self):
         """Create a pie chart showing distribution of activities"""
-        if self.progress_df.empty:
+        return self._cached_figure('activity_distribution', self._build_activity_distribution_chart)
+    
+    def _build_activity_distribution_chart(self):
+        if not self.has_activity:
             return None
         
-        activity_counts = self.progress_df['activity_type'].value_counts()
+        activity_counts = self.aggregate.activity_counts.most_common()
+        
+        import plotly.express as px
         
         fig = px.pie(
-            values=activity_counts.values,
-            names=activity_counts.index,
+            values=[count for _, count in activity_counts],
+            names=[activity_type for activity_type, _ in activity_counts],
             title='Distribution of Your Activities'
         )
         
         return fig
     
+    @timed()
     def create_performance_gauge(self):
         """Create a gauge chart for overall performance"""
-        if self.progress_df.empty:
+        return self._cached_figure('performance_gauge', self._build_performance_gauge)
+    
+    def _build_performance_gauge(self):
+        if not self.has_activity:
             return None
         
         # Calculate overall performance (excluding study plans)
-        score_data = self.progress_df[self.progress_df['activity_type'] != 'study_plan']
-        
-        if score_data.empty:
+        if self.aggregate.assessments == 0:
             overall_score = 0
         else:
-            overall_score = score_data['score'].mean()
+            overall_score = self.aggregate.assessment_average
+        
+        import plotly.graph_objects as go
         
         fig = go.Figure(go.Indicator(
             mode = "gauge+number+delta",
@@ -128,21 +424,17 @@ class ProgressTracker:
         
         return fig
     
+    @timed()
     def get_learning_streak(self):
         """Calculate current learning streak"""
-        if self.progress_df.empty:
+        if not self.has_activity:
             return 0
         
-        # Sort by date
-        sorted_progress = self.progress_df.sort_values('date', ascending=False)
-        
-        # Calculate streak
+        # Calculate streak over the days with activity, latest first
         current_date = datetime.now().date()
         streak = 0
         
-        for _, activity in sorted_progress.iterrows():
-            activity_date = activity['date'].date()
-            
+        for activity_date in sorted(self.aggregate.learning_days, reverse=True):
             # Check if activity is from today or consecutive days
             if (current_date - activity_date).days <= streak + 1:
                 if (current_date - activity_date).days == streak:
@@ -153,18 +445,21 @@ class ProgressTracker:
         
         return streak
     
+    @timed()
     def get_recent_achievements(self, days=30):
-        """Get recent achievements and milestones"""
-        if self.progress_df.empty:
+        """Get recent achievements and milestones (days must lie within the raw retention window)"""
+        if not self.has_activity:
             return []
         
-        recent_date = datetime.now() - timedelta(days=days)
-        recent_activities = self.progress_df[self.progress_df['date'] >= recent_date]
-        
         achievements = []
         
         # High score achievements
-        high_scores = recent_activities[recent_activities['score'] >= 90]
+        if not self.progress_df.empty:
+            recent_date = datetime.now() - timedelta(days=days)
+            recent_activities = self.progress_df[self.progress_df['date'] >= recent_date]
+            high_scores = recent_activities[recent_activities['score'] >= 90]
+        else:
+            high_scores = pd.DataFrame()
         for _, activity in high_scores.iterrows():
             achievements.append({
                 'type': 'High Score',
@@ -173,7 +468,7 @@ class ProgressTracker:
             })
         
         # Activity milestones
-        total_activities = len(self.progress_df)
+        total_activities = self.aggregate.total
         if total_activities >= 10 and total_activities % 5 == 0:
             achievements.append({
                 'type': 'Milestone',
@@ -183,9 +478,10 @@ class ProgressTracker:
         
         return achievements
     
+    @timed()
     def get_improvement_suggestions(self):
         """Get personalized improvement suggestions"""
-        if self.progress_df.empty:
+        if not self.has_activity:
             return ["Start taking quizzes to get personalized suggestions!"]
         
         suggestions = []
@@ -209,9 +505,8 @@ class ProgressTracker:
             suggestions.append("Diversify your learning by trying different types of assessments.")
         
         # Subject-specific suggestions
-        score_data = self.progress_df[self.progress_df['activity_type'] != 'study_plan']
-        if not score_data.empty:
-            low_performing_areas = score_data[score_data['score'] < 75]['activity_type'].unique()
+        if self.aggregate.assessments > 0:
+            low_performing_areas = self.aggregate.low_scoring_activities()
             if len(low_performing_areas) > 0:
                 suggestions.append(f"Consider spending more time on: {', '.join(low_performing_areas)}")
         
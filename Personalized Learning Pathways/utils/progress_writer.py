@@ -0,0 +1,345 @@
+"""
+Background group-commit writer for the append-only CSV stores.
+
+Saves from every session are queued and a single writer thread appends
+whatever has accumulated in one write (and one fsync) per file, so a
+burst of submissions costs a handful of disk flushes instead of one full
+file rewrite each. submit() returns a Future that resolves once the row
+is on disk; when the bounded queue is full it blocks for up to
+enqueue_timeout seconds, time spent behind other submitters included,
+and then raises queue.Full (backpressure).
+Appends hold a per-file lock, so several server processes (or the legacy
+main.py app) can share the same files without losing rows.
+
+Records carrying an attempt_id are written at most once per file: an
+in-memory index of the ids already in each file (refreshed from the bytes
+appended since its last read) rejects resubmissions in O(1).
+
+Saves nobody waits on report a failed write through report_failure(); the
+user's next page load shows it (pop_failed_saves). pandas is imported where
+it is used, so pages can check for failed saves without loading it.
+"""
+import atexit
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import PERSISTENCE_CONFIG
+from utils.file_lock import exclusive_lock
+
+_STOP = object()
+
+DEDUPE_COLUMN = 'attempt_id'
+
+# Saves the writer failed to write, per user, until the user's next page load shows them
+_failed_saves = {}
+_failed_saves_lock = threading.Lock()
+
+def report_failure(user_id, description):
+    """Done-callback for a queued save nobody waits on: log a failed write and keep it for the user"""
+    def callback(future):
+        error = future.exception()
+        if error is None:
+            return
+        logging.getLogger(__name__).error("Failed to save %s for %s: %s", description, user_id, error)
+        with _failed_saves_lock:
+            _failed_saves.setdefault(user_id, []).append(f"Your {description} could not be saved: {error}")
+    return callback
+
+def pop_failed_saves(user_id):
+    """Messages for the saves of this user that failed since the last call"""
+    with _failed_saves_lock:
+        return _failed_saves.pop(user_id, [])
+
+def _read_header(file_path):
+    """Column names of an existing CSV, or None for a missing/empty file"""
+    import pandas as pd
+
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        return None
+    return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+def _ends_with_newline(file_path):
+    with open(file_path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+class AttemptIndex:
+    """
+    Attempt ids already written to one CSV. refresh() only parses the bytes
+    appended since the previous refresh, and starts over when the file was
+    replaced or truncated.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.ids = set()
+        self.pending = set()
+        self._offset = 0
+        self._inode = None
+
+    def __contains__(self, attempt_id):
+        return attempt_id in self.ids or attempt_id in self.pending
+
+    def refresh(self):
+        import pandas as pd
+
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            self.ids, self._offset, self._inode = set(), 0, None
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self.ids, self._offset, self._inode = set(), 0, stat.st_ino
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.file_path, 'rb') as f:
+            header = f.readline()
+            f.seek(max(self._offset, len(header)))
+            appended = f.read(stat.st_size - f.tell())
+        self._offset = stat.st_size
+
+        if DEDUPE_COLUMN.encode() not in header or not appended.strip():
+            return
+        ids = pd.read_csv(io.BytesIO(header + appended), usecols=[DEDUPE_COLUMN], dtype={DEDUPE_COLUMN: 'Int64'})
+        self.ids.update(ids[DEDUPE_COLUMN].dropna().tolist())
+
+_attempt_indexes = {}
+_attempt_indexes_lock = threading.Lock()
+
+def attempt_index(file_path):
+    """The shared attempt id index for a file"""
+    key = os.path.abspath(file_path)
+    with _attempt_indexes_lock:
+        if key not in _attempt_indexes:
+            _attempt_indexes[key] = AttemptIndex(file_path)
+        return _attempt_indexes[key]
+
+def _attempt_id(record):
+    import pandas as pd
+
+    value = record.get(DEDUPE_COLUMN)
+    return None if value is None or pd.isna(value) else int(value)
+
+def _add_columns(file_path, header, columns):
+    """Rewrite a CSV with extra empty columns (one-off, when the record layout grows)"""
+    import pandas as pd
+
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    for column in columns:
+        df[column] = ''
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    df.to_csv(temp_path, index=False)
+    os.replace(temp_path, file_path)
+    return header + columns
+
+def append_rows(file_path, records, fsync=True):
+    """
+    Append records to a CSV in one O_APPEND write, matching the existing
+    header order. The file lock makes the duplicate check, the header check
+    and the write atomic with respect to other threads and processes
+    writing the same file. Returns the positions of the records written
+    (records of an attempt already in the file are skipped).
+    """
+    import pandas as pd
+
+    with exclusive_lock(file_path):
+        index = attempt_index(file_path)
+        index.refresh()
+        written = []
+        batch_ids = set()
+        for position, record in enumerate(records):
+            attempt_id = _attempt_id(record)
+            if attempt_id is not None:
+                if attempt_id in index.ids or attempt_id in batch_ids:
+                    continue
+                batch_ids.add(attempt_id)
+            written.append(position)
+        if not written:
+            return written
+
+        frame = pd.DataFrame([records[position] for position in written])
+        header = _read_header(file_path)
+        if header is not None:
+            new_columns = [column for column in frame.columns if column not in header]
+            if new_columns:
+                header = _add_columns(file_path, header, new_columns)
+                index.refresh()
+            frame = frame.reindex(columns=header)
+        if DEDUPE_COLUMN in frame.columns:
+            frame[DEDUPE_COLUMN] = frame[DEDUPE_COLUMN].astype('Int64')
+        payload = frame.to_csv(header=header is None, index=False).encode('utf-8')
+        if header is not None and not _ends_with_newline(file_path):
+            payload = b'\n' + payload
+
+        fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        index.ids.update(batch_ids)
+        index.refresh()
+        return written
+
+class GroupCommitWriter:
+    """
+    Single background thread that drains a bounded queue of (file, record)
+    pairs and appends each drained batch with one write per file
+    """
+    def __init__(self, queue_size, max_batch, batch_window_ms=0, enqueue_timeout=2.0, fsync=True):
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # Held across put() so the last future recorded per file is also the last one queued
+        self._submit_lock = threading.Lock()
+        self._thread = None
+        self._last_futures = {}
+        self.batches = 0
+        self.records = 0
+        self.largest_batch = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, file_path, record, timeout=None):
+        """
+        Queue a record for appending to file_path. Returns a Future that
+        resolves to True once the record is durable, or False when a record
+        with the same attempt_id was already written. Raises queue.Full when
+        the writer is saturated for longer than the enqueue timeout.
+        """
+        future = Future()
+        attempt_id = _attempt_id(record)
+        if attempt_id is not None:
+            # Resubmitting a known attempt (e.g. a rerun of a results page) never reaches the queue
+            index = attempt_index(file_path)
+            with self._lock:
+                if attempt_id in index:
+                    future.set_result(False)
+                    return future
+                index.pending.add(attempt_id)
+
+        self._ensure_started()
+        # Waiting for the submit lock counts against the same timeout as waiting for queue space
+        deadline = time.monotonic() + (self.enqueue_timeout if timeout is None else timeout)
+        locked = self._submit_lock.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            if not locked:
+                raise queue.Full
+            self._queue.put((file_path, record, future), timeout=max(0.0, deadline - time.monotonic()))
+            with self._lock:
+                self._last_futures[file_path] = future
+        except queue.Full:
+            if attempt_id is not None:
+                with self._lock:
+                    index.pending.discard(attempt_id)
+            raise
+        finally:
+            if locked:
+                self._submit_lock.release()
+        return future
+
+    def wait_for(self, file_path=None, timeout=None):
+        """
+        Block until every record queued so far (for file_path, or for all
+        files) is written. Returns False if the timeout expired first.
+        """
+        with self._lock:
+            if file_path is None:
+                futures = list(self._last_futures.values())
+            else:
+                futures = [self._last_futures[file_path]] if file_path in self._last_futures else []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.exception(timeout=remaining)
+            except TimeoutError:
+                return False
+        return True
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return None, True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, batch):
+        by_file = {}
+        for file_path, record, future in batch:
+            by_file.setdefault(file_path, []).append((record, future))
+
+        for file_path, entries in by_file.items():
+            records = [record for record, _ in entries]
+            try:
+                written = set(append_rows(file_path, records, self.fsync))
+                error = None
+            except Exception as e:
+                written, error = set(), e
+
+            index = attempt_index(file_path)
+            with self._lock:
+                for position, (record, future) in enumerate(entries):
+                    attempt_id = _attempt_id(record)
+                    if attempt_id is not None:
+                        index.pending.discard(attempt_id)
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(position in written)
+
+        self.batches += 1
+        self.records += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+
+    def close(self, timeout=None):
+        """Write everything still queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+# Shared by every session in the server process
+progress_writer = GroupCommitWriter(
+    queue_size=PERSISTENCE_CONFIG['queue_size'],
+    max_batch=PERSISTENCE_CONFIG['max_batch'],
+    batch_window_ms=PERSISTENCE_CONFIG['batch_window_ms'],
+    enqueue_timeout=PERSISTENCE_CONFIG['enqueue_timeout'],
+    fsync=PERSISTENCE_CONFIG['fsync']
+)
+atexit.register(progress_writer.close)
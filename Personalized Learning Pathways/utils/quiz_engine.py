@@ -1,4 +1,44 @@
+import numpy as np
+import os
+import threading
+import pandas as pd
+from collections import OrderedDict
+from config import QUIZ_CONFIG, IQ_CALCULATION
 from utils.data_handler import save_user_progress
+from utils.irt_calibration import attach_item_parameters, PARAMETERS_FILE
+from utils.metrics import timed
+from utils.entity_ids import select_entity
+
+ADAPTIVE_CONFIG = QUIZ_CONFIG['iq_test']['adaptive']
+
+# Item tables shared by every QuizEngine in the process (pages build a new engine each rerun)
+_shared_item_tables = OrderedDict()
+_shared_item_tables_lock = threading.Lock()
+SHARED_ITEM_TABLES_SIZE = 8
+
+def _item_table_key(questions_df):
+    """
+    Identify a question bank by the file it was loaded from (see load_data and
+    load_catalog) and the calibration file. Frames without a source stamp are
+    identified by hashing the columns the tables are built from.
+    """
+    version = questions_df.attrs.get('source_version')
+    # pandas carries attrs over to derived frames, so the stamp only stands for the bank while every row is there
+    if version is None or version[-1] != len(questions_df):
+        columns = [column for column in ['question_id', 'difficulty', 'irt_a', 'irt_b'] if column in questions_df.columns]
+        version = int(pd.util.hash_pandas_object(questions_df[columns], index=False).sum())
+    parameters_version = os.stat(PARAMETERS_FILE).st_mtime_ns if os.path.exists(PARAMETERS_FILE) else None
+    return len(questions_df), version, parameters_version
+
+def build_item_information_table(discrimination, difficulty, theta_grid):
+    """
+    Precompute 2PL response probabilities and Fisher information for every
+    item at every point of the ability (theta) grid
+    """
+    logits = discrimination[:, None] * (theta_grid[None, :] - difficulty[:, None])
+    prob_correct = 1.0 / (1.0 + np.exp(-logits))
+    information = (discrimination[:, None] ** 2) * prob_correct * (1.0 - prob_correct)
+    return prob_correct, information
 
 class QuizEngine:
     def __init__(self, questions_df):
@@ -6,6 +46,7 @@ class QuizEngine:
         self.current_question = 0
         self.score = 0
         self.answers = {}
+        self._item_tables = None
         
     def get_question(self, question_id):
         """Get a specific question by ID"""
@@ -14,12 +55,13 @@ class QuizEngine:
             return question_row.iloc[0].to_dict()
         return None
     
+    @timed()
     def get_random_questions(self, stream=None, difficulty=None, count=10):
         """Get random questions based on filters"""
         filtered_df = self.questions_df.copy()
         
         if stream:
-            filtered_df = filtered_df[filtered_df['stream'] == stream]
+            filtered_df = select_entity(filtered_df, 'stream', stream)
         
         if difficulty:
             filtered_df = filtered_df[filtered_df['difficulty'] == difficulty]
@@ -29,6 +71,7 @@ class QuizEngine:
         else:
             return filtered_df.to_dict('records')
     
+    @timed()
     def calculate_score(self, answers, questions):
         """Calculate quiz score based on answers"""
         correct_answers = 0
@@ -43,6 +86,117 @@ class QuizEngine:
         
         score_percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
         return score_percentage, correct_answers, total_questions
+    
+    @timed()
+    def get_item_tables(self):
+        """Build (once) the item parameter and information tables used by adaptive testing"""
+        if self._item_tables is None:
+            key = _item_table_key(self.questions_df)
+            with _shared_item_tables_lock:
+                shared = _shared_item_tables.get(key)
+            if shared is not None:
+                self.questions_df, self._item_tables = shared
+                return self._item_tables
+            
+            grid_config = ADAPTIVE_CONFIG['theta_grid']
+            theta_grid = np.linspace(grid_config['min'], grid_config['max'], grid_config['points'])
+            
+            # Calibrated parameters are written next to the question bank by utils.irt_calibration
+            self.questions_df = attach_item_parameters(self.questions_df)
+            
+            # Hand-labelled difficulty is the fallback when no calibrated parameters exist
+            default_b = self.questions_df['difficulty'].map(ADAPTIVE_CONFIG['difficulty_parameters']).fillna(0.0)
+            if 'irt_b' in self.questions_df.columns:
+                difficulty = self.questions_df['irt_b'].fillna(default_b)
+            else:
+                difficulty = default_b
+            if 'irt_a' in self.questions_df.columns:
+                discrimination = self.questions_df['irt_a'].fillna(ADAPTIVE_CONFIG['default_discrimination'])
+            else:
+                discrimination = np.full(len(self.questions_df), ADAPTIVE_CONFIG['default_discrimination'])
+            
+            discrimination = np.asarray(discrimination, dtype=float)
+            difficulty = np.asarray(difficulty, dtype=float)
+            prob_correct, information = build_item_information_table(discrimination, difficulty, theta_grid)
+            
+            # Standard normal prior over ability, kept in log space for the posterior update
+            log_prior = -0.5 * theta_grid ** 2
+            
+            self._item_tables = {
+                'theta_grid': theta_grid,
+                'information': information,
+                'log_prob_correct': np.log(np.clip(prob_correct, 1e-12, None)),
+                'log_prob_wrong': np.log(np.clip(1.0 - prob_correct, 1e-12, None)),
+                'log_prior': log_prior,
+                'row_by_question_id': {qid: row for row, qid in enumerate(self.questions_df['question_id'])}
+            }
+            with _shared_item_tables_lock:
+                _shared_item_tables[key] = (self.questions_df, self._item_tables)
+                while len(_shared_item_tables) > SHARED_ITEM_TABLES_SIZE:
+                    _shared_item_tables.popitem(last=False)
+        return self._item_tables
+    
+    @timed()
+    def estimate_ability(self, questions, answers):
+        """Estimate ability (EAP) and its standard error from the answered questions"""
+        tables = self.get_item_tables()
+        log_posterior = tables['log_prior'].copy()
+        
+        for i, question in enumerate(questions):
+            if i not in answers:
+                continue
+            row = tables['row_by_question_id'].get(question['question_id'])
+            if row is None:
+                continue
+            if answers[i].lower() == str(question.get('correct_answer', '')).lower():
+                log_posterior += tables['log_prob_correct'][row]
+            else:
+                log_posterior += tables['log_prob_wrong'][row]
+        
+        posterior = np.exp(log_posterior - log_posterior.max())
+        posterior /= posterior.sum()
+        theta = float(np.dot(posterior, tables['theta_grid']))
+        standard_error = float(np.sqrt(np.dot(posterior, (tables['theta_grid'] - theta) ** 2)))
+        return theta, standard_error
+    
+    @timed()
+    def select_next_question(self, questions, theta, rng=None):
+        """
+        Pick an unused question at random from the ADAPTIVE_CONFIG['exposure_top_k']
+        with the most Fisher information at the current ability estimate
+        """
+        tables = self.get_item_tables()
+        grid_index = int(np.abs(tables['theta_grid'] - theta).argmin())
+        information = tables['information'][:, grid_index].copy()
+        
+        administered = [
+            tables['row_by_question_id'][q['question_id']]
+            for q in questions if q['question_id'] in tables['row_by_question_id']
+        ]
+        information[administered] = -np.inf
+        
+        available = np.flatnonzero(np.isfinite(information))
+        if not len(available):
+            return None
+        # Items share a few difficulty levels, so many tie for the top; drawing among the top k
+        # (and everything tied with the k-th) keeps the leading items from going to every student
+        top_k = min(ADAPTIVE_CONFIG['exposure_top_k'], len(available))
+        threshold = np.partition(information[available], len(available) - top_k)[len(available) - top_k]
+        candidates = available[information[available] >= threshold - 1e-12]
+        rng = rng or np.random.default_rng()
+        return self.questions_df.iloc[int(rng.choice(candidates))].to_dict()
+    
+    def should_stop_adaptive(self, questions, standard_error):
+        """Stop once the ability estimate is precise enough or the question limit is reached"""
+        answered = len(questions)
+        if answered >= ADAPTIVE_CONFIG['max_questions']:
+            return True
+        return answered >= ADAPTIVE_CONFIG['min_questions'] and standard_error < ADAPTIVE_CONFIG['se_threshold']
+    
+    def calculate_adaptive_iq_score(self, theta):
+        """Convert an ability estimate to the IQ scale"""
+        iq_score = IQ_CALCULATION['population_mean'] + theta * IQ_CALCULATION['population_sd']
+        return round(max(IQ_CALCULATION['min_iq'], min(IQ_CALCULATION['max_iq'], iq_score)))
 
 class CareerQuizEngine:
     def __init__(self, career_quiz_df):
@@ -53,6 +207,7 @@ class CareerQuizEngine:
         """Get all career quiz questions"""
         return self.career_quiz_df.to_dict('records')
     
+    @timed()
     def calculate_career_scores(self, answers):
         """Calculate scores for different career fields based on answers"""
         career_scores = {}
@@ -87,6 +242,7 @@ class CareerQuizEngine:
         
         return career_scores
     
+    @timed()
     def get_recommended_streams(self, career_scores, streams_df, top_n=5):
         """Get recommended streams based on career quiz results"""
         # Sort career fields by average score
@@ -121,11 +277,12 @@ class CareerQuizEngine:
         
         return recommended_streams
 
-def save_quiz_results(user_id, quiz_type, score, details):
+def save_quiz_results(user_id, quiz_type, score, details, attempt_id=None):
     """Save quiz results to user progress"""
     return save_user_progress(
         user_id=user_id,
         activity_type=quiz_type,
         score=score,
-        details=details
+        details=details,
+        attempt_id=attempt_id
     )
@@ -0,0 +1,153 @@
+"""
+Per-rerun timing benchmark for the fragment-structured pages.
+
+Runs a page headlessly with Streamlit's AppTest and times repeated full
+page reruns against fragment-scoped reruns of each keyed fragment (what a
+widget interaction inside that fragment costs). AppTest has no public way
+to rerun a single fragment, so those reruns rely on Streamlit internals of
+TESTED_STREAMLIT_VERSION and stop with an error on a release that lacks
+them. Run from the app directory:
+
+    python -m utils.rerun_benchmark [--runs 20] [--user "Shreya Kadam"]
+"""
+import argparse
+import functools
+import logging
+import os
+import time
+from unittest import mock
+
+import numpy as np
+
+# Fragment reruns go through AppTest internals (see _require_fragment_internals) checked against this release
+TESTED_STREAMLIT_VERSION = '1.66'
+
+BENCHMARK_PAGES = {
+    'Dashboard': {
+        'path': 'pages/1_Dashboard.py',
+        'tab_key': None,
+        'tabs': [None]
+    },
+    'Study Planner': {
+        'path': 'pages/4_Study_Planner.py',
+        'tab_key': 'study_planner_tab',
+        'tabs': ["📝 Create Goals", "📊 My Plans", "📈 Progress Tracking", "📚 Study Resources"]
+    }
+}
+
+def _new_app(path, username):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.abspath(path), default_timeout=120)
+    app.session_state['authenticated'] = True
+    app.session_state['username'] = username
+    app.session_state['user_data'] = {'Name': username, 'Age': '', 'Email': ''}
+    return app
+
+def _require_fragment_internals(app):
+    """
+    Fail with a clear message when the Streamlit internals used to time
+    fragment reruns are missing. AppTest widgets always rerun the whole page,
+    so fragment reruns are requested through AppTest's fragment storage and
+    the RerunData it sends, as laid out in TESTED_STREAMLIT_VERSION.
+    """
+    import dataclasses
+
+    import streamlit
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+    from streamlit.testing.v1 import local_script_runner
+
+    missing = []
+    storage = getattr(app, '_fragment_storage', None)
+    if not hasattr(storage, '_ids_by_target_key'):
+        missing.append("AppTest._fragment_storage._ids_by_target_key")
+    if getattr(local_script_runner, 'RerunData', None) is not RerunData:
+        missing.append("streamlit.testing.v1.local_script_runner.RerunData")
+    if 'fragment_id_queue' not in {field.name for field in dataclasses.fields(RerunData)}:
+        missing.append("RerunData.fragment_id_queue")
+    if missing:
+        raise RuntimeError(
+            f"Fragment reruns cannot be timed with streamlit {streamlit.__version__}: "
+            f"{', '.join(missing)} not found. The benchmark was written against "
+            f"streamlit {TESTED_STREAMLIT_VERSION}; install that version to run it."
+        )
+
+def _fragment_ids(app):
+    """Map each keyed fragment registered by the last run to its fragment ids"""
+    _require_fragment_internals(app)
+    storage = app._fragment_storage
+    return {key: list(ids) for key, ids in storage._ids_by_target_key.items()}
+
+def _timed_runs(app, runs, fragment_ids=None):
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+    from streamlit.testing.v1 import local_script_runner
+
+    timings = []
+    for _ in range(runs):
+        if fragment_ids:
+            # Request the same rerun the frontend sends for a widget change inside the fragment
+            rerun_data = functools.partial(RerunData, fragment_id_queue=list(fragment_ids))
+            with mock.patch.object(local_script_runner, 'RerunData', rerun_data):
+                started = time.perf_counter()
+                app.run()
+        else:
+            started = time.perf_counter()
+            app.run()
+        timings.append((time.perf_counter() - started) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+    return timings
+
+def _summarize(name, timings):
+    values = np.asarray(timings)
+    return {
+        'scope': name,
+        'runs': len(values),
+        'mean_ms': round(float(values.mean()), 2),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2)
+    }
+
+def benchmark_page(page, username, runs=20):
+    """Time full reruns and fragment-scoped reruns of one page, per tab"""
+    settings = BENCHMARK_PAGES[page]
+    results = []
+    for tab in settings['tabs']:
+        app = _new_app(settings['path'], username)
+        if tab is not None:
+            app.session_state[settings['tab_key']] = tab
+        app.run()
+        label = page if tab is None else f"{page} / {tab}"
+
+        results.append(_summarize(f"{label}: full rerun", _timed_runs(app, runs)))
+        for key, ids in _fragment_ids(app).items():
+            results.append(_summarize(f"{label}: fragment {key}", _timed_runs(app, runs, ids)))
+    return results
+
+def format_results(results):
+    width = max(len(result['scope']) for result in results)
+    lines = [f"{'scope':<{width}}  {'mean':>9}  {'p50':>9}  {'p95':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['scope']:<{width}}  {result['mean_ms']:>7.1f}ms  "
+            f"{result['p50_ms']:>7.1f}ms  {result['p95_ms']:>7.1f}ms"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full and fragment-scoped page reruns")
+    parser.add_argument('--runs', type=int, default=20, help="Timed reruns per scope")
+    parser.add_argument('--user', default='Shreya Kadam', help="Username whose progress is loaded")
+    parser.add_argument('--pages', nargs='*', default=list(BENCHMARK_PAGES), help="Pages to benchmark")
+    args = parser.parse_args()
+
+    # Bare-mode runs log a warning per rerun
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    results = []
+    for page in args.pages:
+        results.extend(benchmark_page(page, args.user, args.runs))
+    print(format_results(results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Per-question response log stored as dictionary-encoded Arrow IPC segments.
+
+Each completed attempt appends one small uncompressed segment file, so
+writers never rewrite existing data and readers can memory-map every
+segment. A background thread rolls the attempt segments up in levels:
+once RESPONSE_LOG_CONFIG['roll_segments'] segments of one level have piled
+up they are merged into one segment of the next level, and a segment of
+RESPONSE_LOG_CONFIG['segment_bytes'] or more is sealed and never merged
+again. Every row is copied once per level (a few times in all) rather than
+on every roll, and the number of files grows with the size of the log, not
+the number of attempts. compact_response_log() merges every segment into
+one file.
+
+Rolling and compaction replace segments under the log's exclusive lock,
+and readers list and open the segments under its shared lock, so a reader
+never sees both a merged segment and the segments it replaced, and readers
+do not wait for each other.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+from config import RESPONSE_LOG_CONFIG
+from utils.file_lock import exclusive_lock, shared_lock
+from utils.id_generator import next_id
+
+RESPONSE_LOG_DIR = 'data/response_log'
+SEGMENT_SUFFIX = '.arrow'
+# Name prefix of the one-attempt segments written by log_responses
+ATTEMPT_PREFIX = 'segment-'
+# Merged segments are named 'rolled-<level>-<time>'
+ROLLED_PREFIX = 'rolled-'
+
+RESPONSE_SCHEMA = pa.schema([
+    ('attempt_id', pa.int64()),
+    ('user_id', pa.dictionary(pa.int32(), pa.string())),
+    ('quiz_type', pa.dictionary(pa.int8(), pa.string())),
+    ('question_id', pa.int32()),
+    ('chosen_option', pa.dictionary(pa.int8(), pa.string())),
+    ('correct', pa.bool_()),
+    ('response_ms', pa.int32()),
+    ('answered_at', pa.timestamp('ms'))
+])
+
+def new_attempt_id():
+    """Generate a time-ordered 64-bit attempt identifier"""
+    return next_id()
+
+def segment_paths(log_dir=RESPONSE_LOG_DIR):
+    """Paths of the current segments in name order"""
+    if not os.path.isdir(log_dir):
+        return []
+    return sorted(
+        os.path.join(log_dir, name) for name in os.listdir(log_dir)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+def _log_lock(log_dir, shared=False):
+    """Held exclusively while segments are replaced, and shared while readers list and open them"""
+    lock = shared_lock if shared else exclusive_lock
+    return lock(log_dir.rstrip('/\\'))
+
+def segment_level(path):
+    """Roll level of a segment: 0 for an attempt segment, None for one that is never merged again"""
+    name = os.path.basename(path)
+    if name.startswith(ATTEMPT_PREFIX):
+        return 0
+    parts = name[:-len(SEGMENT_SUFFIX)].split('-')
+    if name.startswith(ROLLED_PREFIX) and len(parts) == 3 and parts[1].isdigit():
+        if os.path.getsize(path) < RESPONSE_LOG_CONFIG['segment_bytes']:
+            return int(parts[1])
+    return None
+
+def _write_segment(table, log_dir, name):
+    """Write a table to a new segment atomically (temp file + rename)"""
+    os.makedirs(log_dir, exist_ok=True)
+    final_path = os.path.join(log_dir, name + SEGMENT_SUFFIX)
+    temp_path = final_path + '.tmp'
+    with pa.OSFile(temp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, final_path)
+    return final_path
+
+def build_response_table(attempt_id, user_id, quiz_type, questions, answers, response_times=None):
+    """Build the response rows for one attempt as an Arrow table"""
+    response_times = response_times or {}
+    answered_at = datetime.now()
+    rows = {name: [] for name in RESPONSE_SCHEMA.names}
+
+    for i, question in enumerate(questions):
+        if i not in answers:
+            continue
+        chosen = answers[i]
+        correct_answer = question.get('correct_answer')
+        rows['attempt_id'].append(attempt_id)
+        rows['user_id'].append(user_id)
+        rows['quiz_type'].append(quiz_type)
+        rows['question_id'].append(int(question['question_id']))
+        rows['chosen_option'].append(chosen.lower() if chosen else None)
+        # Career quiz questions have no right answer, so the flag stays null
+        rows['correct'].append(
+            chosen.lower() == str(correct_answer).lower() if correct_answer and chosen else None
+        )
+        rows['response_ms'].append(response_times.get(i))
+        rows['answered_at'].append(answered_at)
+
+    return pa.Table.from_pydict(rows, schema=RESPONSE_SCHEMA)
+
+def log_responses(attempt_id, user_id, quiz_type, questions, answers, response_times=None, log_dir=RESPONSE_LOG_DIR):
+    """
+    Append the per-question responses of a finished attempt to the log
+    """
+    try:
+        table = build_response_table(attempt_id, user_id, quiz_type, questions, answers, response_times)
+        if table.num_rows == 0:
+            return True
+        _write_segment(table, log_dir, f"{ATTEMPT_PREFIX}{time.time_ns()}-{attempt_id}")
+        request_roll(log_dir)
+        return True
+
+    except Exception as e:
+        st.error(f"Error logging responses: {str(e)}")
+        return False
+
+def _read_tables(paths, columns=None, quiz_type=None):
+    tables = []
+    for path in paths:
+        try:
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            # Named in paths but merged away since
+            continue
+        if quiz_type is not None:
+            table = table.filter(pc.equal(table['quiz_type'].cast(pa.string()), quiz_type))
+        if columns is not None:
+            table = table.select(columns)
+        tables.append(table)
+
+    if not tables:
+        schema = RESPONSE_SCHEMA if columns is None else pa.schema([RESPONSE_SCHEMA.field(c) for c in columns])
+        return schema.empty_table()
+    return pa.concat_tables(tables).unify_dictionaries()
+
+def read_response_log(columns=None, quiz_type=None, log_dir=RESPONSE_LOG_DIR):
+    """
+    Read the response log as a single Arrow table. Segments are memory-mapped,
+    so only the projected columns are materialized.
+    """
+    with _log_lock(log_dir, shared=True):
+        return _read_tables(segment_paths(log_dir), columns, quiz_type)
+
+def read_new_segments(seen, columns=None, quiz_type=None, log_dir=RESPONSE_LOG_DIR):
+    """
+    Incremental read for consumers that fold the log: (names of the current
+    segments, table, complete). The table holds the segments whose names are
+    not in seen; if a segment in seen was merged away it holds every segment
+    and complete is True, and the caller starts over.
+    """
+    with _log_lock(log_dir, shared=True):
+        paths = segment_paths(log_dir)
+        names = [os.path.basename(path) for path in paths]
+        complete = not set(seen) <= set(names)
+        new = paths if complete else [path for path, name in zip(paths, names) if name not in seen]
+        return names, _read_tables(new, columns, quiz_type), complete
+
+def load_response_log(columns=None, quiz_type=None, log_dir=RESPONSE_LOG_DIR):
+    """Read the response log into a DataFrame (dictionary columns become categoricals)"""
+    return read_response_log(columns, quiz_type, log_dir).to_pandas()
+
+def _merge_segments(paths, log_dir, name):
+    """Replace segments with one merged segment; call with the log's lock held"""
+    tables = []
+    for path in paths:
+        with pa.memory_map(path, 'r') as source:
+            tables.append(pa.ipc.open_file(source).read_all())
+    merged = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+
+    _write_segment(merged, log_dir, name)
+    for path in paths:
+        os.remove(path)
+
+def _next_merge(group, force=False):
+    """
+    The oldest segments of one level to merge now ([] while the level is not
+    ready): at most about segment_bytes of them, so a merge never holds much
+    more than one sealed segment in memory
+    """
+    sizes = [os.path.getsize(path) for path in group]
+    ready = len(group) >= RESPONSE_LOG_CONFIG['roll_segments'] or sum(sizes) >= RESPONSE_LOG_CONFIG['segment_bytes']
+    if not group or not (ready or force):
+        return []
+    merge, total = [], 0
+    for path, size in zip(group, sizes):
+        if total >= RESPONSE_LOG_CONFIG['segment_bytes']:
+            break
+        merge.append(path)
+        total += size
+    return merge
+
+def roll_segments(log_dir=RESPONSE_LOG_DIR, force=False):
+    """
+    Merge each level that has roll_segments unsealed segments (or
+    segment_bytes of them) into segments of the next level, lowest level
+    first; force rolls every attempt segment however few there are.
+    Existing merged segments are only read, never appended to. Returns
+    the number of attempt segments rolled.
+    """
+    rolled = 0
+    with _log_lock(log_dir):
+        level = 0
+        while True:
+            levels = {}
+            for path in segment_paths(log_dir):
+                levels.setdefault(segment_level(path), []).append(path)
+            merge = _next_merge(levels.get(level, []), force and level == 0)
+            # A merged segment on its own would only be renamed a level up
+            if merge and (level == 0 or len(merge) > 1):
+                _merge_segments(merge, log_dir, f"{ROLLED_PREFIX}{level + 1}-{time.time_ns()}")
+                if level == 0:
+                    rolled += len(merge)
+                continue
+            if level >= max((found for found in levels if found is not None), default=0):
+                return rolled
+            level += 1
+
+# Log directories with new attempt segments, waiting for the roller thread
+_pending_rolls = set()
+_roll_condition = threading.Condition()
+_roller = None
+_stopping = False
+
+def _roll_pending():
+    global _roller
+    while True:
+        with _roll_condition:
+            while not _pending_rolls and not _stopping:
+                _roll_condition.wait()
+            if not _pending_rolls:
+                _roller = None
+                return
+            log_dir = _pending_rolls.pop()
+        try:
+            roll_segments(log_dir)
+        except Exception as e:
+            # The attempt segments stay readable; the next request retries
+            logging.getLogger(__name__).warning("Rolling the response log in %s failed: %s", log_dir, e)
+
+def request_roll(log_dir=RESPONSE_LOG_DIR):
+    """Have the background roller check log_dir, so a page rerun never waits for a merge"""
+    global _roller
+    with _roll_condition:
+        _pending_rolls.add(log_dir)
+        _roll_condition.notify()
+        if _roller is None or not _roller.is_alive():
+            _roller = threading.Thread(target=_roll_pending, name='response-log-roller', daemon=True)
+            _roller.start()
+
+def wait_for_rolls(timeout=None):
+    """Finish the rolls requested so far and stop the roller thread (at exit, and in tools and tests)"""
+    global _stopping
+    with _roll_condition:
+        thread = _roller
+        _stopping = True
+        _roll_condition.notify()
+    if thread is not None:
+        thread.join(timeout)
+    with _roll_condition:
+        _stopping = False
+
+atexit.register(wait_for_rolls)
+
+def compact_response_log(log_dir=RESPONSE_LOG_DIR):
+    """
+    Merge all segments into one. Returns the number of segments merged.
+    """
+    with _log_lock(log_dir):
+        paths = segment_paths(log_dir)
+        if len(paths) <= 1:
+            return len(paths)
+        _merge_segments(paths, log_dir, f"compacted-{time.time_ns()}")
+        return len(paths)
@@ -0,0 +1,364 @@
+"""
+Retention tiering for the progress log.
+
+Raw progress events are kept for RETENTION_CONFIG['raw_days'] days. Older
+events are rolled up into daily totals per user and activity type (counts,
+score sums, lowest and highest scores and the other totals
+ProgressAggregate needs), written to monthly cold partitions under
+RETENTION_CONFIG['archive_dir'] and removed from the CSV. The progress
+tracker, the Certificates page and the rollup cube read the archive
+alongside the raw log, so totals, streaks and charts cover the full history.
+
+A compaction is verified before it is kept: the per-user totals of the
+archive plus the remaining raw rows must equal those of the original log,
+and the Dashboard metrics of the most active archived users must be the
+same after the CSV is swapped; otherwise the original CSV is put back.
+Archive parts are committed through a manifest and only count once the
+CSV they were split from is in place, so a crash at any step neither loses
+nor double counts rows. Appends wait while a compaction runs. Run from the
+app directory:
+
+    python -m utils.retention [--dry-run] [--raw-days 365] [--as-of YYYY-MM-DD]
+"""
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import PROGRESS_CONFIG, RETENTION_CONFIG
+from utils.data_handler import FILE_MAPPING
+from utils.entity_ids import attach_entity_codes, entity_code, get_dictionary
+from utils.file_lock import exclusive_lock
+from utils.schemas import apply_schema, read_options
+
+SOURCE_TYPE = 'user_progress'
+MANIFEST_FILE = '_manifest.json'
+
+# Recent achievements look back 30 days, so those rows always stay raw
+MIN_RAW_DAYS = 30
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('user_id', pa.dictionary(pa.int32(), pa.string())),
+    ('day', pa.timestamp('ms')),
+    ('activity_type', pa.dictionary(pa.int8(), pa.string())),
+    ('count', pa.int64()),
+    ('score_sum', pa.float64()),
+    ('score_count', pa.int64()),
+    ('score_min', pa.float64()),
+    ('score_max', pa.float64()),
+    ('high_scores', pa.int64()),
+    ('last_score', pa.float64()),
+    ('score_range_0', pa.int64()),
+    ('score_range_1', pa.int64()),
+    ('score_range_2', pa.int64()),
+    ('score_range_3', pa.int64()),
+    ('score_range_4', pa.int64())
+])
+
+def _source_path():
+    return FILE_MAPPING[SOURCE_TYPE]
+
+def _archive_dir(archive_dir=None):
+    return archive_dir or RETENTION_CONFIG['archive_dir']
+
+def _read_manifest(archive_dir):
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'parts': [], 'pending': None}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(archive_dir, manifest):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def _source_inode(source_path):
+    return os.stat(source_path).st_ino if os.path.exists(source_path) else None
+
+def active_parts(archive_dir=None, source_path=None):
+    """
+    Archive files that are part of the history: committed parts, plus the
+    parts of an interrupted compaction whose CSV swap had already happened
+    """
+    archive_dir = _archive_dir(archive_dir)
+    manifest = _read_manifest(archive_dir)
+    parts = list(manifest['parts'])
+    pending = manifest.get('pending')
+    if pending and pending['source_inode'] == _source_inode(source_path or _source_path()):
+        parts += pending['parts']
+    return [os.path.join(archive_dir, part) for part in parts]
+
+def _empty_archive():
+    return ARCHIVE_SCHEMA.empty_table().to_pandas()
+
+def read_archive(user_id=None, archive_dir=None, source_path=None, parts=None):
+    """Archived daily totals, for one user or for everyone (an empty frame if nothing is archived)"""
+    parts = active_parts(archive_dir, source_path) if parts is None else parts
+    if not parts:
+        return _empty_archive()
+    expression = None
+    if user_id is not None:
+        code = entity_code('user', user_id)
+        if code is None:
+            return _empty_archive()
+        # Archived names are canonical, like every loaded frame
+        expression = ds.field('user_id') == get_dictionary().canonical_name('user', code)
+    table = ds.dataset(parts, schema=ARCHIVE_SCHEMA, format='parquet').to_table(filter=expression)
+    return table.to_pandas()
+
+def _write_parts(daily, archive_dir):
+    """Write daily totals as one new file per month partition; returns their relative paths"""
+    from utils.progress_tracker import ProgressAggregate
+
+    daily = daily.astype({'user_id': 'category', 'activity_type': 'category'})
+    months = daily['day'].dt.strftime('%Y-%m')
+    name = f"part-{time.time_ns()}.parquet"
+    parts = []
+    for month in sorted(months.unique()):
+        rows = daily[months == month].sort_values(['user_id', 'day'], kind='stable')
+        rows = rows[ARCHIVE_SCHEMA.names].astype({column: 'int64' for column in ['count', 'score_count', 'high_scores'] + ProgressAggregate.RANGE_COLUMNS})
+        part = os.path.join(f"month={month}", name)
+        os.makedirs(os.path.join(archive_dir, f"month={month}"), exist_ok=True)
+        table = pa.Table.from_pandas(rows, schema=ARCHIVE_SCHEMA, preserve_index=False)
+        pq.write_table(table, os.path.join(archive_dir, part))
+        parts.append(part)
+    return parts
+
+def _remove_parts(archive_dir, parts):
+    for part in parts:
+        path = os.path.join(archive_dir, part)
+        if os.path.exists(path):
+            os.remove(path)
+        partition = os.path.dirname(path)
+        if os.path.isdir(partition) and not os.listdir(partition):
+            os.rmdir(partition)
+
+def _backup_path(source_path):
+    return f"{source_path}.retention-backup"
+
+def _recover(archive_dir, source_path):
+    """Finish or discard an interrupted compaction (called with the CSV lock held)"""
+    manifest = _read_manifest(archive_dir)
+    pending = manifest.get('pending')
+    if pending:
+        if pending['source_inode'] == _source_inode(source_path):
+            manifest['parts'] += pending['parts']
+        else:
+            _remove_parts(archive_dir, pending['parts'])
+        manifest['pending'] = None
+        _write_manifest(archive_dir, manifest)
+    if os.path.exists(_backup_path(source_path)):
+        os.remove(_backup_path(source_path))
+
+def _typed(chunk):
+    """Typed, canonical view of a chunk read as text"""
+    return attach_entity_codes(SOURCE_TYPE, apply_schema(SOURCE_TYPE, chunk.replace('', np.nan)))
+
+class _UserTotals:
+    """Per-user activity count, score sum, scored count and learning days, summed over parts"""
+
+    def __init__(self):
+        self._parts = []
+        self._days = []
+
+    def add_rows(self, rows):
+        rows = rows[rows['user_id'].notna()]
+        self._parts.append(rows.groupby('user_id', observed=True)['score'].agg(['size', 'sum', 'count']).set_axis(['count', 'score_sum', 'score_count'], axis=1))
+        self._days.append(pd.DataFrame({'user_id': rows['user_id'].astype(str), 'day': rows['date'].dt.normalize()}).dropna().drop_duplicates())
+
+    def add_daily(self, daily):
+        self._parts.append(daily.groupby('user_id', observed=True)[['count', 'score_sum', 'score_count']].sum())
+        self._days.append(pd.DataFrame({'user_id': daily['user_id'].astype(str), 'day': daily['day']}).drop_duplicates())
+
+    def result(self):
+        parts = [part.set_axis(part.index.astype(str)) for part in self._parts if not part.empty]
+        if not parts:
+            return pd.DataFrame(columns=['count', 'score_sum', 'score_count', 'days'])
+        totals = pd.concat(parts).groupby(level=0).sum()
+        days = pd.concat(self._days).drop_duplicates().groupby('user_id').size()
+        return totals.assign(days=days.reindex(totals.index, fill_value=0)).sort_index()
+
+def _totals_match(before, after):
+    """Differences between two _UserTotals results, as readable strings"""
+    problems = []
+    if list(before.index) != list(after.index):
+        missing = sorted(set(before.index) ^ set(after.index))
+        return [f"users differ: {missing[:5]}"]
+    for column in ['count', 'score_count', 'days']:
+        differ = before[column].to_numpy() != after[column].to_numpy()
+        if differ.any():
+            problems.append(f"{column} differs for {int(differ.sum())} users, e.g. {before.index[differ][0]}")
+    if not np.allclose(before['score_sum'].to_numpy(float), after['score_sum'].to_numpy(float), rtol=1e-9, atol=1e-6):
+        problems.append("score sums differ")
+    return problems
+
+def dashboard_metrics(user_id):
+    """The figures the Dashboard shows for a user, computed by the progress tracker"""
+    from utils.progress_tracker import ProgressTracker
+
+    tracker = ProgressTracker(user_id, use_cache=False)
+    summary = tracker.get_activity_summary()
+    performance = tracker.aggregate.assessment_average if tracker.aggregate.assessments else 0
+
+    def number(value):
+        return None if value is None or (isinstance(value, float) and math.isnan(value)) else round(float(value), 6)
+
+    return {
+        'total_activities': summary['total_activities'],
+        'average_score': number(summary['average_score']),
+        'recent_activities': summary['recent_activities'],
+        'activity_types': dict(sorted((str(key), int(value)) for key, value in summary['activity_types'].items())),
+        'learning_streak': tracker.get_learning_streak(),
+        'overall_performance': number(performance),
+        'achievements': tracker.get_recent_achievements(),
+        'suggestions': tracker.get_improvement_suggestions()
+    }
+
+def _metric_differences(before, after):
+    return [
+        f"{user_id}: {key} {before[user_id][key]!r} -> {after[user_id][key]!r}"
+        for user_id in before
+        for key in before[user_id]
+        if before[user_id][key] != after[user_id][key]
+    ]
+
+def _split_log(source_path, temp_path, archive_dir, cutoff, report):
+    """
+    Write the rows to keep to temp_path and return the daily totals of the
+    rows to archive (None if there are none) with the per-user totals of
+    the current history
+    """
+    from utils.progress_tracker import ProgressAggregate
+
+    before = _UserTotals()
+    before.add_daily(read_archive(archive_dir=archive_dir))
+    daily_parts = []
+    # Read every field as text so the kept rows are written back unchanged
+    chunks = pd.read_csv(source_path, dtype=str, keep_default_na=False, chunksize=PROGRESS_CONFIG['chunk_rows'])
+    with open(temp_path, 'w', newline='', encoding='utf-8') as out:
+        for position, chunk in enumerate(chunks):
+            typed = _typed(chunk)
+            before.add_rows(typed)
+            old = ((typed['date'] < cutoff) & typed['user_id'].notna() & typed['activity_type'].notna()).to_numpy()
+            if old.any():
+                daily_parts.append(ProgressAggregate.daily_totals(typed[old]))
+                # Merge as we go so memory holds daily totals, not old rows
+                if len(daily_parts) > 8:
+                    daily_parts = [ProgressAggregate.merge_daily(daily_parts)]
+            report['archived_rows'] += int(old.sum())
+            report['kept_rows'] += int((~old).sum())
+            chunk[~old].to_csv(out, header=position == 0, index=False)
+    daily = ProgressAggregate.merge_daily(daily_parts) if daily_parts else None
+    return daily, before
+
+def _totals_after(archive_dir, parts, temp_path):
+    """Per-user totals of the archive with parts added and the rows kept in temp_path"""
+    after = _UserTotals()
+    after.add_daily(read_archive(parts=[os.path.join(archive_dir, part) for part in parts]))
+    for chunk in pd.read_csv(temp_path, chunksize=PROGRESS_CONFIG['chunk_rows'], **read_options(SOURCE_TYPE)):
+        after.add_rows(attach_entity_codes(SOURCE_TYPE, apply_schema(SOURCE_TYPE, chunk)))
+    return after
+
+def compact_history(raw_days=None, as_of=None, dry_run=False, verify_users=None, archive_dir=None):
+    """
+    Move progress events older than raw_days (before as_of, default now)
+    into the archive. Returns a report with the rows archived and kept, the
+    number of daily totals written and any verification problems; when
+    there are problems nothing is changed.
+    """
+    raw_days = RETENTION_CONFIG['raw_days'] if raw_days is None else raw_days
+    if raw_days < MIN_RAW_DAYS:
+        raise ValueError(f"raw_days must be at least {MIN_RAW_DAYS}")
+    verify_users = RETENTION_CONFIG['verify_users'] if verify_users is None else verify_users
+    archive_dir = _archive_dir(archive_dir)
+    source_path = _source_path()
+    cutoff = pd.Timestamp(as_of or datetime.now()).normalize() - pd.Timedelta(days=raw_days)
+    report = {'cutoff': str(cutoff.date()), 'archived_rows': 0, 'kept_rows': 0, 'daily_rows': 0, 'verified_users': [], 'problems': []}
+    if not os.path.exists(source_path):
+        return report
+
+    with exclusive_lock(source_path):
+        _recover(archive_dir, source_path)
+        temp_path = f"{source_path}.{os.getpid()}.tmp"
+        try:
+            daily, before = _split_log(source_path, temp_path, archive_dir, cutoff, report)
+            if daily is None or dry_run:
+                report['daily_rows'] = 0 if daily is None else len(daily)
+                return report
+            report['daily_rows'] = len(daily)
+
+            # Written as pending: they only count once the CSV without their rows is in place
+            parts = _write_parts(daily, archive_dir)
+            manifest = _read_manifest(archive_dir)
+            manifest['pending'] = {'parts': parts, 'source_inode': os.stat(temp_path).st_ino, 'cutoff': report['cutoff']}
+            _write_manifest(archive_dir, manifest)
+
+            # 1. Nothing lost or counted twice: per-user totals of archive + kept rows
+            problems = _totals_match(before.result(), _totals_after(archive_dir, manifest['parts'] + parts, temp_path).result())
+
+            # 2. The Dashboard shows the same figures for the users with the most archived history
+            if not problems:
+                sample = daily.groupby('user_id', observed=True)['count'].sum().nlargest(verify_users).index.astype(str).tolist()
+                report['verified_users'] = sample
+                metrics_before = {user_id: dashboard_metrics(user_id) for user_id in sample}
+                os.link(source_path, _backup_path(source_path))
+                os.replace(temp_path, source_path)
+                metrics_after = {user_id: dashboard_metrics(user_id) for user_id in sample}
+                problems = _metric_differences(metrics_before, metrics_after)
+                if problems:
+                    os.replace(_backup_path(source_path), source_path)
+
+            if problems:
+                report['problems'] = problems
+                _remove_parts(archive_dir, parts)
+                manifest['pending'] = None
+            else:
+                manifest['parts'] += parts
+                manifest['pending'] = None
+                os.remove(_backup_path(source_path))
+            _write_manifest(archive_dir, manifest)
+            return report
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def main():
+    import logging
+
+    parser = argparse.ArgumentParser(description="Archive old progress events as daily totals")
+    parser.add_argument('--raw-days', type=int, default=None, help=f"Days of raw events to keep (default {RETENTION_CONFIG['raw_days']}, at least {MIN_RAW_DAYS})")
+    parser.add_argument('--as-of', default=None, help="Date the retention window ends (default today)")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived")
+    parser.add_argument('--verify-users', type=int, default=None, help="Users whose Dashboard metrics are compared before and after")
+    args = parser.parse_args()
+
+    # Outside a Streamlit server the loaders' st.* calls only log warnings
+    logging.disable(logging.WARNING)
+    started = time.perf_counter()
+    report = compact_history(args.raw_days, args.as_of, args.dry_run, args.verify_users)
+    action = "would archive" if args.dry_run else "archived"
+    print(
+        f"Events before {report['cutoff']}: {action} {report['archived_rows']} rows as {report['daily_rows']} daily totals, "
+        f"{report['kept_rows']} raw rows kept ({time.perf_counter() - started:.1f}s)"
+    )
+    if report['problems']:
+        print("Verification FAILED, nothing was changed:")
+        for problem in report['problems']:
+            print(f"  {problem}")
+        raise SystemExit(1)
+    if report['verified_users']:
+        print(f"Dashboard metrics unchanged for {len(report['verified_users'])} users: {', '.join(report['verified_users'])}")
+
+if __name__ == "__main__":
+    main()
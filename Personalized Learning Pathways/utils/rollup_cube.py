@@ -0,0 +1,375 @@
+"""
+Rollup cube of the progress log for time-distribution charts.
+
+For every user, and for all users together (ALL_USERS), the cube holds the
+number of activities, their score sum and the number of scored activities
+per activity type in each day, week, month and day of the week. Buckets are
+integers: days since 1970-01-01 for 'day' and 'week' (the week's Monday),
+months since 1970-01 for 'month', and 0 (Monday) to 6 for 'day_of_week'.
+Users are keyed by their entity id (utils.entity_ids).
+
+The cube keeps a watermark (byte offset and inode) into the progress CSV.
+refresh() folds in only the rows appended after it, as small delta parts
+that are merged into the base part once ROLLUP_CONFIG['max_deltas'] have
+piled up; the merged cube is saved to ROLLUP_CONFIG['cube_file'] so a new
+process resumes from it. A rewritten CSV (compaction, a new column) or a
+rebuilt entity dictionary starts a full rebuild, streamed in chunks, which
+also folds in the daily totals archived by utils.retention.
+Rebuild it and print its size from the app directory with:
+
+    python -m utils.rollup_cube [--rebuild]
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config import PROGRESS_CONFIG, ROLLUP_CONFIG
+from utils.entity_ids import attach_entity_codes, code_column, entity_code, get_dictionary
+from utils.file_lock import exclusive_lock
+from utils.retention import read_archive
+from utils.schemas import apply_schema, read_options
+
+SOURCE_TYPE = 'user_progress'
+SOURCE_COLUMNS = ['user_id', 'activity_type', 'date', 'score']
+
+GRAINS = ['day', 'week', 'month', 'day_of_week']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# user_code of the rows summed over every user (entity ids are >= 0, MISSING_CODE is -1)
+ALL_USERS = -2
+
+USER_COLUMN = code_column('user')
+KEY_COLUMNS = [USER_COLUMN, 'grain', 'bucket', 'activity_type']
+MEASURES = ['count', 'score_sum', 'score_count']
+
+# Bump when the cube layout changes; saved cubes of another version are rebuilt
+CUBE_VERSION = 1
+
+# Numbers every cube built or rebuilt in this process, so user versions of different cubes never collide
+_rebuilds = itertools.count(1)
+
+def _empty_cube():
+    return pd.DataFrame({
+        USER_COLUMN: pd.Series(dtype='int32'),
+        'grain': pd.Series(dtype='int8'),
+        'bucket': pd.Series(dtype='int32'),
+        'activity_type': pd.Series(dtype='category'),
+        'count': pd.Series(dtype='int64'),
+        'score_sum': pd.Series(dtype='float64'),
+        'score_count': pd.Series(dtype='int64')
+    })
+
+class ByteRange(io.RawIOBase):
+    """Read-only view of an open file that ends at a fixed offset"""
+
+    def __init__(self, f, end):
+        self._f = f
+        self._end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._end - self._f.tell())
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        return len(data)
+
+def _daily(chunk):
+    """(user, day, activity type) totals of a typed progress chunk; rows without a date are skipped"""
+    dated = chunk[chunk['date'].notna()]
+    days = dated['date'].to_numpy().astype('datetime64[D]').astype(np.int32)
+    totals = (
+        dated.assign(day=days)
+        .groupby([USER_COLUMN, 'day', 'activity_type'], observed=True)['score']
+        .agg(['size', 'sum', 'count'])
+    )
+    totals.columns = MEASURES
+    return totals.reset_index()
+
+def _combine(parts, keys):
+    """Sum the measures of parts with equal keys"""
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return None
+    # Parts carry their own activity categories; the join falls back to strings and is re-interned below
+    combined = pd.concat(parts, ignore_index=True).groupby(keys, observed=True)[MEASURES].sum().reset_index()
+    return combined.astype({'activity_type': 'category'})
+
+def _expand(daily):
+    """Cube rows at every grain, per user and for ALL_USERS, from (user, day, activity type) totals"""
+    everyone = _combine([daily.drop(columns=USER_COLUMN)], ['day', 'activity_type']).assign(**{USER_COLUMN: ALL_USERS})
+    daily = pd.concat([daily, everyone], ignore_index=True)
+    days = daily['day'].to_numpy()
+    buckets = {
+        'day': days,
+        # 1970-01-01 was a Thursday
+        'week': days - (days + 3) % 7,
+        'month': days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32),
+        'day_of_week': (days + 3) % 7
+    }
+    parts = [
+        daily.drop(columns='day').assign(grain=GRAINS.index(grain), bucket=bucket)
+        for grain, bucket in buckets.items()
+    ]
+    return _sorted_cube(_combine(parts, KEY_COLUMNS))
+
+def _sorted_cube(cube):
+    """Typed cube sorted by user, so one user's rows are a contiguous slice"""
+    cube = cube.astype({USER_COLUMN: 'int32', 'grain': 'int8', 'bucket': 'int32', 'count': 'int64', 'score_count': 'int64'})
+    return cube.sort_values(KEY_COLUMNS[:3], kind='stable', ignore_index=True)
+
+def read_rows(f, start, end, columns=SOURCE_COLUMNS):
+    """Typed progress chunks of the bytes in [start, end) of an open progress CSV, which is closed when done"""
+    with f:
+        header = f.readline()
+        start = max(start, len(header))
+        if start >= end:
+            return
+        names = next(csv.reader([header.decode('utf-8-sig')]))
+        f.seek(start)
+        chunks = pd.read_csv(
+            io.BufferedReader(ByteRange(f, end)),
+            header=None,
+            names=names,
+            chunksize=PROGRESS_CONFIG['chunk_rows'],
+            **read_options(SOURCE_TYPE, columns)
+        )
+        for chunk in chunks:
+            yield apply_schema(SOURCE_TYPE, attach_entity_codes(SOURCE_TYPE, chunk))
+
+def open_source(source_path, archive=False):
+    """
+    The progress CSV opened at a consistent point: (open binary file, size,
+    inode, archived daily totals if archive else None). Appends and
+    compactions hold the file lock, so every byte before the size is a
+    complete row, and the file and the archive are read as of the same moment.
+    """
+    with exclusive_lock(source_path):
+        end = os.path.getsize(source_path)
+        f = open(source_path, 'rb')
+        archived = read_archive() if archive else None
+    return f, end, os.fstat(f.fileno()).st_ino, archived
+
+class RollupCube:
+    """The cube of one progress CSV: a sorted base part plus recent delta parts"""
+
+    def __init__(self, source_path=None, cube_path=None):
+        from utils.data_handler import FILE_MAPPING
+
+        self.source_path = source_path or FILE_MAPPING[SOURCE_TYPE]
+        self.cube_path = cube_path or ROLLUP_CONFIG['cube_file']
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._base = _empty_cube()
+        self._base_users = self._base[USER_COLUMN].to_numpy()
+        self._deltas = []
+        # Increases whenever rows are folded in, for keying derived caches
+        self.version = 0
+        # Cube version at which rows of each user were last folded in, since the last rebuild
+        self._user_versions = {}
+        self._rebuild = next(_rebuilds)
+
+    def _rollup(self, f, start, end, archived=None):
+        """Cube rows of archived daily totals and the CSV bytes in [start, end), or None if there are none"""
+        daily = None
+        if archived is not None and not archived.empty:
+            archived = attach_entity_codes(SOURCE_TYPE, archived)
+            days = archived['day'].to_numpy().astype('datetime64[D]').astype(np.int32)
+            daily = _combine([archived.assign(day=days)[[USER_COLUMN, 'day', 'activity_type'] + MEASURES]], [USER_COLUMN, 'day', 'activity_type'])
+        for chunk in read_rows(f, start, end):
+            combined = _combine([daily, _daily(chunk)] if daily is not None else [_daily(chunk)], [USER_COLUMN, 'day', 'activity_type'])
+            daily = combined if combined is not None else daily
+        return _expand(daily) if daily is not None else None
+
+    def _load_saved(self):
+        """Resume from the saved cube, if it has this layout"""
+        try:
+            with pa.memory_map(self.cube_path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowException):
+            return
+        info = json.loads((table.schema.metadata or {}).get(b'plp_rollup', b'{}'))
+        if info.get('version') != CUBE_VERSION:
+            return
+        self._set_base(_sorted_cube(table.to_pandas()))
+        self._watermark = info
+
+    def _save(self):
+        directory = os.path.dirname(self.cube_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pandas(self._base, preserve_index=False).replace_schema_metadata({
+            'plp_rollup': json.dumps({**self._watermark, 'version': CUBE_VERSION, 'saved_at': time.time()})
+        })
+        temp_path = f"{self.cube_path}.{os.getpid()}.tmp"
+        with exclusive_lock(self.cube_path):
+            with pa.OSFile(temp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, self.cube_path)
+
+    def _set_base(self, base):
+        self._base = base
+        self._base_users = base[USER_COLUMN].to_numpy()
+
+    def _compact(self):
+        """Merge the delta parts into the base and save it"""
+        merged = _combine([self._base] + self._deltas, KEY_COLUMNS)
+        self._set_base(_sorted_cube(merged) if merged is not None else _empty_cube())
+        self._deltas = []
+        try:
+            self._save()
+        except OSError:
+            # Still served from memory; the next process rebuilds from the CSV
+            pass
+
+    def refresh(self):
+        """Fold in rows appended since the last refresh (rebuild if the CSV was rewritten)"""
+        if not os.path.exists(self.source_path):
+            return self
+        stat = os.stat(self.source_path)
+        generation = get_dictionary().generation
+        with self._lock:
+            if self._watermark is None:
+                self._load_saved()
+            watermark = self._watermark
+            rebuild = (
+                watermark is None
+                or watermark['inode'] != stat.st_ino
+                or watermark['generation'] != generation
+                or stat.st_size < watermark['offset']
+            )
+            if not rebuild and stat.st_size == watermark['offset']:
+                return self
+
+            f, end, inode, archived = open_source(self.source_path, archive=rebuild)
+            if rebuild:
+                rows = self._rollup(f, 0, end, archived)
+                self._set_base(rows if rows is not None else _empty_cube())
+                self._deltas = []
+            else:
+                rows = self._rollup(f, watermark['offset'], end)
+                if rows is not None:
+                    self._deltas.append(rows)
+            self._watermark = {'offset': end, 'inode': inode, 'generation': generation}
+            self.version += 1
+            if rebuild:
+                self._user_versions = {}
+                self._rebuild = next(_rebuilds)
+            elif rows is not None:
+                for user_code in np.unique(rows[USER_COLUMN].to_numpy()):
+                    self._user_versions[int(user_code)] = self.version
+            if rebuild or len(self._deltas) > ROLLUP_CONFIG['max_deltas']:
+                self._compact()
+        return self
+
+    def user_version(self, user_code):
+        """Changes whenever rows of user_code are folded in and whenever the cube is rebuilt"""
+        with self._lock:
+            return (self._rebuild, self._user_versions.get(user_code, 0))
+
+    def rows(self, user_codes, grain):
+        """Cube rows of the given users (or ALL_USERS) at one grain, summed per bucket and activity type"""
+        with self._lock:
+            base, base_users, deltas = self._base, self._base_users, list(self._deltas)
+        grain_code = GRAINS.index(grain)
+        parts = []
+        for user_code in user_codes:
+            # The base is sorted by user, so each user is one contiguous slice
+            low, high = np.searchsorted(base_users, [user_code, user_code + 1])
+            parts.append(base.iloc[low:high])
+        parts += [delta[delta[USER_COLUMN].isin(user_codes)] for delta in deltas]
+        parts = [part[part['grain'].to_numpy() == grain_code] for part in parts]
+        combined = _combine(parts, ['bucket', 'activity_type'])
+        if combined is None:
+            return pd.DataFrame(columns=['bucket', 'activity_type'] + MEASURES)
+        return combined.sort_values(['bucket', 'activity_type'], ignore_index=True)
+
+    def size(self):
+        with self._lock:
+            return len(self._base) + sum(len(delta) for delta in self._deltas)
+
+_cube = None
+_cube_lock = threading.Lock()
+
+def get_cube():
+    """The process-wide cube, brought up to date with the progress CSV (saves still queued included)"""
+    global _cube
+    from utils.data_handler import wait_for_pending_writes
+
+    wait_for_pending_writes(SOURCE_TYPE)
+    with _cube_lock:
+        if _cube is None:
+            _cube = RollupCube()
+    return _cube.refresh()
+
+def period_labels(grain, buckets):
+    """Display values for buckets: dates for days and weeks, 'YYYY-MM' for months, day names"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if grain == 'day_of_week':
+        return [DAY_NAMES[bucket] for bucket in buckets]
+    if grain == 'month':
+        return pd.to_datetime(buckets.astype('datetime64[M]')).strftime('%Y-%m').tolist()
+    return list(pd.to_datetime(buckets.astype('datetime64[D]')))
+
+def _with_periods(rows, grain):
+    return rows.assign(period=period_labels(grain, rows['bucket'])) if not rows.empty else rows.assign(period=[])
+
+def user_version(user_id):
+    """
+    Version of one user's progress, for keying per-user caches: it changes
+    when rows of the user are appended, and when the progress CSV is
+    rewritten (compaction, retention) or the entity dictionary is rebuilt,
+    but not when other users save
+    """
+    return get_cube().user_version(entity_code('user', user_id))
+
+def user_rollup(user_id, grain):
+    """
+    One user's activity per period and activity type: columns bucket,
+    period, activity_type, count, score_sum and score_count
+    """
+    user_code = entity_code('user', user_id)
+    cube = get_cube()
+    rows = cube.rows([user_code], grain) if user_code is not None else cube.rows([], grain)
+    return _with_periods(rows, grain)
+
+def cohort_rollup(grain, user_ids=None):
+    """user_rollup summed over a group of users, or over every user when user_ids is None"""
+    cube = get_cube()
+    if user_ids is None:
+        rows = cube.rows([ALL_USERS], grain)
+    else:
+        codes = {entity_code('user', user_id) for user_id in user_ids}
+        rows = cube.rows(sorted(code for code in codes if code is not None), grain)
+    return _with_periods(rows, grain)
+
+def main():
+    import logging
+
+    parser = argparse.ArgumentParser(description="Build the progress rollup cube")
+    parser.add_argument('--rebuild', action='store_true', help="Discard the saved cube and rebuild it from the CSV")
+    args = parser.parse_args()
+
+    # Outside a Streamlit server the loaders' st.* calls only log warnings
+    logging.disable(logging.WARNING)
+    if args.rebuild and os.path.exists(ROLLUP_CONFIG['cube_file']):
+        os.remove(ROLLUP_CONFIG['cube_file'])
+    started = time.perf_counter()
+    cube = get_cube()
+    print(f"{cube.size()} cube rows in {time.perf_counter() - started:.2f}s, saved to {cube.cube_path}")
+
+if __name__ == "__main__":
+    main()
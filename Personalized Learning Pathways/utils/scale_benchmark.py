@@ -0,0 +1,222 @@
+"""
+Scale benchmark for the data-heavy code paths.
+
+Generates seeded synthetic datasets (utils.synthetic_data) at several
+progress-table sizes and times load_data, ProgressTracker,
+QuizEngine.get_random_questions, the Recommendations filter and paging,
+and CertificateGenerator against each. Results are written as JSON and can
+be compared with a stored baseline; any case slower than the baseline by
+more than the tolerance fails the run. Run from the app directory:
+
+    python -m utils.scale_benchmark [--rows 10000 100000 1000000] [--output bench.json]
+    python -m utils.scale_benchmark --save-baseline benchmarks/baseline.json
+    python -m utils.scale_benchmark --baseline benchmarks/baseline.json [--tolerance 0.25]
+
+Datasets are cached under --work-dir, so later runs skip generation. The
+same cases run as a pytest-benchmark suite in tests/test_scale_benchmark.py.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.synthetic_data import GENERATOR_DEFAULTS, generate_dataset
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+DEFAULT_WORK_DIR = 'bench_data'
+
+def benchmark_cases(user_id):
+    """(name, setup, run) for every case; setup runs untimed and its result is passed to run"""
+    from config import RECOMMENDATION_CONFIG
+    from utils.catalog_store import keyset_page, load_catalog, sort_index
+    from utils.certificate_generator import CertificateGenerator
+    from utils.data_handler import filter_recommendations, load_data
+    from utils.progress_tracker import ProgressTracker, figure_cache, progress_cache
+    from utils.quiz_engine import QuizEngine
+
+    def recommendations_page(recommendations_df):
+        filtered = filter_recommendations(recommendations_df, difficulty='Intermediate', show_self_paced=False, max_weeks=8)
+        order = sort_index(
+            'recommendations',
+            RECOMMENDATION_CONFIG['sort_columns'],
+            {'difficulty_level': RECOMMENDATION_CONFIG['difficulty_order']}
+        )
+        selected = np.zeros(len(recommendations_df), dtype=bool)
+        selected[filtered.index.to_numpy()] = True
+        rows, _ = keyset_page(order, selected, None, RECOMMENDATION_CONFIG['page_size'])
+        return recommendations_df.loc[rows]
+
+    def load_tracker(_):
+        # Time the scan of the log, not serving the user's progress from the cache
+        progress_cache.clear()
+        return ProgressTracker(user_id)
+
+    def progress_chart(tracker):
+        # Time building the figure, not serving it from the cache
+        figure_cache.clear()
+        return tracker.create_progress_chart()
+
+    return [
+        ('load_data.user_progress', lambda: None, lambda _: load_data('user_progress')),
+        ('progress_tracker.load', lambda: None, load_tracker),
+        ('progress_tracker.summary', lambda: ProgressTracker(user_id),
+         lambda tracker: (tracker.get_activity_summary(), tracker.get_learning_streak())),
+        ('progress_tracker.progress_chart', lambda: ProgressTracker(user_id), progress_chart),
+        ('quiz_engine.get_random_questions', lambda: QuizEngine(load_catalog('questions')),
+         lambda engine: engine.get_random_questions(stream='Computer Science', difficulty='Intermediate', count=20)),
+        ('recommendations.filter_and_page', lambda: load_catalog('recommendations'), recommendations_page),
+        ('certificate_generator.completion', CertificateGenerator,
+         lambda generator: generator.generate_completion_certificate(user_id, 'Computer Science Fundamentals', '2025-06-30', 87.5))
+    ]
+
+def _time_case(setup, run, repeats, warmup=1):
+    state = setup()
+    for _ in range(warmup):
+        run(state)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run(state)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'repeats': repeats,
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3)
+    }
+
+@contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def _reset_caches():
+    """Drop per-process caches keyed by relative paths so each dataset starts cold"""
+    from utils import catalog_store, rollup_cube
+    from utils.progress_tracker import figure_cache, progress_cache
+
+    catalog_store._open_catalogs.clear()
+    catalog_store._catalog_frames.clear()
+    catalog_store._verified_sources.clear()
+    catalog_store._sort_indexes.clear()
+    figure_cache.clear()
+    progress_cache.clear()
+    rollup_cube._cube = None
+
+def prepare_dataset(work_dir, progress_rows, seed=GENERATOR_DEFAULTS['seed']):
+    """Generate (or reuse) the dataset for one size and return its directory"""
+    dataset_dir = os.path.join(work_dir, f"rows_{progress_rows}_seed_{seed}")
+    if not os.path.exists(os.path.join(dataset_dir, 'data', 'user_progress.csv')):
+        generate_dataset(dataset_dir, progress_rows=progress_rows, seed=seed)
+    return dataset_dir
+
+def run_benchmarks(rows=DEFAULT_ROWS, repeats=5, work_dir=DEFAULT_WORK_DIR, seed=GENERATOR_DEFAULTS['seed'], cases=None):
+    """Time every case at every dataset size. Returns the JSON-ready results."""
+    # The heaviest synthetic student, so per-user work scales with the table
+    user_id = 'Student 0000000'
+    results = {}
+    for progress_rows in rows:
+        dataset_dir = os.path.abspath(prepare_dataset(work_dir, progress_rows, seed))
+        with _working_directory(dataset_dir):
+            _reset_caches()
+            scale = {}
+            for name, setup, run in benchmark_cases(user_id):
+                if cases and name not in cases:
+                    continue
+                scale[name] = _time_case(setup, run, repeats)
+            results[str(progress_rows)] = scale
+        _reset_caches()
+
+    return {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': seed,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+
+def compare_to_baseline(current, baseline, tolerance):
+    """
+    Cases whose median is slower than the baseline median by more than
+    tolerance (0.25 = 25%). Returns a list of (size, case, baseline ms, current ms).
+    """
+    regressions = []
+    for size, cases in baseline['results'].items():
+        for name, expected in cases.items():
+            measured = current['results'].get(size, {}).get(name)
+            if measured is None:
+                continue
+            if measured['median_ms'] > expected['median_ms'] * (1 + tolerance):
+                regressions.append((size, name, expected['median_ms'], measured['median_ms']))
+    return regressions
+
+def format_results(report, baseline=None):
+    lines = [f"{'rows':>9}  {'case':<36}  {'median':>10}  {'min':>10}  {'baseline':>10}"]
+    for size, cases in report['results'].items():
+        for name, timing in cases.items():
+            expected = (baseline or {}).get('results', {}).get(size, {}).get(name)
+            expected_ms = f"{expected['median_ms']:>8.1f}ms" if expected else f"{'-':>10}"
+            lines.append(
+                f"{int(size):>9}  {name:<36}  {timing['median_ms']:>8.1f}ms  "
+                f"{timing['min_ms']:>8.1f}ms  {expected_ms}"
+            )
+    return "\n".join(lines)
+
+def _write_json(path, report):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data paths against synthetic datasets")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="Progress table sizes (up to 10000000)")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per case")
+    parser.add_argument('--seed', type=int, default=GENERATOR_DEFAULTS['seed'])
+    parser.add_argument('--cases', nargs='*', help="Only run these cases")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="Where generated datasets are kept")
+    parser.add_argument('--output', help="Write the results as JSON")
+    parser.add_argument('--baseline', help="Fail if slower than this results file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown against the baseline")
+    parser.add_argument('--save-baseline', help="Write the results as the new baseline")
+    args = parser.parse_args()
+
+    # Outside a Streamlit server every st.* call logs a warning
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run_benchmarks(args.rows, args.repeats, args.work_dir, args.seed, args.cases)
+    print(format_results(report, baseline))
+    if args.output:
+        _write_json(args.output, report)
+    if args.save_baseline:
+        _write_json(args.save_baseline, report)
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nPERFORMANCE REGRESSION: {len(regressions)} case(s) over the {args.tolerance:.0%} tolerance", file=sys.stderr)
+            for size, name, expected_ms, measured_ms in regressions:
+                print(f"  {name} @ {size} rows: {expected_ms:.1f}ms -> {measured_ms:.1f}ms "
+                      f"({measured_ms / expected_ms - 1:+.0%})", file=sys.stderr)
+            raise SystemExit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Column types for every dataset, applied by every loader.
+
+DATASET_SCHEMAS maps each data type to {column: type}. Types are pandas
+dtypes, plus 'datetime' for timestamps saved as DATE_FORMAT text.
+Repetitive text (ids of users, activity types, streams, difficulty levels)
+is 'category', so each distinct value is stored once and comparisons run
+on integer codes. Columns missing from a file are skipped, so older files
+and optional columns (attempt_id) load unchanged.
+
+Categoricals keep every category after filtering, so count values with
+observed_value_counts() rather than Series.value_counts().
+"""
+import pandas as pd
+
+# How save_user_progress writes the 'date' column
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+DATASET_SCHEMAS = {
+    'students': {
+        'Username': 'str',
+        'Password': 'str',
+        'Name': 'str',
+        'Age': 'Int64',
+        'Email': 'str',
+        'Gender': 'category'
+    },
+    'questions': {
+        'question_id': 'int64',
+        'stream': 'category',
+        'question': 'str',
+        'option_a': 'str',
+        'option_b': 'str',
+        'option_c': 'str',
+        'option_d': 'str',
+        'correct_answer': 'category',
+        'difficulty': 'category',
+        'explanation': 'str'
+    },
+    'career_quiz': {
+        'question_id': 'int64',
+        'question': 'str',
+        'question_type': 'category',
+        'career_field': 'category',
+        'option_a': 'str',
+        'option_b': 'str',
+        'option_c': 'str',
+        'option_d': 'str'
+    },
+    'recommendations': {
+        'recommendation_id': 'int64',
+        'stream': 'category',
+        'title': 'str',
+        'resource_type': 'category',
+        'platform': 'category',
+        'url': 'str',
+        'difficulty_level': 'category',
+        'duration': 'str',
+        'description': 'str'
+    },
+    'streams': {
+        'stream_id': 'int64',
+        'stream_name': 'str',
+        'description': 'str',
+        'category': 'category',
+        'difficulty_level': 'category'
+    },
+    'user_progress': {
+        # Snowflake ids; run `python -m utils.id_generator --migrate` on files with legacy text ids
+        'progress_id': 'Int64',
+        'user_id': 'category',
+        'activity_type': 'category',
+        'date': 'datetime',
+        'score': 'float64',
+        'details': 'str',
+        # Ids from new_attempt_id (utils.response_log); empty for records without an attempt
+        'attempt_id': 'Int64'
+    },
+    'quiz_results': {
+        'user_id': 'category',
+        'quiz_type': 'category',
+        'score': 'float64',
+        'details': 'str',
+        'attempt_id': 'Int64'
+    }
+}
+
+# Types read_csv can produce directly; the others are converted after parsing
+_PARSER_TYPES = {'str', 'category'}
+
+# Id columns that are empty on most rows. read_csv parses an integer column with gaps as
+# float64, which rounds 64-bit ids, so these are read as text and converted exactly
+_SPARSE_ID_COLUMNS = {'attempt_id'}
+
+def read_options(data_type, columns=None):
+    """
+    Keyword arguments for pd.read_csv: parser dtypes from the schema and, when
+    columns is given, a usecols projection (unknown columns are ignored)
+    """
+    schema = DATASET_SCHEMAS.get(data_type, {})
+    options = {'dtype': {column: kind for column, kind in schema.items() if kind in _PARSER_TYPES}}
+    options['dtype'].update({column: 'str' for column in _SPARSE_ID_COLUMNS if column in schema})
+    if columns is not None:
+        wanted = set(columns)
+        options['usecols'] = lambda column: column in wanted
+    return options
+
+def parse_dates(values):
+    """Timestamps saved as DATE_FORMAT text; other layouts are parsed individually, bad ones become NaT"""
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    unparsed = parsed.isna() & values.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(values[unparsed], format='mixed', errors='coerce')
+    return parsed
+
+def apply_schema(data_type, df):
+    """Convert a loaded frame's columns to the registered types"""
+    schema = DATASET_SCHEMAS.get(data_type, {})
+    converted = {}
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if kind == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                converted[column] = parse_dates(values)
+        elif kind == 'Int64' and pd.api.types.is_string_dtype(values):
+            try:
+                converted[column] = values.astype(kind)
+            except (TypeError, ValueError):
+                # Stray text becomes missing; a fractional value is not an id either
+                numbers = pd.to_numeric(values, errors='coerce', dtype_backend='numpy_nullable')
+                converted[column] = numbers if numbers.dtype == kind else numbers.where(numbers % 1 == 0).astype(kind)
+        elif kind in ('int64', 'Int64', 'float64'):
+            numbers = values if pd.api.types.is_numeric_dtype(values) else pd.to_numeric(values, errors='coerce')
+            if numbers.dtype != kind and not (kind == 'int64' and numbers.isna().any()):
+                numbers = numbers.astype(kind)
+            if numbers is not values:
+                converted[column] = numbers
+        elif values.dtype != kind:
+            converted[column] = values.astype(kind)
+    return df.assign(**converted) if converted else df
+
+def observed_value_counts(series):
+    """value_counts() without the zero counts of categories absent from a filtered frame"""
+    counts = series.value_counts()
+    return counts[counts > 0]
@@ -0,0 +1,238 @@
+"""
+Seeded synthetic dataset generator for scale testing.
+
+Writes a data/ directory with the same files and columns as the real one
+(students, questions, career quiz, streams, recommendations and user
+progress, plus an IQ test response log with --responses) at any size. The same seed always produces the same files.
+Run from the app directory:
+
+    python -m utils.synthetic_data --out bench_data --progress-rows 1000000 [--seed 42]
+
+then point a copy of the app (or utils.scale_benchmark) at bench_data.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from config import PROGRESS_CONFIG
+from utils.id_generator import EPOCH_MS, MAX_SEQUENCE, MAX_WORKER_ID, TIMESTAMP_SHIFT, WORKER_SHIFT
+
+STREAMS = [
+    'Computer Science', 'Data Science', 'Information Technology', 'Mathematics', 'Physics',
+    'Chemistry', 'Biology', 'Business Administration', 'Economics', 'Marketing',
+    'Creative Arts', 'Graphic Design', 'Music', 'Medicine', 'Nursing', 'Engineering'
+]
+CAREER_FIELDS = ['Technology', 'Science', 'Business', 'Creative Arts', 'Healthcare', 'Engineering', 'Education', 'Social Services']
+DIFFICULTIES = ['Beginner', 'Intermediate', 'Advanced']
+RESOURCE_TYPES = ['Course', 'Book', 'Video', 'Tutorial', 'Project']
+PLATFORMS = ['Coursera', 'edX', 'Udemy', 'YouTube', 'Khan Academy', 'N/A']
+DURATIONS = ['2 weeks', '4 weeks', '6 weeks', '8 weeks', '12 weeks', '3 months', 'Self-paced']
+
+GENERATOR_DEFAULTS = {
+    'students': 5000,
+    'questions': 2000,
+    'recommendations': 5000,
+    'progress_rows': 100000,
+    # IQ test responses written to the response log (none by default)
+    'responses': 0,
+    'history_days': 365,
+    'chunk_rows': 1000000,
+    'seed': 42
+}
+
+# Synthetic progress ids use the last worker id so they never collide with real ones
+SYNTHETIC_WORKER_ID = MAX_WORKER_ID
+
+def generate_students(rng, count):
+    ids = np.arange(count)
+    return pd.DataFrame({
+        'Username': [f"Student {i:07d}" for i in ids],
+        'Password': [f"pw{i:07d}" for i in ids],
+        'Name': [f"Student {i:07d}" for i in ids],
+        'Age': rng.integers(16, 40, count),
+        'Email': [f"student{i:07d}@example.com" for i in ids],
+        'Gender': rng.choice(['Female', 'Male', 'Other'], count)
+    })
+
+def generate_questions(rng, count):
+    ids = np.arange(1, count + 1)
+    return pd.DataFrame({
+        'question_id': ids,
+        'stream': rng.choice(STREAMS, count),
+        'question': [f"Synthetic question {i}?" for i in ids],
+        'option_a': 'Option A',
+        'option_b': 'Option B',
+        'option_c': 'Option C',
+        'option_d': 'Option D',
+        'correct_answer': rng.choice(list('abcd'), count),
+        'difficulty': rng.choice(DIFFICULTIES, count, p=[0.4, 0.4, 0.2]),
+        'explanation': 'Synthetic explanation'
+    })
+
+def generate_career_quiz(rng):
+    questions = []
+    for i, field in enumerate(CAREER_FIELDS * 2, start=1):
+        questions.append({
+            'question_id': i,
+            'question': f"How much do you enjoy {field.lower()} activities ({i})?",
+            'question_type': 'scale',
+            'career_field': field,
+            'option_a': 'Not at all',
+            'option_b': 'Slightly',
+            'option_c': 'Moderately',
+            'option_d': 'Very much'
+        })
+    return pd.DataFrame(questions)
+
+def generate_streams(rng):
+    return pd.DataFrame({
+        'stream_id': np.arange(1, len(STREAMS) + 1),
+        'stream_name': STREAMS,
+        'description': [f"{stream} studies" for stream in STREAMS],
+        'category': rng.choice(CAREER_FIELDS, len(STREAMS)),
+        'difficulty_level': rng.choice(DIFFICULTIES, len(STREAMS))
+    })
+
+def generate_recommendations(rng, count):
+    ids = np.arange(1, count + 1)
+    platforms = rng.choice(PLATFORMS, count)
+    return pd.DataFrame({
+        'recommendation_id': ids,
+        'stream': rng.choice(STREAMS, count),
+        'title': [f"Resource {i}" for i in ids],
+        'resource_type': rng.choice(RESOURCE_TYPES, count),
+        'platform': platforms,
+        'url': np.where(platforms == 'N/A', 'N/A', [f"https://example.com/resource/{i}" for i in ids]),
+        'difficulty_level': rng.choice(DIFFICULTIES, count),
+        'duration': rng.choice(DURATIONS, count),
+        'description': [f"Synthetic learning resource number {i}" for i in ids]
+    })
+
+def generate_progress_chunk(rng, rows, usernames, start_ms, history_ms, first_sequence):
+    """One chunk of progress rows; a few students account for most activity (Zipf-like)"""
+    weights = 1.0 / np.arange(1, len(usernames) + 1)
+    users = rng.choice(len(usernames), rows, p=weights / weights.sum())
+
+    activity_types = np.array(PROGRESS_CONFIG['activity_types'])
+    activities = rng.choice(activity_types, rows, p=[0.35, 0.2, 0.15, 0.15, 0.15])
+    moments = np.sort(start_ms + rng.integers(0, history_ms, rows))
+
+    scores = np.round(np.clip(rng.normal(70, 15, rows), 0, 100), 1)
+    scores[activities == 'study_plan'] = 0.0
+    iq_scores = np.round(100 + (scores - 70) * 1.5).astype(int)
+    fields = rng.choice(CAREER_FIELDS, rows)
+    deadlines = pd.to_datetime(moments + 30 * 86400000, unit='ms').strftime('%Y-%m-%d')
+
+    details = np.where(
+        activities == 'iq_test',
+        pd.Series(iq_scores).astype(str).radd('IQ Score: ') + ', Accuracy: ' + pd.Series(scores).astype(str) + '%, Questions: 20',
+        np.where(
+            activities == 'career_quiz',
+            pd.Series(fields).radd('Top career: ') + ', Score: ' + pd.Series(np.round(scores / 25, 1)).astype(str) + ', Total fields assessed: 8',
+            np.where(
+                activities == 'study_plan',
+                pd.Series(fields).radd('Goal: Learn ') + ', Deadline: ' + pd.Series(deadlines) + ', Status: Active',
+                pd.Series(activities).str.replace('_', ' ').str.title() + ' completed'
+            )
+        )
+    )
+
+    # Snowflake ids from the activity time, with a running sequence to keep them unique
+    sequence = (first_sequence + np.arange(rows)) & MAX_SEQUENCE
+    progress_ids = ((moments - EPOCH_MS) << TIMESTAMP_SHIFT) | (SYNTHETIC_WORKER_ID << WORKER_SHIFT) | sequence
+
+    return pd.DataFrame({
+        'progress_id': progress_ids,
+        'user_id': usernames[users],
+        'activity_type': activities,
+        'date': pd.to_datetime(moments, unit='ms').strftime('%Y-%m-%d %H:%M:%S'),
+        'score': scores,
+        'details': details
+    })
+
+def generate_responses(rng, count, usernames, question_ids, end_ms, history_ms):
+    """IQ test responses as one response log table; each student answers correctly at their own rate"""
+    import pyarrow as pa
+    from utils.response_log import RESPONSE_SCHEMA
+
+    ability = np.clip(rng.normal(0.65, 0.15, len(usernames)), 0.05, 0.98)
+    users = rng.integers(0, len(usernames), count)
+    correct = rng.random(count) < ability[users]
+    return pa.Table.from_pydict({
+        'attempt_id': np.arange(count, dtype=np.int64) // 20,
+        'user_id': usernames[users],
+        'quiz_type': np.full(count, 'iq_test'),
+        'question_id': rng.choice(question_ids, count).astype(np.int32),
+        'chosen_option': np.where(correct, 'a', 'b'),
+        'correct': correct,
+        'response_ms': rng.integers(2000, 60000, count).astype(np.int32),
+        'answered_at': pd.to_datetime(end_ms - history_ms + np.sort(rng.integers(0, history_ms, count)), unit='ms')
+    }).cast(RESPONSE_SCHEMA)
+
+def generate_dataset(out_dir, **overrides):
+    """
+    Write a complete synthetic data directory under out_dir/data.
+    Returns the settings used.
+    """
+    settings = dict(GENERATOR_DEFAULTS, **overrides)
+    rng = np.random.default_rng(settings['seed'])
+    data_dir = os.path.join(out_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    students = generate_students(rng, settings['students'])
+    students.to_csv(os.path.join(data_dir, 'students.csv'), index=False)
+    questions = generate_questions(rng, settings['questions'])
+    questions.to_csv(os.path.join(data_dir, 'questions.csv'), index=False)
+    generate_career_quiz(rng).to_csv(os.path.join(data_dir, 'career_quiz.csv'), index=False)
+    generate_streams(rng).to_csv(os.path.join(data_dir, 'streams.csv'), index=False)
+    generate_recommendations(rng, settings['recommendations']).to_csv(os.path.join(data_dir, 'recommendations.csv'), index=False)
+
+    # Progress rows are written in time order, chunk by chunk, so 10M rows never sit in memory at once
+    usernames = students['Username'].to_numpy()
+    history_ms = settings['history_days'] * 86400000
+    end_ms = int(pd.Timestamp('2026-01-01').timestamp() * 1000)
+    progress_path = os.path.join(data_dir, 'user_progress.csv')
+    remaining = settings['progress_rows']
+    chunks = max(1, -(-remaining // settings['chunk_rows']))
+    chunk_span = history_ms // chunks
+    written = 0
+    for chunk in range(chunks):
+        rows = min(settings['chunk_rows'], remaining)
+        frame = generate_progress_chunk(
+            rng, rows, usernames,
+            start_ms=end_ms - history_ms + chunk * chunk_span,
+            history_ms=chunk_span,
+            first_sequence=written
+        )
+        frame.to_csv(progress_path, mode='w' if chunk == 0 else 'a', header=chunk == 0, index=False)
+        remaining -= rows
+        written += rows
+
+    with open(os.path.join(data_dir, 'quiz_results.csv'), 'w') as f:
+        f.write('user_id,quiz_type,score,details\n')
+
+    if settings['responses']:
+        import pyarrow as pa
+
+        table = generate_responses(rng, settings['responses'], usernames, questions['question_id'].to_numpy(), end_ms, history_ms)
+        log_dir = os.path.join(data_dir, 'response_log')
+        os.makedirs(log_dir, exist_ok=True)
+        with pa.OSFile(os.path.join(log_dir, 'synthetic.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return settings
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic data directory")
+    parser.add_argument('--out', required=True, help="Directory to write (data/ is created inside it)")
+    for name, value in GENERATOR_DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=value)
+    args = parser.parse_args()
+
+    settings = generate_dataset(args.out, **{name: getattr(args, name) for name in GENERATOR_DEFAULTS})
+    print(f"Wrote {settings['progress_rows']} progress rows for {settings['students']} students to {args.out}/data")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Warm-start preload for a freshly started server process.
+
+start_warmup() runs once per process in a background thread, so the server
+keeps accepting connections while it loads the catalogs, builds the
+question and recommendation indexes, compiles the certificate styles,
+imports Plotly and primes the figure cache for recently active students.
+is_ready() / warmup_status() report progress, and the status is written to
+WARMUP_CONFIG['status_file'] when warm-up finishes so a readiness probe can
+check for it. Set PLP_WARMUP=0 to turn it off (e.g. for import-time
+measurements). The same steps can be run in the foreground with:
+
+    python -m utils.warmup
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from config import RECOMMENDATION_CONFIG, WARMUP_CONFIG
+
+_status = {'state': 'idle', 'started_at': None, 'finished_at': None, 'steps': {}}
+_status_lock = threading.Lock()
+_thread = None
+
+def warm_catalogs():
+    """Build (if needed) and memory-map every catalog, then parse the remaining data files"""
+    from utils.catalog_store import CATALOG_TYPES, load_catalog
+    from utils.data_handler import FILE_MAPPING, load_data
+
+    for data_type in CATALOG_TYPES:
+        load_catalog(data_type)
+    for data_type in FILE_MAPPING:
+        if data_type not in CATALOG_TYPES:
+            load_data(data_type)
+
+def warm_question_index():
+    from utils.catalog_store import load_catalog
+    from utils.quiz_engine import QuizEngine
+
+    questions_df = load_catalog('questions')
+    if questions_df is not None and not questions_df.empty:
+        QuizEngine(questions_df).get_item_tables()
+
+def warm_recommendation_index():
+    from utils.catalog_store import sort_index
+
+    sort_index(
+        'recommendations',
+        RECOMMENDATION_CONFIG['sort_columns'],
+        {'difficulty_level': RECOMMENDATION_CONFIG['difficulty_order']}
+    )
+
+def warm_certificates():
+    """Build the shared stylesheet and render one throwaway PDF to load ReportLab's fonts"""
+    from utils.certificate_generator import CertificateGenerator
+
+    CertificateGenerator().generate_completion_certificate('Warm Up', 'Warm Up', '2025-01-01', 100)
+
+def warm_charts():
+    """Import Plotly and prime the figure cache for the most recently active students"""
+    import pandas as pd
+    import plotly.express as px
+    from utils.data_handler import iter_data
+    from utils.progress_tracker import ProgressTracker
+
+    # The first figure also loads Plotly's templates and validators
+    px.line(pd.DataFrame({'x': [0, 1], 'y': [0, 1]}), x='x', y='y')
+
+    if not WARMUP_CONFIG['prime_users']:
+        return
+    # Latest activity per user, folded chunk by chunk
+    last_active = pd.Series(dtype='datetime64[ns]')
+    for chunk in iter_data('user_progress', columns=['user_id', 'date']):
+        chunk_last = chunk.groupby(chunk['user_id'].astype(str))['date'].max()
+        last_active = pd.concat([last_active, chunk_last]).groupby(level=0).max()
+    for user_id in last_active.nlargest(WARMUP_CONFIG['prime_users']).index:
+        tracker = ProgressTracker(user_id)
+        tracker.create_progress_chart()
+        tracker.create_activity_distribution_chart()
+        tracker.create_performance_gauge()
+
+WARMUP_STEPS = [
+    ('catalogs', warm_catalogs),
+    ('question_index', warm_question_index),
+    ('recommendation_index', warm_recommendation_index),
+    ('certificates', warm_certificates),
+    ('charts', warm_charts)
+]
+
+def _status_path():
+    return WARMUP_CONFIG['status_file'].format(pid=os.getpid()) if WARMUP_CONFIG['status_file'] else None
+
+def _write_status_file():
+    path = _status_path()
+    if path is None:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(warmup_status(), f, indent=2)
+    os.replace(temp_path, path)
+
+def run_warmup():
+    """Run every warm-up step in order; a failing step is recorded and skipped"""
+    with _status_lock:
+        _status.update(state='running', started_at=time.time(), finished_at=None, steps={})
+    path = _status_path()
+    if path and os.path.exists(path):
+        # A status file left by the previous process would report ready too early
+        os.remove(path)
+
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+            result = {'ms': round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            result = {'ms': round((time.perf_counter() - started) * 1000, 1), 'error': repr(e)}
+        with _status_lock:
+            _status['steps'][name] = result
+
+    with _status_lock:
+        _status.update(state='ready', finished_at=time.time())
+    try:
+        _write_status_file()
+    except OSError:
+        pass
+    return warmup_status()
+
+def start_warmup():
+    """Start warm-up in a background thread, once per process; returns immediately"""
+    global _thread
+    if _thread is not None or not WARMUP_CONFIG['enabled'] or os.environ.get('PLP_WARMUP') == '0':
+        return _thread
+    with _status_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_warmup, name='warmup', daemon=True)
+            _thread.start()
+    return _thread
+
+def is_ready():
+    """True once warm-up has finished (steps that failed are listed in warmup_status)"""
+    return _status['state'] == 'ready'
+
+def warmup_status():
+    with _status_lock:
+        return {**_status, 'steps': dict(_status['steps'])}
+
+def main():
+    # Outside a Streamlit server the loaders' st.* calls only log warnings
+    logging.disable(logging.WARNING)
+    status = run_warmup()
+    for name, result in status['steps'].items():
+        outcome = f"failed: {result['error']}" if 'error' in result else "ok"
+        print(f"{name:<22} {result['ms']:>9.1f}ms  {outcome}")
+    print(f"ready in {status['finished_at'] - status['started_at']:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Stress test for concurrent progress saves.
+
+Spawns several processes, each running several threads that save records
+to the same CSV at once, then checks that every record landed exactly
+once and reports sustained writes per second. Runs against a scratch file,
+never the real data directory:
+
+    python -m utils.write_stress [--processes 4] [--threads 8] [--records 250] [--mode writer]
+
+Modes: 'writer' saves through a GroupCommitWriter per process (what the
+app does), 'append' calls the locked append_rows directly for every
+record, and 'rewrite' reproduces the old load/concat/rewrite save to
+show the records it loses.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from utils.progress_writer import GroupCommitWriter, append_rows
+
+def _record(worker, sequence):
+    return {
+        'progress_id': f"{worker}-{sequence}",
+        'user_id': worker,
+        'activity_type': 'stress_test',
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'score': float(sequence % 100),
+        'details': f"Worker: {worker}, Sequence: {sequence}"
+    }
+
+def _rewrite_save(file_path, record):
+    """The pre-writer save: read the whole file, add a row, write it back"""
+    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        df = pd.concat([pd.read_csv(file_path), pd.DataFrame([record])], ignore_index=True)
+    else:
+        df = pd.DataFrame([record])
+    df.to_csv(file_path, index=False)
+
+def _run_process(file_path, process_id, threads, records, mode, fsync, start_barrier):
+    # Interpreter start-up is excluded from the timing: every process begins saving together
+    start_barrier.wait()
+    writer = GroupCommitWriter(queue_size=1024, max_batch=512, enqueue_timeout=60, fsync=fsync) if mode == 'writer' else None
+    errors = []
+
+    def save_records(thread_id):
+        worker = f"p{process_id}t{thread_id}"
+        futures = []
+        for sequence in range(records):
+            record = _record(worker, sequence)
+            try:
+                if mode == 'writer':
+                    futures.append(writer.submit(file_path, record))
+                elif mode == 'append':
+                    append_rows(file_path, [record], fsync)
+                else:
+                    _rewrite_save(file_path, record)
+            except Exception as e:
+                errors.append(repr(e))
+        for future in futures:
+            future.result()
+
+    workers = [threading.Thread(target=save_records, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if writer is not None:
+        writer.close()
+    if errors:
+        raise RuntimeError(f"{len(errors)} failed saves, first: {errors[0]}")
+
+def run_stress_test(processes=4, threads=8, records=250, mode='writer', fsync=True, work_dir=None):
+    """Run the stress test and return a summary dict"""
+    owns_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='progress-stress-')
+    file_path = os.path.join(work_dir, 'user_progress.csv')
+    context = multiprocessing.get_context('spawn')
+
+    try:
+        start_barrier = context.Barrier(processes + 1)
+        workers = [
+            context.Process(target=_run_process, args=(file_path, i, threads, records, mode, fsync, start_barrier))
+            for i in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        start_barrier.wait()
+        started = time.perf_counter()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        expected = processes * threads * records
+        saved = pd.read_csv(file_path, usecols=['progress_id'])['progress_id'] if os.path.exists(file_path) else pd.Series(dtype=str)
+        unique = saved.nunique()
+        return {
+            'mode': mode,
+            'processes': processes,
+            'threads_per_process': threads,
+            'expected_records': expected,
+            'written_rows': len(saved),
+            'lost_records': expected - unique,
+            'duplicate_rows': len(saved) - unique,
+            'failed_processes': sum(process.exitcode != 0 for process in workers),
+            'seconds': round(elapsed, 3),
+            'writes_per_second': round(unique / elapsed, 1) if elapsed > 0 else None
+        }
+    finally:
+        if owns_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent progress save stress test")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help="Saving threads per process")
+    parser.add_argument('--records', type=int, default=250, help="Records saved by each thread")
+    parser.add_argument('--mode', choices=['writer', 'append', 'rewrite'], default='writer')
+    parser.add_argument('--no-fsync', action='store_true', help="Skip fsync to measure the in-memory path")
+    args = parser.parse_args()
+
+    result = run_stress_test(args.processes, args.threads, args.records, args.mode, fsync=not args.no_fsync)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if result['lost_records'] or result['duplicate_rows'] or result['failed_processes']:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()